@@ -0,0 +1,419 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from app.core.config import (
+    PRINCIPAL_CACHE_ENABLED,
+    PRINCIPAL_CACHE_SIZE,
+    PRINCIPAL_CACHE_TTL_SECONDS,
+    PRINCIPAL_CACHE_REDIS_ENABLED,
+    PRINCIPAL_CACHE_REDIS_TTL_SECONDS,
+    TASKS_CACHE_ENABLED,
+    TASKS_CACHE_TTL_SECONDS,
+    TOKEN_CACHE_ENABLED,
+    TOKEN_CACHE_SIZE,
+)
+from app.core.logger import logger
+from app.core.redis_client import get_redis
+
+
+class LRUCache:
+    """
+    Потокобезопасный LRU-кэш в памяти процесса с TTL для каждой записи.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PrincipalCache:
+    """
+    Кэш данных аутентифицированного пользователя по ``sub`` из JWT.
+
+    Первый уровень — LRU в памяти процесса, второй (необязательный) — Redis,
+    общий для всех процессов API. Запись живёт не дольше, чем действует токен,
+    по которому она создана. Инвалидация удаляет запись из Redis и из памяти
+    текущего процесса; в памяти других процессов запись живёт не дольше
+    PRINCIPAL_CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self, local: LRUCache, ttl: float, redis_client=None, redis_ttl: float = 0,
+                 prefix: str = "principal"):
+        self.local = local
+        self.ttl = ttl
+        self.redis = redis_client
+        self.redis_ttl = redis_ttl
+        self.prefix = prefix
+
+    def _key(self, user_id: str) -> str:
+        return f"{self.prefix}:{user_id}"
+
+    def get(self, user_id: str) -> Optional[dict]:
+        """
+        Получить данные пользователя из кэша.
+
+        :return: Словарь полей пользователя или None при промахе.
+        """
+        principal = self.local.get(user_id)
+        if principal is not None or self.redis is None:
+            return principal
+
+        try:
+            raw = self.redis.get(self._key(user_id))
+            if raw is None:
+                return None
+            ttl_ms = self.redis.pttl(self._key(user_id))
+        except RedisError as e:
+            logger.warning(f"Redis недоступен, кэш пользователей работает только в памяти: {e}")
+            return None
+
+        principal = json.loads(raw)
+        if ttl_ms and ttl_ms > 0:
+            self.local.set(user_id, principal, min(self.ttl, ttl_ms / 1000))
+        return principal
+
+    def set(self, user_id: str, principal: dict, expires_at: Optional[float] = None) -> None:
+        """
+        Сохранить данные пользователя в кэш.
+
+        :param user_id: ID пользователя (``sub`` токена).
+        :param principal: Словарь полей пользователя.
+        :param expires_at: Время истечения токена (Unix timestamp); запись не переживёт токен.
+        """
+        remaining = expires_at - time.time() if expires_at is not None else None
+        local_ttl = self.ttl if remaining is None else min(self.ttl, remaining)
+        self.local.set(user_id, principal, local_ttl)
+
+        if self.redis is None:
+            return
+        redis_ttl = self.redis_ttl if remaining is None else min(self.redis_ttl, remaining)
+        if redis_ttl <= 0:
+            return
+        try:
+            self.redis.set(self._key(user_id), json.dumps(principal), px=int(redis_ttl * 1000))
+        except RedisError as e:
+            logger.warning(f"Не удалось сохранить пользователя {user_id} в Redis: {e}")
+
+    def invalidate(self, user_id: str) -> None:
+        """
+        Удалить данные пользователя из кэша после изменения профиля.
+        """
+        self.local.delete(user_id)
+        if self.redis is None:
+            return
+        try:
+            self.redis.delete(self._key(user_id))
+        except RedisError as e:
+            logger.warning(f"Не удалось удалить пользователя {user_id} из кэша Redis: {e}")
+
+    def clear(self) -> None:
+        """Очистить кэш в памяти процесса."""
+        self.local.clear()
+
+
+class _NoopPrincipalCache:
+    """Заглушка для отключённого кэша пользователей."""
+
+    def get(self, user_id: str) -> Optional[dict]:
+        return None
+
+    def set(self, user_id: str, principal: dict, expires_at: Optional[float] = None) -> None:
+        pass
+
+    def invalidate(self, user_id: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+_principal_cache = None
+_principal_cache_lock = threading.Lock()
+
+
+def get_principal_cache():
+    """
+    Получить кэш пользователей процесса, создав его при первом вызове.
+    """
+    global _principal_cache
+    with _principal_cache_lock:
+        if _principal_cache is None:
+            if not PRINCIPAL_CACHE_ENABLED:
+                _principal_cache = _NoopPrincipalCache()
+            else:
+                _principal_cache = PrincipalCache(
+                    LRUCache(PRINCIPAL_CACHE_SIZE),
+                    PRINCIPAL_CACHE_TTL_SECONDS,
+                    redis_client=get_redis() if PRINCIPAL_CACHE_REDIS_ENABLED else None,
+                    redis_ttl=PRINCIPAL_CACHE_REDIS_TTL_SECONDS,
+                )
+        return _principal_cache
+
+
+class TokenCache:
+    """
+    Кэш проверенных payload JWT в памяти процесса.
+
+    Ключ — SHA-256 от строки токена, поэтому сами токены в памяти не хранятся.
+    Запись живёт до ``exp`` токена: повторный запрос с тем же токеном пропускает
+    проверку подписи, но не продлевает срок действия токена.
+    """
+
+    def __init__(self, local: LRUCache):
+        self.local = local
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """
+        Получить проверенный payload токена.
+
+        :return: Копия payload или None при промахе и после истечения токена.
+        """
+        payload = self.local.get(self._key(token))
+        with self._stats_lock:
+            if payload is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return dict(payload)
+
+    def set(self, token: str, payload: dict) -> None:
+        """
+        Сохранить payload токена после проверки подписи.
+
+        Токены без ``exp`` не кэшируются.
+        """
+        expires_at = payload.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return
+        self.local.set(self._key(token), dict(payload), expires_at - time.time())
+
+    def stats(self) -> dict:
+        """Счётчики попаданий и промахов кэша и текущий размер."""
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "size": len(self.local),
+            }
+
+    def clear(self) -> None:
+        """Очистить кэш в памяти процесса."""
+        self.local.clear()
+
+
+class _NoopTokenCache:
+    """Заглушка для отключённого кэша токенов."""
+
+    def get(self, token: str) -> Optional[dict]:
+        return None
+
+    def set(self, token: str, payload: dict) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"hits": 0, "misses": 0, "hit_rate": 0.0, "size": 0}
+
+    def clear(self) -> None:
+        pass
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """
+    Получить кэш проверенных токенов процесса, создав его при первом вызове.
+    """
+    global _token_cache
+    with _token_cache_lock:
+        if _token_cache is None:
+            if not TOKEN_CACHE_ENABLED:
+                _token_cache = _NoopTokenCache()
+            else:
+                _token_cache = TokenCache(LRUCache(TOKEN_CACHE_SIZE))
+        return _token_cache
+
+
+# Чтение поколения пользователя и записи по нему за один запрос к Redis.
+# Если ключа поколения нет (первое обращение, вытеснение), назначается новое
+# случайное поколение, под которым записей ещё нет
+TASK_LIST_GET_SCRIPT = """
+local generation = redis.call('GET', KEYS[1])
+if not generation then
+    redis.call('SET', KEYS[1], ARGV[3])
+    return {ARGV[3], false}
+end
+return {generation, redis.call('GET', ARGV[1] .. generation .. ':' .. ARGV[2])}
+"""
+
+
+def _new_generation() -> str:
+    """Новое уникальное поколение списков задач пользователя."""
+    return uuid.uuid4().hex
+
+
+class TaskListCache:
+    """
+    Кэш сериализованных списков задач в Redis.
+
+    Записи хранятся по ключу ``<prefix>:list:<user_id>:<поколение>:<ключ запроса>``.
+    Инвалидация заменяет поколение пользователя новым случайным значением, после
+    чего старые записи больше не читаются и истекают по TTL. Поколения не
+    повторяются, поэтому потеря ключа поколения не возвращает старые записи. Запись, подготовленная по данным,
+    прочитанным до инвалидации, сохраняется под старым поколением и тоже не читается.
+    """
+
+    def __init__(self, redis_client, ttl: float, prefix: str = "tasks"):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        self._get_script = redis_client.register_script(TASK_LIST_GET_SCRIPT)
+
+    def _generation_key(self, user_id: str) -> str:
+        return f"{self.prefix}:gen:{user_id}"
+
+    def _list_prefix(self, user_id: str) -> str:
+        return f"{self.prefix}:list:{user_id}:"
+
+    def _count(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, user_id: str, key: str) -> Tuple[Optional[dict], Optional[str]]:
+        """
+        Получить список задач из кэша.
+
+        :param user_id: ID пользователя.
+        :param key: Ключ запроса (страница, сортировка, фильтры).
+        :return: Пара (список или None при промахе, поколение для последующего set).
+        """
+        try:
+            generation, raw = self._get_script(keys=[self._generation_key(user_id)],
+                                               args=[self._list_prefix(user_id), key, _new_generation()])
+        except RedisError as e:
+            logger.warning(f"Redis недоступен, список задач читается из базы: {e}")
+            self._count(hit=False)
+            return None, None
+
+        generation = generation.decode() if isinstance(generation, bytes) else str(generation)
+        self._count(hit=raw is not None)
+        return (json.loads(raw) if raw is not None else None), generation
+
+    def set(self, user_id: str, key: str, listing: dict, generation: Optional[str]) -> None:
+        """
+        Сохранить список задач под поколением, полученным в get до чтения из базы.
+        """
+        if generation is None:
+            return
+        try:
+            self.redis.set(f"{self._list_prefix(user_id)}{generation}:{key}", json.dumps(listing),
+                           px=int(self.ttl * 1000))
+        except RedisError as e:
+            logger.warning(f"Не удалось сохранить список задач пользователя {user_id} в Redis: {e}")
+
+    def invalidate(self, *user_ids: str) -> None:
+        """
+        Сделать недействительными все закэшированные списки задач пользователей.
+        """
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.set(self._generation_key(user_id), _new_generation())
+            pipe.execute()
+        except RedisError as e:
+            logger.error(f"Не удалось инвалидировать кэш задач пользователей {list(user_ids)}: {e}")
+
+    def stats(self) -> dict:
+        """Счётчики попаданий и промахов кэша в текущем процессе."""
+        with self._stats_lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+class _NoopTaskListCache:
+    """Заглушка для отключённого кэша списков задач."""
+
+    def get(self, user_id: str, key: str) -> Tuple[Optional[dict], Optional[str]]:
+        return None, None
+
+    def set(self, user_id: str, key: str, listing: dict, generation: Optional[str]) -> None:
+        pass
+
+    def invalidate(self, *user_ids: str) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"hits": 0, "misses": 0}
+
+
+_task_list_cache = None
+_task_list_cache_lock = threading.Lock()
+
+
+def get_task_list_cache():
+    """
+    Получить кэш списков задач процесса, создав его при первом вызове.
+    """
+    global _task_list_cache
+    with _task_list_cache_lock:
+        if _task_list_cache is None:
+            if TASKS_CACHE_ENABLED:
+                _task_list_cache = TaskListCache(get_redis(), TASKS_CACHE_TTL_SECONDS)
+            else:
+                _task_list_cache = _NoopTaskListCache()
+        return _task_list_cache
@@ -0,0 +1,94 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.metrics import LATENCY_BUCKETS_MS, LatencyHistogram
+
+
+class PoolMetrics:
+    """
+    Счётчики получения соединений из пула: гистограмма задержки, суммарное
+    ожидание и количество таймаутов.
+    """
+
+    def __init__(self, buckets_ms: tuple = LATENCY_BUCKETS_MS):
+        self.latency = LatencyHistogram(buckets_ms)
+        self.checkouts = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, timed_out: bool = False) -> None:
+        self.latency.record(seconds)
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+
+    def snapshot(self) -> dict:
+        """Текущие значения счётчиков; корзины гистограммы накопительные, как в Prometheus."""
+        latency = self.latency.snapshot()
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": latency["sum_seconds"],
+            "wait_seconds_max": latency["max_seconds"],
+            "checkout_latency_ms": latency["latency_ms"],
+        }
+
+
+class _InstrumentedPoolMixin:
+    """
+    Замеряет время получения соединения из пула, включая ожидание свободного
+    соединения и открытие нового.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() пересоздаёт пул; счётчики процесса сохраняются
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    """QueuePool со сбором метрик получения соединений."""
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool со сбором метрик получения соединений."""
+
+
+def pool_stats(pool) -> dict:
+    """
+    Состояние пула соединений и метрики получения соединений.
+
+    :param pool: Пул движка (``engine.pool``).
+    """
+    stats = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+        "timeout_seconds": pool.timeout(),
+    }
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats.update(metrics.snapshot())
+    return stats
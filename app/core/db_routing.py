@@ -0,0 +1,231 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import List, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import READ_YOUR_WRITES_SECONDS
+from app.core.logger import logger
+from app.core.redis_client import get_redis
+
+
+class ReplicaSet:
+    """
+    Реплики для чтения с выбором по кругу и временным исключением недоступных.
+
+    Реплика, на которой произошёл разрыв соединения или ошибка подключения,
+    исключается на eject_seconds и затем снова получает запросы; если она всё
+    ещё недоступна, первая же ошибка исключает её повторно.
+    """
+
+    def __init__(self, engines: List[Engine], eject_seconds: float):
+        self.engines = engines
+        self.eject_seconds = eject_seconds
+        self._ejected_until = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        for engine in engines:
+            event.listen(engine, "handle_error", self._handle_error)
+
+    def __len__(self) -> int:
+        return len(self.engines)
+
+    def choose(self) -> Optional[Engine]:
+        """
+        Следующая доступная реплика или None, если все исключены.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for _ in range(len(self.engines)):
+                engine = self.engines[self._next % len(self.engines)]
+                self._next += 1
+                if self._ejected_until.get(engine, 0) <= now:
+                    return engine
+        return None
+
+    def is_available(self, engine: Engine) -> bool:
+        return self._ejected_until.get(engine, 0) <= time.monotonic()
+
+    def eject(self, engine: Engine) -> None:
+        with self._lock:
+            self._ejected_until[engine] = time.monotonic() + self.eject_seconds
+        logger.warning(f"Реплика {engine.url.render_as_string(hide_password=True)} исключена "
+                       f"на {self.eject_seconds} сек.")
+
+    def _handle_error(self, context) -> None:
+        # Ошибки SQL реплику не исключают, только разрыв соединения или сбой подключения
+        if context.is_disconnect or context.connection is None:
+            self.eject(context.engine)
+
+
+class RoutingSession(Session):
+    """
+    Сессия, направляющая SELECT внутри replica_reads на реплику.
+
+    Всё остальное идёт на primary: запись, flush, SELECT ... FOR UPDATE и любые
+    чтения после того, как сессия что-либо записала. Сессия держится одной
+    реплики, пока та доступна.
+    """
+
+    def __init__(self, *args, replicas: Optional[ReplicaSet] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+        self._replica: Optional[Engine] = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            self.replicas
+            and self.info.get("read_replica")
+            and not self.info.get("wrote")
+            and not self._flushing
+            and clause is not None
+            and clause.is_select
+            and getattr(clause, "_for_update_arg", None) is None
+        ):
+            if self._replica is None or not self.replicas.is_available(self._replica):
+                self._replica = self.replicas.choose()
+            if self._replica is not None:
+                return self._replica
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_flush_write(session: Session, flush_context) -> None:
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _mark_dml_write(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _pin_users_after_commit(session: Session) -> None:
+    user_ids = session.info.pop("pin_users", None)
+    if user_ids:
+        get_primary_pins().pin(*user_ids)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _discard_user_pins(session: Session) -> None:
+    session.info.pop("pin_users", None)
+
+
+class PrimaryPins:
+    """
+    Окно read-your-writes: после изменения данных пользователя его чтения
+    в течение ttl секунд идут на primary во всех процессах (ключи в Redis).
+    """
+
+    def __init__(self, redis_client, ttl: float, prefix: str = "primary_pin"):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def pin(self, *user_ids: str) -> None:
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.set(f"{self.prefix}:{user_id}", 1, px=int(self.ttl * 1000))
+            pipe.execute()
+        except RedisError as e:
+            logger.error(f"Не удалось закрепить пользователей {list(user_ids)} за primary: {e}")
+
+    def is_pinned(self, user_id: str) -> bool:
+        try:
+            return bool(self.redis.exists(f"{self.prefix}:{user_id}"))
+        except RedisError as e:
+            # Без Redis нельзя проверить окно, поэтому безопаснее читать с primary
+            logger.warning(f"Redis недоступен, чтение пользователя {user_id} идёт на primary: {e}")
+            return True
+
+
+_primary_pins = None
+
+
+def get_primary_pins() -> PrimaryPins:
+    global _primary_pins
+    if _primary_pins is None:
+        _primary_pins = PrimaryPins(get_redis(), READ_YOUR_WRITES_SECONDS)
+    return _primary_pins
+
+
+def _routing_session(db) -> Optional[RoutingSession]:
+    session = getattr(db, "sync_session", db)  # AsyncSession работает поверх обычной Session
+    if isinstance(session, RoutingSession) and session.replicas:
+        return session
+    return None
+
+
+def pin_to_primary(db, user_id: str) -> None:
+    """
+    Закрепить чтения пользователя за primary после commit текущей транзакции.
+    """
+    session = _routing_session(db)
+    if session is not None:
+        session.info.setdefault("pin_users", set()).add(user_id)
+
+
+@contextmanager
+def replica_reads(db, user_id: Optional[str] = None):
+    """
+    Направить SELECT внутри блока на реплику.
+
+    Если задан user_id и пользователь недавно менял данные, чтение остаётся на primary.
+    Без настроенных реплик блок ничего не меняет.
+    """
+    session = _routing_session(db)
+    if session is None or session.info.get("read_replica"):
+        yield
+        return
+
+    if user_id is not None:
+        pinned = session.info.setdefault("pinned_users", {})
+        if user_id not in pinned:
+            pinned[user_id] = get_primary_pins().is_pinned(user_id)
+        if pinned[user_id]:
+            yield
+            return
+
+    session.info["read_replica"] = True
+    try:
+        yield
+    finally:
+        session.info.pop("read_replica", None)
+
+
+@asynccontextmanager
+async def async_replica_reads(db, user_id: Optional[str] = None):
+    """
+    replica_reads для AsyncSession.
+
+    Окно read-your-writes пользователя проверяется в пуле потоков один раз на сессию,
+    поэтому синхронный запрос к Redis не занимает цикл событий.
+    """
+    session = _routing_session(db)
+    if session is not None and user_id is not None:
+        pinned = session.info.setdefault("pinned_users", {})
+        if user_id not in pinned:
+            pinned[user_id] = await asyncio.to_thread(get_primary_pins().is_pinned, user_id)
+    with replica_reads(db, user_id):
+        yield
+
+
+async def commit_and_pin(db) -> None:
+    """
+    Зафиксировать транзакцию AsyncSession и закрепить пользователей за primary в пуле потоков.
+
+    Пользователи забираются из сессии до commit, чтобы обработчик after_commit
+    не обращался к Redis из цикла событий.
+    """
+    session = _routing_session(db)
+    user_ids = session.info.pop("pin_users", None) if session is not None else None
+    await db.commit()
+    if user_ids:
+        await asyncio.to_thread(get_primary_pins().pin, *user_ids)
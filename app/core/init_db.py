@@ -1,8 +1,81 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from app.core.config import REMINDER_INTERVAL_MINUTES
 from app.core.db import Base, engine
+from app.models import notification, task, user  # noqa: F401 — регистрация моделей в Base.metadata
+from app.models.task import Task
+
+
+def _add_missing_columns(conn: Connection) -> set:
+    """
+    Добавить в существующие таблицы колонки, которых в них ещё нет.
+
+    create_all не меняет существующие таблицы, поэтому колонки, добавленные
+    в модели позже, добавляются ALTER TABLE. NOT NULL колонки должны иметь
+    server_default, иначе существующие строки не получат значения.
+
+    :return: Добавленные колонки в виде "таблица.колонка".
+    """
+    inspector = inspect(conn)
+    added = set()
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                raise RuntimeError(f"Колонку {table.name}.{column.name} нельзя добавить без server_default")
+            ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+            print(f"Добавлена колонка {table.name}.{column.name}")
+            added.add(f"{table.name}.{column.name}")
+    return added
+
+
+def _create_missing_indexes(conn: Connection) -> None:
+    """
+    Создать индексы моделей, которых ещё нет в существующих таблицах.
+
+    Уникальный индекс ux_users_email_lower не создастся, если в базе есть email,
+    отличающиеся только регистром: такие дубликаты нужно разобрать вручную.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            # IF NOT EXISTS вместо checkfirst: индексы по выражениям не видны при рефлексии SQLite
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def _backfill_next_reminder_at(conn: Connection) -> None:
+    """
+    Назначить напоминание невыполненным задачам с уведомлениями, созданным до появления next_reminder_at.
+    """
+    result = conn.execute(
+        update(Task)
+        .where(
+            Task.next_reminder_at.is_(None),
+            Task.completed.isnot(True),
+            Task.email_notification.is_(True) | Task.telegram_notification.is_(True)
+            | Task.sms_notification.is_(True),
+        )
+        .values(next_reminder_at=datetime.utcnow() + timedelta(minutes=REMINDER_INTERVAL_MINUTES))
+    )
+    print(f"Назначено напоминаний существующим задачам: {result.rowcount}")
 
 
-# Создание всех таблиц в базе данных
-def init_db():
+# Создание всех таблиц в базе данных и обновление схемы существующих
+def init_db(bind: Engine = engine):
     print("Создаем таблицы...")
-    Base.metadata.create_all(bind=engine)
-    print("Таблицы успешно созданы.")
\ No newline at end of file
+    # Одна транзакция: при ошибке схема и данные остаются прежними (PostgreSQL)
+    with bind.begin() as conn:
+        Base.metadata.create_all(bind=conn)
+        added = _add_missing_columns(conn)
+        _create_missing_indexes(conn)
+        if "tasks.next_reminder_at" in added:
+            _backfill_next_reminder_at(conn)
+    print("Таблицы успешно созданы.")
@@ -0,0 +1,44 @@
+import bisect
+import threading
+from typing import List
+
+# Границы корзин гистограмм задержек по умолчанию, мс
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    """
+    Потокобезопасная гистограмма задержек в памяти процесса.
+    """
+
+    def __init__(self, buckets_ms: tuple = LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self._counts: List[int] = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.sum_seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets_ms, seconds * 1000)] += 1
+            self.count += 1
+            self.sum_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def buckets(self) -> dict:
+        """Накопительные корзины, как в Prometheus: количество значений не больше границы."""
+        with self._lock:
+            histogram, total = {}, 0
+            for bound, count in zip(self.buckets_ms + ("+Inf",), self._counts):
+                total += count
+                histogram[str(bound)] = total
+            return histogram
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum_seconds": round(self.sum_seconds, 6),
+            "max_seconds": round(self.max_seconds, 6),
+            "latency_ms": self.buckets(),
+        }
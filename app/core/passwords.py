@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from app.core.config import PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_QUEUE_SIZE, PASSWORD_HASH_WORKERS
+from app.core.logger import logger
+from app.core.metrics import LatencyHistogram
+
+# Настройка контекста для хэширования паролей
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# Функции верхнего уровня, чтобы их можно было выполнить в дочернем процессе
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasherBusyError(Exception):
+    """Очередь хэширования паролей заполнена, запрос нужно повторить позже."""
+
+
+class PasswordHasher:
+    """
+    Хэширование и проверка паролей bcrypt в отдельном ограниченном пуле.
+
+    Одновременно принимается не больше max_pending вызовов (выполняемые и ожидающие);
+    следующий сразу получает PasswordHasherBusyError, а не встаёт в очередь.
+    Так всплеск входов не занимает общий пул потоков API и не копит задержку.
+    """
+
+    def __init__(self, executor: Executor, max_pending: int):
+        self.executor = executor
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.latency = {"hash": LatencyHistogram(), "verify": LatencyHistogram()}
+        self._lock = threading.Lock()
+
+    def _submit(self, operation: str, fn, *args) -> Future:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                logger.warning(f"Очередь хэширования паролей заполнена ({self.pending}), запрос отклонён")
+                raise PasswordHasherBusyError("Password hashing queue is full")
+            self.pending += 1
+
+        started = time.perf_counter()
+
+        def done(_: Future) -> None:
+            self.latency[operation].record(time.perf_counter() - started)
+            with self._lock:
+                self.pending -= 1
+
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(done)
+        return future
+
+    def hash(self, password: str) -> str:
+        return self._submit("hash", _hash, password).result()
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self._submit("verify", _verify, plain_password, hashed_password).result()
+
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit("hash", _hash, password))
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        return await asyncio.wrap_future(self._submit("verify", _verify, plain_password, hashed_password))
+
+    def stats(self) -> dict:
+        """Текущая загрузка пула и задержки вызовов (включая ожидание в очереди)."""
+        return {
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "hash": self.latency["hash"].snapshot(),
+            "verify": self.latency["verify"].snapshot(),
+        }
+
+
+_password_hasher = None
+_password_hasher_lock = threading.Lock()
+
+
+def get_password_hasher() -> PasswordHasher:
+    """
+    Получить пул хэширования паролей процесса, создав его при первом вызове.
+    """
+    global _password_hasher
+    with _password_hasher_lock:
+        if _password_hasher is None:
+            if PASSWORD_HASH_EXECUTOR == "thread":
+                executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+            else:
+                executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+            _password_hasher = PasswordHasher(executor, PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_SIZE)
+        return _password_hasher
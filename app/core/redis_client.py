@@ -0,0 +1,31 @@
+import threading
+from typing import Optional
+
+import redis
+
+from app.core.config import REDIS_URL
+from app.core.logger import logger
+
+_redis: Optional[redis.Redis] = None
+_redis_lock = threading.Lock()
+
+
+def get_redis() -> redis.Redis:
+    """
+    Получить клиент Redis, создав его при первом вызове.
+
+    Клиент потокобезопасен и сам пересоздаёт соединения после fork.
+    При REDIS_URL="fakeredis://" используется Redis в памяти процесса.
+    """
+    global _redis
+    with _redis_lock:
+        if _redis is None:
+            if REDIS_URL.startswith("fakeredis://"):
+                import fakeredis
+
+                logger.info("Используется Redis в памяти процесса (fakeredis)")
+                _redis = fakeredis.FakeRedis()
+            else:
+                logger.info(f"Подключение к Redis: {REDIS_URL}")
+                _redis = redis.Redis.from_url(REDIS_URL)
+        return _redis
@@ -0,0 +1,106 @@
+import time
+
+from app.core.config import REFRESH_TOKEN_EXPIRE_DAYS
+from app.core.logger import logger
+from app.core.redis_client import get_redis
+
+# Результаты проверки refresh-токена
+TOKEN_OK = "ok"
+TOKEN_REVOKED = "revoked"
+TOKEN_REUSED = "reused"
+
+# Атомарно проверяет отзыв и помечает refresh-токен использованным.
+# KEYS: использованный jti, отозванное семейство, время отзыва токенов пользователя.
+# ARGV: оставшийся срок токена (мс), срок жизни семейства (мс), iat токена.
+# Повторное использование токена отзывает всё семейство: украденный и
+# законный экземпляры больше не обновятся, пользователь войдёт заново.
+REFRESH_ROTATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 'revoked'
+end
+local revoked_before = redis.call('GET', KEYS[3])
+if revoked_before and tonumber(ARGV[3]) <= tonumber(revoked_before) then
+    return 'revoked'
+end
+if not redis.call('SET', KEYS[1], 1, 'NX', 'PX', ARGV[1]) then
+    redis.call('SET', KEYS[2], 1, 'PX', ARGV[2])
+    return 'reused'
+end
+return 'ok'
+"""
+
+
+class RefreshTokenStore:
+    """
+    Хранилище отзыва refresh-токенов в Redis.
+
+    Каждый refresh-токен одноразовый: при обновлении его ``jti`` помечается
+    использованным, а клиент получает новый токен того же семейства (``fam``).
+    Ключи живут не дольше токенов, к которым относятся, поэтому проверка —
+    один запрос к Redis без обращения к базе.
+    """
+
+    def __init__(self, redis_client, family_ttl: float, prefix: str = "refresh"):
+        self.redis = redis_client
+        self.family_ttl = family_ttl
+        self.prefix = prefix
+        self._script = redis_client.register_script(REFRESH_ROTATE_SCRIPT)
+
+    def _family_key(self, family: str) -> str:
+        return f"{self.prefix}:family:{family}"
+
+    def _user_key(self, user_id: str) -> str:
+        return f"{self.prefix}:user:{user_id}"
+
+    def rotate(self, payload: dict) -> str:
+        """
+        Пометить refresh-токен использованным.
+
+        :param payload: Проверенный payload токена с ``jti``, ``fam``, ``sub``, ``iat`` и ``exp``.
+        :return: TOKEN_OK, TOKEN_REVOKED или TOKEN_REUSED.
+        :raises RedisError: Если Redis недоступен.
+        """
+        remaining_ms = max(int((payload["exp"] - time.time()) * 1000), 1)
+        keys = [
+            f"{self.prefix}:used:{payload['jti']}",
+            self._family_key(payload["fam"]),
+            self._user_key(payload["sub"]),
+        ]
+        args = [remaining_ms, int(self.family_ttl * 1000), payload["iat"]]
+        result = self._script(keys=keys, args=args)
+        result = result.decode() if isinstance(result, bytes) else result
+        if result == TOKEN_REUSED:
+            logger.warning(f"Повторное использование refresh-токена пользователя {payload['sub']}, "
+                           f"семейство {payload['fam']} отозвано")
+        return result
+
+    def revoke_family(self, family: str) -> None:
+        """
+        Отозвать все refresh-токены семейства (выход из одной сессии).
+
+        :raises RedisError: Если Redis недоступен.
+        """
+        self.redis.set(self._family_key(family), 1, px=int(self.family_ttl * 1000))
+
+    def revoke_user(self, user_id: str) -> None:
+        """
+        Отозвать все выданные пользователю refresh-токены (компрометация аккаунта).
+
+        Токены, выданные позже текущей секунды, продолжают действовать.
+
+        :raises RedisError: Если Redis недоступен.
+        """
+        self.redis.set(self._user_key(user_id), int(time.time()), px=int(self.family_ttl * 1000))
+
+
+_refresh_token_store = None
+
+
+def get_refresh_token_store() -> RefreshTokenStore:
+    """
+    Получить хранилище отзыва refresh-токенов, создав его при первом вызове.
+    """
+    global _refresh_token_store
+    if _refresh_token_store is None:
+        _refresh_token_store = RefreshTokenStore(get_redis(), REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600)
+    return _refresh_token_store
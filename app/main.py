@@ -1,13 +1,28 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 
+from app.core.config import DB_ASYNC_ENABLED
 from app.core.init_db import init_db
-from app.routers import auth, tasks
+from app.core.passwords import PasswordHasherBusyError
+from app.routers import auth, auth_async, internal, tasks, tasks_async
 
 app = FastAPI()
 
+@app.exception_handler(PasswordHasherBusyError)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusyError):
+    # Пул bcrypt перегружен: быстрый отказ вместо очереди, которая задержит весь API
+    return JSONResponse(status_code=503, content={"detail": "Service busy, retry later"}, headers={"Retry-After": "1"})
+
 @app.on_event("startup")
 async def startup_event():
     init_db()
 
-app.include_router(auth.router)
-app.include_router(tasks.router)
+# Синхронные маршруты занимают поток из пула AnyIO на всё время запроса к базе,
+# асинхронные ждут ответа базы в цикле событий
+if DB_ASYNC_ENABLED:
+    app.include_router(auth_async.router)
+    app.include_router(tasks_async.router)
+else:
+    app.include_router(auth.router)
+    app.include_router(tasks.router)
+app.include_router(internal.router)
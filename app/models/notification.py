@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from sqlalchemy import Column, String, Integer, Text, DateTime, Index
+from app.core.db import Base
+
+
+class NotificationOutbox(Base):
+    """
+    Исходящее уведомление, ожидающее доставки (transactional outbox).
+    """
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True)
+    channel = Column(String, nullable=False)      # email, telegram или sms
+    recipient = Column(String, nullable=False)    # Email, Telegram Chat ID или номер телефона
+    subject = Column(String, nullable=True)       # Тема (только для email)
+    body = Column(Text, nullable=False)
+
+    user_id = Column(String, nullable=False)
+    task_id = Column(Integer, nullable=True)      # NULL для сводных напоминаний
+
+    # pending — ожидает отправки, sent — отправлено, failed — исчерпаны попытки
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Частичный индекс по очереди на отправку
+        Index(
+            "ix_notification_outbox_pending",
+            id,
+            postgresql_where=(status == "pending"),
+            sqlite_where=(status == "pending"),
+        ),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, ForeignKey
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.core.db import Base
 
@@ -18,6 +18,30 @@ class Task(Base):
     telegram_notification = Column(Boolean, default=False)
     sms_notification = Column(Boolean, default=False)
 
+    # Версия задачи: увеличивается при каждом изменении (для ETag)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # Время следующего напоминания (UTC); NULL — напоминать не нужно
+    next_reminder_at = Column(DateTime, nullable=True)
+
     # Связь с пользователем
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
-    user = relationship("User", back_populates="tasks", lazy="joined")
+    # Загружается лениво; нужные стратегии загрузки задаются в запросах сервисов
+    user = relationship("User", back_populates="tasks", lazy="select")
+
+    __table_args__ = (
+        # Keyset-пагинация списка задач пользователя: сортировка и фильтры
+        Index("ix_tasks_user_id_id", user_id, id),
+        Index("ix_tasks_user_id_title_id", user_id, title, id),
+        Index("ix_tasks_user_id_completed_id", user_id, completed, id),
+        Index("ix_tasks_user_id_email_notification_id", user_id, email_notification, id),
+        Index("ix_tasks_user_id_telegram_notification_id", user_id, telegram_notification, id),
+        Index("ix_tasks_user_id_sms_notification_id", user_id, sms_notification, id),
+        # Частичный индекс только по задачам, ожидающим напоминания
+        Index(
+            "ix_tasks_due_reminders",
+            next_reminder_at,
+            postgresql_where=(next_reminder_at.isnot(None)) & (completed == False),
+            sqlite_where=(next_reminder_at.isnot(None)) & (completed == False),
+        ),
+    )
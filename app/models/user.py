@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean
+from sqlalchemy import Column, String, Boolean, BigInteger, Index, func
 from sqlalchemy.orm import relationship
 from app.core.db import Base
 
@@ -18,5 +18,14 @@ class User(Base):
     telegram_chat_id = Column(String, nullable=True)  # ID чата для отправки сообщений
     phone_number = Column(String, nullable=True)
 
-    # Реляция для связи с задачами
-    tasks = relationship("Task", back_populates="user", lazy="joined")
+    # Версия списка задач: увеличивается при каждом изменении задач пользователя (для ETag)
+    tasks_version = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+    # Реляция для связи с задачами (загружается лениво, задачи пользователя
+    # запрашиваются отдельно сервисами задач)
+    tasks = relationship("Task", back_populates="user", lazy="select")
+
+    __table_args__ = (
+        # Email уникален без учёта регистра; по этому же выражению ищется пользователь при входе
+        Index("ux_users_email_lower", func.lower(email), unique=True),
+    )
@@ -1,44 +1,43 @@
-from uuid import uuid4
+import math
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException, Response, Request
+from redis.exceptions import RedisError
 from sqlalchemy.orm import Session
 from app.core.config import ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
 from app.core.db import get_db
 from app.core.logger import logger
-from app.models.user import User
+from app.core.refresh_tokens import TOKEN_OK, get_refresh_token_store
 from app.schemas.auth import UserCreate, UserLogin, UserResponse
 from app.services.auth import (
+    TOKEN_TYPE_ACCESS,
+    TOKEN_TYPE_REFRESH,
     hash_password,
     verify_password,
     create_access_token,
     create_refresh_token,
+    create_user,
     decode_token,
+    get_user_by_email,
+    get_user_principal,
 )
+from app.utils.rate_limit import get_auth_rate_limiter
 
 router = APIRouter()
 
 
-def get_user_by_id(user_id: str, db: Session) -> User:
-    """Получить пользователя по ID."""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        logger.warning(f"Пользователь с ID {user_id} не найден")
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
-
-
-def get_user_by_email(email: str, db: Session) -> User:
-    """Получить пользователя по email."""
-    return db.query(User).filter(User.email == email).first()
-
-
-def get_user_from_token(request: Request, db: Session) -> User:
-    """Получить пользователя из токена доступа."""
+def get_user_from_token(request: Request, db: Session) -> UserResponse:
+    """Получить пользователя из токена доступа (через кэш пользователей)."""
     payload = validate_access_token(request)
     user_id = payload.get("sub")
     if not user_id:
         logger.warning("ID пользователя отсутствует в токене")
         raise HTTPException(status_code=401, detail="Invalid access token")
-    return get_user_by_id(user_id, db)
+    user = get_user_principal(db, user_id, expires_at=payload.get("exp"))
+    if not user:
+        logger.warning(f"Пользователь с ID {user_id} не найден")
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
 
 
 def validate_access_token(request: Request) -> dict:
@@ -49,83 +48,152 @@ def validate_access_token(request: Request) -> dict:
         raise HTTPException(status_code=401, detail="Access token missing")
     try:
         payload = decode_token(access_token)
-        logger.info("Токен успешно декодирован")
-        return payload
     except Exception as e:
         logger.error(f"Ошибка декодирования токена: {e}")
         raise HTTPException(status_code=401, detail="Invalid access token")
+    if payload.get("typ") != TOKEN_TYPE_ACCESS:
+        logger.warning(f"Вместо access-токена передан токен типа {payload.get('typ')}")
+        raise HTTPException(status_code=401, detail="Invalid access token")
+    logger.info("Токен успешно декодирован")
+    return payload
+
+
+def throttle(request: Request, action: str, email: Optional[str] = None) -> None:
+    """
+    Проверить частоту запросов действия с IP клиента и для email до обращения к базе и bcrypt.
+
+    :raises HTTPException: 429 с заголовком Retry-After, если лимит превышен.
+    """
+    ip = request.client.host if request.client else None
+    wait = get_auth_rate_limiter().hit(action, ip=ip, email=email)
+    if wait > 0:
+        logger.warning(f"Превышена частота запросов {action} с IP {ip}" + (f" для {email}" if email else ""))
+        raise HTTPException(status_code=429, detail="Too many requests",
+                            headers={"Retry-After": str(math.ceil(wait))})
+
+
+def set_auth_cookies(response: Response, user_id: str, family: Optional[str] = None) -> None:
+    """Сгенерировать access- и refresh-токены и установить их в куки."""
+    access_token = create_access_token(data={"sub": user_id})
+    refresh_token = create_refresh_token(data={"sub": user_id}, family=family)
+    response.set_cookie(
+        key="access_token", value=access_token, httponly=True, max_age=60 * ACCESS_TOKEN_EXPIRE_MINUTES
+    )
+    response.set_cookie(
+        key="refresh_token", value=refresh_token, httponly=True, max_age=60 * 60 * 24 * REFRESH_TOKEN_EXPIRE_DAYS
+    )
+
+
+def decode_refresh_token(request: Request) -> dict:
+    """
+    Извлечь и декодировать refresh-токен из кук.
+
+    :raises HTTPException: Если токен отсутствует, недействителен, не является refresh-токеном
+        или выдан без ротации.
+    """
+    refresh_token = request.cookies.get("refresh_token")
+    if not refresh_token:
+        logger.warning("Refresh токен отсутствует")
+        raise HTTPException(status_code=401, detail="Refresh token missing")
+    try:
+        payload = decode_token(refresh_token)
+    except HTTPException as e:
+        logger.error(f"Ошибка декодирования refresh токена: {e.detail}")
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    # Токены без jti выданы до ротации и не могут быть отозваны; access-токен не обновляет сессию
+    if payload.get("typ") != TOKEN_TYPE_REFRESH or not all(
+            payload.get(claim) for claim in ("sub", "jti", "fam", "iat")):
+        logger.warning("В refresh токене отсутствуют обязательные поля")
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    return payload
+
+
+def rotate_refresh_token(request: Request, response: Response) -> str:
+    """
+    Пометить refresh-токен из кук использованным и установить новую пару токенов того же семейства.
+
+    Проверка выполняется одним запросом к Redis, без обращения к базе.
+
+    :return: ID пользователя.
+    :raises HTTPException: 401, если токен недействителен, отозван или уже использован;
+        503, если хранилище отзыва недоступно.
+    """
+    payload = decode_refresh_token(request)
+    try:
+        status = get_refresh_token_store().rotate(payload)
+    except RedisError as e:
+        logger.error(f"Хранилище отзыва refresh токенов недоступно: {e}")
+        raise HTTPException(status_code=503, detail="Service busy, retry later", headers={"Retry-After": "1"})
+    if status != TOKEN_OK:
+        logger.warning(f"Refresh токен пользователя {payload['sub']} отклонён: {status}")
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+
+    set_auth_cookies(response, payload["sub"], family=payload["fam"])
+    return payload["sub"]
+
+
+def revoke_refresh_token(request: Request, response: Response) -> None:
+    """
+    Отозвать семейство refresh-токена из кук и удалить куки аутентификации.
+
+    :raises HTTPException: 503, если хранилище отзыва недоступно.
+    """
+    try:
+        payload = decode_refresh_token(request)
+    except HTTPException:
+        payload = None
+    if payload is not None:
+        try:
+            get_refresh_token_store().revoke_family(payload["fam"])
+        except RedisError as e:
+            logger.error(f"Не удалось отозвать refresh токен пользователя {payload['sub']}: {e}")
+            raise HTTPException(status_code=503, detail="Service busy, retry later", headers={"Retry-After": "1"})
+        logger.info(f"Refresh токены сессии пользователя {payload['sub']} отозваны")
+    response.delete_cookie("access_token")
+    response.delete_cookie("refresh_token")
 
 
 @router.post("/auth/register", response_model=UserResponse)
 def register(user: UserCreate, db: Session = Depends(get_db)):
     """Регистрация нового пользователя."""
-    if get_user_by_email(user.email, db):
+    hashed_password = hash_password(user.password)
+    new_user = create_user(db, user.email, hashed_password, user.phone_number)
+    if new_user is None:
         logger.warning(f"Попытка регистрации с уже существующим email: {user.email}")
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = hash_password(user.password)
-    new_user = User(
-        id=str(uuid4()),
-        email=user.email,
-        hashed_password=hashed_password,
-        phone_number=user.phone_number,
-    )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
     logger.info(f"Зарегистрирован новый пользователь: {user.email}")
     return new_user
 
 
 @router.post("/auth/login")
-def login(user: UserLogin, response: Response, db: Session = Depends(get_db)):
+def login(user: UserLogin, request: Request, response: Response, db: Session = Depends(get_db)):
     """Авторизация пользователя и установка токенов."""
-    db_user = get_user_by_email(user.email, db)
+    throttle(request, "login", email=user.email)
+    db_user = get_user_by_email(db, user.email)
     if not db_user or not verify_password(user.password, db_user.hashed_password):
         logger.warning(f"Неудачная попытка входа для {user.email}")
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
-    # Генерация токенов
-    access_token = create_access_token(data={"sub": db_user.id})
-    refresh_token = create_refresh_token(data={"sub": db_user.id})
-
-    # Установка токенов в куки
-    response.set_cookie(
-        key="access_token", value=access_token, httponly=True, max_age=60 * ACCESS_TOKEN_EXPIRE_MINUTES
-    )
-    response.set_cookie(
-        key="refresh_token", value=refresh_token, httponly=True, max_age=60 * 60 * 24 * REFRESH_TOKEN_EXPIRE_DAYS
-    )
+    set_auth_cookies(response, db_user.id)
     logger.info(f"Успешный вход для пользователя {user.email}")
     return {"message": "Login successful"}
 
 
 @router.post("/auth/refresh")
-def refresh_token(request: Request, response: Response, db: Session = Depends(get_db)):
-    """Обновление токена доступа."""
-    refresh_token = request.cookies.get("refresh_token")
-    if not refresh_token:
-        logger.warning("Refresh токен отсутствует")
-        raise HTTPException(status_code=401, detail="Refresh token missing")
+def refresh_token(request: Request, response: Response):
+    """Обновление токенов: refresh-токен одноразовый и заменяется новым."""
+    throttle(request, "refresh")
+    user_id = rotate_refresh_token(request, response)
+    logger.info(f"Токены обновлены для пользователя {user_id}")
+    return {"message": "Token refreshed"}
 
-    try:
-        payload = decode_token(refresh_token)
-        user_id = payload.get("sub")
-        if not user_id:
-            logger.warning("ID пользователя отсутствует в refresh токене")
-            raise HTTPException(status_code=401, detail="Invalid refresh token")
-        get_user_by_id(user_id, db)  # Проверка существования пользователя
-    except Exception as e:
-        logger.error(f"Ошибка декодирования refresh токена: {e}")
-        raise HTTPException(status_code=401, detail="Invalid refresh token")
 
-    # Генерация нового Access Token
-    new_access_token = create_access_token(data={"sub": user_id})
-    response.set_cookie(
-        key="access_token", value=new_access_token, httponly=True, max_age=60 * ACCESS_TOKEN_EXPIRE_MINUTES
-    )
-    logger.info(f"Access токен обновлен для пользователя {user_id}")
-    return {"message": "Token refreshed"}
+@router.post("/auth/logout")
+def logout(request: Request, response: Response):
+    """Выход: отзыв refresh-токенов текущей сессии и удаление кук."""
+    revoke_refresh_token(request, response)
+    return {"message": "Logged out"}
 
 
 @router.get("/auth/me", response_model=UserResponse)
@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import get_async_db
+from app.core.logger import logger
+from app.routers.auth import (
+    revoke_refresh_token,
+    rotate_refresh_token,
+    set_auth_cookies,
+    throttle,
+    validate_access_token,
+)
+from app.schemas.auth import UserCreate, UserLogin, UserResponse
+from app.services.auth_async import (
+    create_user,
+    get_user_by_email,
+    get_user_principal,
+    hash_password,
+    verify_password,
+)
+
+# Маршруты аутентификации на AsyncSession; повторяют app.routers.auth и подключаются при DB_ASYNC_ENABLED.
+# Лимиты частоты и хранилище отзыва refresh-токенов работают с синхронным клиентом Redis,
+# поэтому вызываются через пул потоков, не занимая цикл событий.
+router = APIRouter()
+
+
+@router.post("/auth/register", response_model=UserResponse)
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    """Регистрация нового пользователя."""
+    hashed_password = await hash_password(user.password)
+    new_user = await create_user(db, user.email, hashed_password, user.phone_number)
+    if new_user is None:
+        logger.warning(f"Попытка регистрации с уже существующим email: {user.email}")
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    logger.info(f"Зарегистрирован новый пользователь: {user.email}")
+    return new_user
+
+
+@router.post("/auth/login")
+async def login(user: UserLogin, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """Авторизация пользователя и установка токенов."""
+    await run_in_threadpool(throttle, request, "login", email=user.email)
+    db_user = await get_user_by_email(db, user.email)
+    if not db_user or not await verify_password(user.password, db_user.hashed_password):
+        logger.warning(f"Неудачная попытка входа для {user.email}")
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+
+    set_auth_cookies(response, db_user.id)
+    logger.info(f"Успешный вход для пользователя {user.email}")
+    return {"message": "Login successful"}
+
+
+@router.post("/auth/refresh")
+async def refresh_token(request: Request, response: Response):
+    """Обновление токенов: refresh-токен одноразовый и заменяется новым."""
+    await run_in_threadpool(throttle, request, "refresh")
+    user_id = await run_in_threadpool(rotate_refresh_token, request, response)
+    logger.info(f"Токены обновлены для пользователя {user_id}")
+    return {"message": "Token refreshed"}
+
+
+@router.post("/auth/logout")
+async def logout(request: Request, response: Response):
+    """Выход: отзыв refresh-токенов текущей сессии и удаление кук."""
+    await run_in_threadpool(revoke_refresh_token, request, response)
+    return {"message": "Logged out"}
+
+
+@router.get("/auth/me", response_model=UserResponse)
+async def get_me(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Получение данных текущего пользователя."""
+    logger.info("Получен запрос на /auth/me")
+    payload = validate_access_token(request)
+    user_id = payload.get("sub")
+    if not user_id:
+        logger.warning("ID пользователя отсутствует в токене")
+        raise HTTPException(status_code=401, detail="Invalid access token")
+    user = await get_user_principal(db, user_id, expires_at=payload.get("exp"))
+    if not user:
+        logger.warning(f"Пользователь с ID {user_id} не найден")
+        raise HTTPException(status_code=404, detail="User not found")
+    logger.info(f"Пользователь найден: {user.email}")
+    return user
@@ -0,0 +1,83 @@
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from redis.exceptions import RedisError
+
+from app.core.cache import get_task_list_cache, get_token_cache
+from app.core.config import DB_ROLE, INTERNAL_API_TOKEN
+from app.core.db import async_engine, async_replica_engines, engine, replica_engines
+from app.core.db_pool import pool_stats
+from app.core.logger import logger
+from app.core.passwords import get_password_hasher
+from app.core.refresh_tokens import get_refresh_token_store
+
+router = APIRouter(prefix="/internal")
+
+
+def verify_internal_token(x_internal_token: Optional[str] = Header(None)) -> None:
+    """
+    Проверить токен служебных эндпоинтов.
+
+    Пока INTERNAL_API_TOKEN не задан, эндпоинты недоступны (404).
+    """
+    if not INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_internal_token or "", INTERNAL_API_TOKEN):
+        logger.warning("Запрос к служебному эндпоинту с неверным токеном")
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@router.get("/db/pool", dependencies=[Depends(verify_internal_token)])
+async def get_db_pool_stats():
+    """
+    Состояние пулов соединений процесса: размер, выданные соединения, overflow,
+    ожидание и гистограмма времени получения соединения.
+    """
+    return {
+        "role": DB_ROLE,
+        "sync": pool_stats(engine.pool),
+        "async": pool_stats(async_engine.pool),
+        "replicas": [pool_stats(replica.pool) for replica in replica_engines],
+        "async_replicas": [pool_stats(replica.pool) for replica in async_replica_engines],
+    }
+
+
+@router.get("/passwords", dependencies=[Depends(verify_internal_token)])
+async def get_password_hasher_stats():
+    """
+    Загрузка пула хэширования паролей, отказы и гистограммы задержек bcrypt.
+    """
+    return get_password_hasher().stats()
+
+
+@router.get("/tokens", dependencies=[Depends(verify_internal_token)])
+async def get_token_cache_stats():
+    """
+    Попадания и промахи кэша проверенных JWT.
+    """
+    return get_token_cache().stats()
+
+
+@router.get("/task-cache", dependencies=[Depends(verify_internal_token)])
+async def get_task_list_cache_stats():
+    """
+    Попадания и промахи кэша списков задач.
+    """
+    return get_task_list_cache().stats()
+
+
+@router.post("/users/{user_id}/revoke-tokens", dependencies=[Depends(verify_internal_token)])
+def revoke_user_tokens(user_id: str):
+    """
+    Отозвать все refresh-токены пользователя (компрометация аккаунта).
+
+    Уже выданные access-токены действуют до истечения срока.
+    """
+    try:
+        get_refresh_token_store().revoke_user(user_id)
+    except RedisError as e:
+        logger.error(f"Не удалось отозвать refresh токены пользователя {user_id}: {e}")
+        raise HTTPException(status_code=503, detail="Service busy, retry later", headers={"Retry-After": "1"})
+    logger.info(f"Refresh токены пользователя {user_id} отозваны")
+    return {"message": "Tokens revoked"}
@@ -1,12 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List, Literal, Optional, Tuple
 
+from app.core.cache import get_task_list_cache
+from app.core.config import TASKS_MAX_PAGE_SIZE, TASKS_PAGE_SIZE
 from app.core.db import get_db
 from app.core.logger import logger
-from app.schemas.tasks import Task, TaskCreate, TaskUpdate
+from app.schemas.tasks import (
+    Task,
+    TaskBulkCreate,
+    TaskBulkDelete,
+    TaskBulkItemResult,
+    TaskBulkResponse,
+    TaskBulkUpdate,
+    TaskCreate,
+    TaskUpdate,
+)
 from app.services.tasks import (
-    get_tasks_by_user_id,
+    bulk_create_tasks,
+    bulk_delete_tasks,
+    bulk_update_tasks,
+    get_tasks_page,
+    get_tasks_version,
     create_task_for_user,
     get_task_by_id_and_user,
     update_task_by_id,
@@ -14,9 +29,14 @@ from app.services.tasks import (
 )
 from app.schemas.auth import UserResponse
 from app.services.auth import get_current_user
+from app.utils.etag import digest, etag_matches, make_etag, parse_if_none_match
+from app.utils.pagination import InvalidCursorError
 
 router = APIRouter()
 
+# Клиент может хранить ответ, но обязан перепроверять его через If-None-Match
+CACHE_CONTROL = "private, no-cache"
+
 
 def validate_task_existence(task, task_id, user_id):
     """
@@ -29,16 +49,136 @@ def validate_task_existence(task, task_id, user_id):
         )
 
 
+def not_modified(etag: str) -> Response:
+    """
+    Ответ 304 Not Modified с актуальным ETag.
+    """
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def task_filters(
+    completed: Optional[bool],
+    email_notification: Optional[bool],
+    telegram_notification: Optional[bool],
+    sms_notification: Optional[bool],
+) -> Dict[str, bool]:
+    """
+    Фильтры списка задач из параметров запроса (только заданные).
+    """
+    return {
+        field: value
+        for field, value in (
+            ("completed", completed),
+            ("email_notification", email_notification),
+            ("telegram_notification", telegram_notification),
+            ("sms_notification", sms_notification),
+        )
+        if value is not None
+    }
+
+
+def task_list_cache_entry(tasks, tasks_version: Optional[int], next_cursor: Optional[str]) -> dict:
+    """
+    Запись кэша списков задач: страница вместе с версией, по которой строится ETag.
+    """
+    return {
+        "version": tasks_version,
+        "tasks": [Task.model_validate(task, from_attributes=True).model_dump(mode="json") for task in tasks],
+        "next_cursor": next_cursor,
+    }
+
+
+def bulk_created_response(created) -> TaskBulkResponse:
+    return TaskBulkResponse(results=[
+        TaskBulkItemResult(id=task.id, status="created", task=Task.model_validate(task, from_attributes=True))
+        for task in created
+    ])
+
+
+def bulk_updated_response(items, updated) -> TaskBulkResponse:
+    return TaskBulkResponse(results=[
+        TaskBulkItemResult(id=item.id, status="updated", task=Task.model_validate(task, from_attributes=True))
+        if task else TaskBulkItemResult(id=item.id, status="not_found")
+        for item, task in zip(items, updated)
+    ])
+
+
+def bulk_deleted_response(task_ids, deleted) -> TaskBulkResponse:
+    return TaskBulkResponse(results=[
+        TaskBulkItemResult(id=task_id, status="deleted" if was_deleted else "not_found")
+        for task_id, was_deleted in zip(task_ids, deleted)
+    ])
+
+
+def match_task_etag(client_etags: List[str], tasks_version: Optional[int], task_id: int) -> Optional[str]:
+    """
+    ETag клиента, совпадающий по версии задач пользователя, или None.
+    """
+    user_prefix = make_etag(f"u{tasks_version}", f"t{task_id}.")[:-1]
+    return next((client_etag for client_etag in client_etags if client_etag.startswith(user_prefix)), None)
+
+
+def task_etag(client_etags: List[str], tasks_version: Optional[int], task) -> Tuple[str, bool]:
+    """
+    ETag задачи и признак того, что у клиента та же версия задачи.
+    """
+    etag = make_etag(f"u{tasks_version}", f"t{task.id}.{task.version}")
+    task_suffix = f"-t{task.id}.{task.version}\""
+    return etag, any(client_etag.endswith(task_suffix) for client_etag in client_etags)
+
+
 @router.get("/tasks", response_model=List[Task])
 def list_tasks(
+    request: Request,
+    response: Response,
+    limit: int = Query(TASKS_PAGE_SIZE, ge=1, le=TASKS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: Literal["id", "-id", "title", "-title"] = "id",
+    completed: Optional[bool] = None,
+    email_notification: Optional[bool] = None,
+    telegram_notification: Optional[bool] = None,
+    sms_notification: Optional[bool] = None,
     db: Session = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user),
 ):
     """
-    Получить все задачи текущего пользователя.
+    Получить страницу задач текущего пользователя.
+
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor;
+    на последней странице заголовка нет. ETag зависит от версии задач
+    пользователя и параметров запроса, поэтому If-None-Match проверяется
+    без обращения к таблице задач. При включённом кэше списков страница
+    вместе с версией читается из Redis, и попадание не обращается к базе.
     """
     logger.info(f"Получение задач для пользователя ID {current_user.id}")
-    tasks = get_tasks_by_user_id(db, current_user.id)
+    query_key = digest(current_user.id, sorted(request.query_params.multi_items()))
+    cache = get_task_list_cache()
+    cached, generation = cache.get(current_user.id, query_key)
+    tasks_version = cached["version"] if cached else get_tasks_version(db, current_user.id)
+    etag = make_etag(f"u{tasks_version}", query_key)
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        logger.info(f"Список задач пользователя ID {current_user.id} не изменился")
+        return not_modified(etag)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if cached:
+        logger.info(f"Список задач пользователя ID {current_user.id} получен из кэша")
+        if cached["next_cursor"]:
+            response.headers["X-Next-Cursor"] = cached["next_cursor"]
+        return cached["tasks"]
+
+    filters = task_filters(completed, email_notification, telegram_notification, sms_notification)
+    try:
+        tasks, next_cursor = get_tasks_page(db, current_user.id, limit, cursor, sort, filters)
+    except InvalidCursorError as e:
+        logger.warning(f"Некорректный курсор от пользователя ID {current_user.id}: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    if generation is not None:
+        cache.set(current_user.id, query_key, task_list_cache_entry(tasks, tasks_version, next_cursor), generation)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     logger.info(f"Найдено {len(tasks)} задач для пользователя ID {current_user.id}")
     return tasks
 
@@ -58,18 +198,79 @@ def create_new_task(
     return new_task
 
 
+# Массовые операции объявлены до маршрутов /tasks/{task_id}, иначе "bulk" попадёт в task_id
+@router.post("/tasks/bulk", response_model=TaskBulkResponse, status_code=status.HTTP_201_CREATED)
+def create_tasks_bulk(
+    payload: TaskBulkCreate,
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    """
+    Создать несколько задач текущего пользователя одним запросом.
+    """
+    logger.info(f"Массовое создание {len(payload.tasks)} задач для пользователя ID {current_user.id}")
+    return bulk_created_response(bulk_create_tasks(db, payload.tasks, current_user.id))
+
+
+@router.put("/tasks/bulk", response_model=TaskBulkResponse)
+def update_tasks_bulk(
+    payload: TaskBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    """
+    Обновить несколько задач текущего пользователя одним запросом.
+
+    Задачи, которые не найдены или принадлежат другому пользователю, получают статус not_found.
+    """
+    logger.info(f"Массовое обновление {len(payload.tasks)} задач для пользователя ID {current_user.id}")
+    return bulk_updated_response(payload.tasks, bulk_update_tasks(db, payload.tasks, current_user.id))
+
+
+@router.delete("/tasks/bulk", response_model=TaskBulkResponse)
+def delete_tasks_bulk(
+    payload: TaskBulkDelete,
+    db: Session = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    """
+    Удалить несколько задач текущего пользователя одним запросом.
+    """
+    logger.info(f"Массовое удаление {len(payload.ids)} задач для пользователя ID {current_user.id}")
+    return bulk_deleted_response(payload.ids, bulk_delete_tasks(db, payload.ids, current_user.id))
+
+
 @router.get("/tasks/{task_id}", response_model=Task)
 def read_task(
     task_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user),
 ):
     """
     Получить задачу по ID текущего пользователя.
+
+    ETag вида "u<версия задач пользователя>-t<id>.<версия задачи>": если версия
+    пользователя не изменилась, 304 возвращается без чтения задачи; иначе
+    задача читается и сравнивается её собственная версия.
     """
     logger.info(f"Получение задачи ID {task_id} для пользователя ID {current_user.id}")
+    client_etags = parse_if_none_match(request.headers.get("If-None-Match"))
+    tasks_version = get_tasks_version(db, current_user.id)
+    client_etag = match_task_etag(client_etags, tasks_version, task_id)
+    if client_etag:
+        logger.info(f"Задача ID {task_id} не изменилась (версия пользователя)")
+        return not_modified(client_etag)
+
     task = get_task_by_id_and_user(db, task_id, current_user.id)
     validate_task_existence(task, task_id, current_user.id)
+    etag, unchanged = task_etag(client_etags, tasks_version, task)
+    if unchanged:
+        logger.info(f"Задача ID {task_id} не изменилась (версия задачи)")
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
     logger.info(f"Задача ID {task.id} успешно получена для пользователя ID {current_user.id}")
     return task
 
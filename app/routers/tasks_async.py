@@ -0,0 +1,203 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+
+from app.core.cache import get_task_list_cache
+from app.core.config import TASKS_MAX_PAGE_SIZE, TASKS_PAGE_SIZE
+from app.core.db import get_async_db
+from app.core.logger import logger
+from app.routers.tasks import (
+    CACHE_CONTROL,
+    bulk_created_response,
+    bulk_deleted_response,
+    bulk_updated_response,
+    match_task_etag,
+    not_modified,
+    task_etag,
+    task_filters,
+    task_list_cache_entry,
+    validate_task_existence,
+)
+from app.schemas.auth import UserResponse
+from app.schemas.tasks import Task, TaskBulkCreate, TaskBulkDelete, TaskBulkResponse, TaskBulkUpdate, TaskCreate, TaskUpdate
+from app.services import tasks_async as tasks_service
+from app.services.auth_async import get_current_user
+from app.utils.etag import digest, etag_matches, make_etag, parse_if_none_match
+from app.utils.pagination import InvalidCursorError
+
+# Маршруты задач на AsyncSession; повторяют app.routers.tasks и подключаются при DB_ASYNC_ENABLED
+router = APIRouter()
+
+
+@router.get("/tasks", response_model=List[Task])
+async def list_tasks(
+    request: Request,
+    response: Response,
+    limit: int = Query(TASKS_PAGE_SIZE, ge=1, le=TASKS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: Literal["id", "-id", "title", "-title"] = "id",
+    completed: Optional[bool] = None,
+    email_notification: Optional[bool] = None,
+    telegram_notification: Optional[bool] = None,
+    sms_notification: Optional[bool] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    """
+    Получить страницу задач текущего пользователя.
+    """
+    logger.info(f"Получение задач для пользователя ID {current_user.id}")
+    query_key = digest(current_user.id, sorted(request.query_params.multi_items()))
+    cache = get_task_list_cache()
+    # Кэш списков хранится в Redis, клиент которого синхронный: обращения идут через пул потоков
+    cached, generation = await run_in_threadpool(cache.get, current_user.id, query_key)
+    tasks_version = cached["version"] if cached else await tasks_service.get_tasks_version(db, current_user.id)
+    etag = make_etag(f"u{tasks_version}", query_key)
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        logger.info(f"Список задач пользователя ID {current_user.id} не изменился")
+        return not_modified(etag)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if cached:
+        logger.info(f"Список задач пользователя ID {current_user.id} получен из кэша")
+        if cached["next_cursor"]:
+            response.headers["X-Next-Cursor"] = cached["next_cursor"]
+        return cached["tasks"]
+
+    filters = task_filters(completed, email_notification, telegram_notification, sms_notification)
+    try:
+        tasks, next_cursor = await tasks_service.get_tasks_page(db, current_user.id, limit, cursor, sort, filters)
+    except InvalidCursorError as e:
+        logger.warning(f"Некорректный курсор от пользователя ID {current_user.id}: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    if generation is not None:
+        await run_in_threadpool(cache.set, current_user.id, query_key,
+                                task_list_cache_entry(tasks, tasks_version, next_cursor), generation)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    logger.info(f"Найдено {len(tasks)} задач для пользователя ID {current_user.id}")
+    return tasks
+
+
+@router.post("/tasks", response_model=Task, status_code=status.HTTP_201_CREATED)
+async def create_new_task(
+    task_data: TaskCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    """
+    Создать новую задачу для текущего пользователя.
+    """
+    logger.info(f"Создание новой задачи для пользователя ID {current_user.id}")
+    new_task = await tasks_service.create_task_for_user(db, task_data, current_user.id)
+    logger.info(f"Задача создана с ID {new_task.id} для пользователя ID {current_user.id}")
+    return new_task
+
+
+# Массовые операции объявлены до маршрутов /tasks/{task_id}, иначе "bulk" попадёт в task_id
+@router.post("/tasks/bulk", response_model=TaskBulkResponse, status_code=status.HTTP_201_CREATED)
+async def create_tasks_bulk(
+    payload: TaskBulkCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    """
+    Создать несколько задач текущего пользователя одним запросом.
+    """
+    logger.info(f"Массовое создание {len(payload.tasks)} задач для пользователя ID {current_user.id}")
+    return bulk_created_response(await tasks_service.bulk_create_tasks(db, payload.tasks, current_user.id))
+
+
+@router.put("/tasks/bulk", response_model=TaskBulkResponse)
+async def update_tasks_bulk(
+    payload: TaskBulkUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    """
+    Обновить несколько задач текущего пользователя одним запросом.
+    """
+    logger.info(f"Массовое обновление {len(payload.tasks)} задач для пользователя ID {current_user.id}")
+    updated = await tasks_service.bulk_update_tasks(db, payload.tasks, current_user.id)
+    return bulk_updated_response(payload.tasks, updated)
+
+
+@router.delete("/tasks/bulk", response_model=TaskBulkResponse)
+async def delete_tasks_bulk(
+    payload: TaskBulkDelete,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    """
+    Удалить несколько задач текущего пользователя одним запросом.
+    """
+    logger.info(f"Массовое удаление {len(payload.ids)} задач для пользователя ID {current_user.id}")
+    deleted = await tasks_service.bulk_delete_tasks(db, payload.ids, current_user.id)
+    return bulk_deleted_response(payload.ids, deleted)
+
+
+@router.get("/tasks/{task_id}", response_model=Task)
+async def read_task(
+    task_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    """
+    Получить задачу по ID текущего пользователя.
+    """
+    logger.info(f"Получение задачи ID {task_id} для пользователя ID {current_user.id}")
+    client_etags = parse_if_none_match(request.headers.get("If-None-Match"))
+    tasks_version = await tasks_service.get_tasks_version(db, current_user.id)
+    client_etag = match_task_etag(client_etags, tasks_version, task_id)
+    if client_etag:
+        logger.info(f"Задача ID {task_id} не изменилась (версия пользователя)")
+        return not_modified(client_etag)
+
+    task = await tasks_service.get_task_by_id_and_user(db, task_id, current_user.id)
+    validate_task_existence(task, task_id, current_user.id)
+    etag, unchanged = task_etag(client_etags, tasks_version, task)
+    if unchanged:
+        logger.info(f"Задача ID {task_id} не изменилась (версия задачи)")
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    logger.info(f"Задача ID {task.id} успешно получена для пользователя ID {current_user.id}")
+    return task
+
+
+@router.put("/tasks/{task_id}", response_model=Task)
+async def update_existing_task(
+    task_id: int,
+    task_data: TaskUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    """
+    Обновить задачу текущего пользователя по ID.
+    """
+    logger.info(f"Обновление задачи ID {task_id} для пользователя ID {current_user.id}")
+    task = await tasks_service.update_task_by_id(db, task_id, task_data, current_user.id)
+    validate_task_existence(task, task_id, current_user.id)
+    logger.info(f"Задача ID {task.id} успешно обновлена для пользователя ID {current_user.id}")
+    return task
+
+
+@router.delete("/tasks/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_existing_task(
+    task_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserResponse = Depends(get_current_user),
+):
+    """
+    Удалить задачу текущего пользователя по ID.
+    """
+    logger.info(f"Удаление задачи ID {task_id} для пользователя ID {current_user.id}")
+    success = await tasks_service.delete_task_by_id(db, task_id, current_user.id)
+    if not success:
+        validate_task_existence(None, task_id, current_user.id)
+    logger.info(f"Задача ID {task_id} успешно удалена для пользователя ID {current_user.id}")
@@ -1,5 +1,7 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
+
+from app.core.config import TASKS_BULK_MAX_ITEMS
 
 
 class TaskBase(BaseModel):
@@ -42,3 +44,55 @@ class Task(TaskBase):
 
     class Config:
         orm_mode = True
+
+
+class TaskBulkCreate(BaseModel):
+    """
+    Схема для массового создания задач.
+    """
+    tasks: List[TaskCreate] = Field(..., min_length=1, max_length=TASKS_BULK_MAX_ITEMS)
+
+
+class TaskBulkUpdateItem(TaskUpdate):
+    """
+    Изменения одной задачи в массовом обновлении.
+    """
+    id: int
+
+
+class TaskBulkUpdate(BaseModel):
+    """
+    Схема для массового обновления задач.
+    """
+    tasks: List[TaskBulkUpdateItem] = Field(..., min_length=1, max_length=TASKS_BULK_MAX_ITEMS)
+
+    @field_validator("tasks")
+    @classmethod
+    def unique_ids(cls, tasks: List[TaskBulkUpdateItem]) -> List[TaskBulkUpdateItem]:
+        ids = [task.id for task in tasks]
+        if len(ids) != len(set(ids)):
+            raise ValueError("Task IDs must be unique")
+        return tasks
+
+
+class TaskBulkDelete(BaseModel):
+    """
+    Схема для массового удаления задач.
+    """
+    ids: List[int] = Field(..., min_length=1, max_length=TASKS_BULK_MAX_ITEMS)
+
+
+class TaskBulkItemResult(BaseModel):
+    """
+    Результат операции над одной задачей: created, updated, deleted или not_found.
+    """
+    id: Optional[int] = None
+    status: str
+    task: Optional[Task] = None
+
+
+class TaskBulkResponse(BaseModel):
+    """
+    Результаты массовой операции в порядке элементов запроса.
+    """
+    results: List[TaskBulkItemResult]
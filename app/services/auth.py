@@ -1,9 +1,14 @@
 from datetime import datetime, timedelta
+from typing import Optional
+from uuid import uuid4
 import jwt
 from fastapi import HTTPException, Depends, Request
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, raiseload
 
 from app.core.config import (
     SECRET_KEY,
@@ -11,27 +16,32 @@ from app.core.config import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     REFRESH_TOKEN_EXPIRE_DAYS,
 )
+from app.core.cache import get_principal_cache, get_token_cache
 from app.core.db import get_db
+from app.core.db_routing import pin_to_primary, replica_reads
 from app.core.logger import logger
+from app.core.passwords import get_password_hasher
 from app.models.user import User
 from app.schemas.auth import UserResponse
 
-# Настройка контекста для хэширования паролей
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # URL для получения токена в FastAPI
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# Тип токена (claim "typ"): refresh-токен не принимается вместо access-токена и наоборот
+TOKEN_TYPE_ACCESS = "access"
+TOKEN_TYPE_REFRESH = "refresh"
+
 
 def hash_password(password: str) -> str:
     """
-    Хэширует пароль с использованием Passlib (bcrypt).
+    Хэширует пароль с использованием Passlib (bcrypt) в пуле хэширования паролей.
 
     :param password: Обычный текст пароля.
     :return: Хэшированный пароль.
+    :raises PasswordHasherBusyError: Если очередь хэширования заполнена.
     """
     logger.info("Хэширование пароля")
-    hashed = pwd_context.hash(password)
+    hashed = get_password_hasher().hash(password)
     logger.debug(f"Хэшированный пароль: {hashed}")
     return hashed
 
@@ -43,9 +53,10 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     :param plain_password: Обычный текст пароля.
     :param hashed_password: Хэшированный пароль.
     :return: True, если пароли совпадают, иначе False.
+    :raises PasswordHasherBusyError: Если очередь хэширования заполнена.
     """
     logger.info("Проверка пароля")
-    result = pwd_context.verify(plain_password, hashed_password)
+    result = get_password_hasher().verify(plain_password, hashed_password)
     logger.debug(f"Результат проверки пароля: {result}")
     return result
 
@@ -60,23 +71,31 @@ def create_access_token(data: dict) -> str:
     logger.info("Создание access-токена")
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "typ": TOKEN_TYPE_ACCESS})
     token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     logger.debug("Access-токен создан")
     return token
 
 
-def create_refresh_token(data: dict) -> str:
+def create_refresh_token(data: dict, family: Optional[str] = None) -> str:
     """
-    Создаёт refresh-токен с истечением времени.
+    Создаёт одноразовый refresh-токен с истечением времени.
 
     :param data: Данные для кодирования в токен.
+    :param family: Семейство токена; при обновлении новый токен наследует семейство
+        старого, при входе создаётся новое.
     :return: JWT refresh-токен.
     """
     logger.info("Создание refresh-токена")
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    to_encode.update({
+        "exp": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        "iat": now,
+        "jti": uuid4().hex,
+        "fam": family or uuid4().hex,
+        "typ": TOKEN_TYPE_REFRESH,
+    })
     token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     logger.debug("Refresh-токен создан")
     return token
@@ -86,14 +105,23 @@ def decode_token(token: str) -> dict:
     """
     Декодирует токен и возвращает payload.
 
+    Проверенные токены кэшируются до их ``exp``, поэтому повторный запрос
+    с тем же токеном не проверяет подпись заново.
+
     :param token: JWT токен.
     :return: Расшифрованные данные токена.
     :raises HTTPException: Если токен истёк или недействителен.
     """
+    cache = get_token_cache()
+    payload = cache.get(token)
+    if payload is not None:
+        return payload
+
     logger.info("Декодирование токена")
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        logger.debug(f"Декодированный payload: {payload}")
+        cache.set(token, payload)
+        logger.debug(f"Токен пользователя {payload.get('sub')} проверен")
         return payload
     except jwt.ExpiredSignatureError:
         logger.warning("Попытка использовать истёкший токен")
@@ -116,26 +144,116 @@ def get_current_user(
     :raises HTTPException: Если токен или пользователь недействителен.
     """
     logger.info("Получение текущего пользователя")
+    payload = access_token_payload(request)
+    user = get_user_principal(db, payload["sub"], expires_at=payload.get("exp"))
+    if not user:
+        logger.warning("Пользователь с указанным ID не найден")
+        raise HTTPException(status_code=401, detail="User not found")
+
+    logger.debug(f"Пользователь найден: {user.email}")
+    return user
 
-    # Проверка токена в куках или заголовке Authorization
-    token = request.cookies.get("access_token") or _extract_token_from_header(request)
 
-    # Декодируем токен и извлекаем идентификатор пользователя
+def access_token_payload(request: Request) -> dict:
+    """
+    Декодирует access-токен из кук или заголовка Authorization.
+
+    :raises HTTPException: Если токен отсутствует, недействителен, не является access-токеном
+        или не содержит ``sub``.
+    """
+    token = request.cookies.get("access_token") or _extract_token_from_header(request)
     payload = decode_token(token)
-    user_id = payload.get("sub")
-    if not user_id:
+    if payload.get("typ") != TOKEN_TYPE_ACCESS:
+        logger.warning(f"Вместо access-токена передан токен типа {payload.get('typ')}")
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if not payload.get("sub"):
         logger.warning("Поле 'sub' отсутствует в токене")
         raise HTTPException(status_code=401, detail="Invalid token")
+    return payload
+
 
-    # Поиск пользователя в базе данных
-    user = db.query(User).filter(User.id == user_id).first()
+def get_user_principal(db: Session, user_id: str, expires_at: Optional[float] = None) -> Optional[UserResponse]:
+    """
+    Получает данные пользователя, обращаясь к базе только при промахе кэша.
+
+    :param db: Сессия базы данных.
+    :param user_id: ID пользователя (``sub`` токена).
+    :param expires_at: Время истечения токена; запись в кэше не переживёт токен.
+    :return: Схема пользователя UserResponse или None, если пользователь не найден.
+    """
+    cache = get_principal_cache()
+    principal = cache.get(user_id)
+    if principal is not None:
+        logger.debug(f"Пользователь {user_id} найден в кэше")
+        return UserResponse(**principal)
+
+    with replica_reads(db, user_id):
+        user = db.query(User).options(raiseload(User.tasks)).filter(User.id == user_id).first()
     if not user:
-        logger.warning("Пользователь с указанным ID не найден")
-        raise HTTPException(status_code=401, detail="User not found")
+        return None
+    return cache_principal(user, expires_at)
 
-    logger.debug(f"Пользователь найден: {user.email}")
-    return UserResponse(id=user.id, email=user.email, is_active=user.is_active, telegram_chat_id=user.telegram_chat_id,
-                        phone_number=user.phone_number)
+
+def cache_principal(user: User, expires_at: Optional[float]) -> UserResponse:
+    """
+    Сохраняет данные пользователя в кэш и возвращает их схемой UserResponse.
+    """
+    user_response = UserResponse(id=user.id, email=user.email, is_active=user.is_active,
+                                 telegram_chat_id=user.telegram_chat_id, phone_number=user.phone_number)
+    get_principal_cache().set(user.id, user_response.model_dump(), expires_at=expires_at)
+    return user_response
+
+
+def create_user_stmt(dialect_name: str, email: str, hashed_password: str, phone_number: Optional[str]):
+    """
+    INSERT пользователя, который при занятом email ничего не вставляет.
+
+    Конфликт определяет уникальный индекс по ``lower(email)``, поэтому проверка
+    и вставка выполняются одним запросом и не гоняются при одновременной регистрации.
+    """
+    insert = sqlite_insert if dialect_name == "sqlite" else postgresql_insert
+    return (
+        insert(User)
+        .values(id=str(uuid4()), email=email, hashed_password=hashed_password, phone_number=phone_number)
+        .on_conflict_do_nothing()
+        .returning(User.id, User.email, User.is_active, User.telegram_chat_id, User.phone_number)
+    )
+
+
+def user_by_email_stmt(email: str):
+    """SELECT пользователя по email без учёта регистра (по индексу ``lower(email)``)."""
+    return select(User).options(raiseload(User.tasks)).where(func.lower(User.email) == func.lower(email))
+
+
+def create_user(db: Session, email: str, hashed_password: str,
+                phone_number: Optional[str] = None) -> Optional[UserResponse]:
+    """
+    Регистрирует пользователя одним запросом INSERT ... ON CONFLICT DO NOTHING RETURNING.
+
+    :param db: Сессия базы данных.
+    :param email: Email пользователя.
+    :param hashed_password: Хэшированный пароль.
+    :param phone_number: Номер телефона.
+    :return: Схема пользователя UserResponse или None, если email уже зарегистрирован.
+    """
+    stmt = create_user_stmt(db.get_bind().dialect.name, email, hashed_password, phone_number)
+    try:
+        row = db.execute(stmt).first()
+        if row is None:
+            db.rollback()
+            return None
+        pin_to_primary(db, row.id)
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        logger.exception(f"Ошибка регистрации пользователя {email}")
+        raise
+    return UserResponse(**row._mapping)
+
+
+def get_user_by_email(db: Session, email: str) -> Optional[User]:
+    """Получить пользователя по email без учёта регистра, без загрузки задач."""
+    return db.scalar(user_by_email_stmt(email))
 
 
 def _extract_token_from_header(request: Request) -> str:
@@ -163,12 +281,14 @@ def save_telegram_chat_id(db: Session, user_id: str, chat_id: str) -> None:
     :raises ValueError: Если пользователь не найден.
     """
     logger.info(f"Сохранение Telegram Chat ID для пользователя ID: {user_id}")
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.query(User).options(raiseload(User.tasks)).filter(User.id == user_id).first()
 
     if not user:
         logger.error(f"Пользователь с ID {user_id} не найден")
         raise ValueError(f"Пользователь с ID {user_id} не найден.")
 
     user.telegram_chat_id = chat_id
+    pin_to_primary(db, user_id)
     db.commit()
+    get_principal_cache().invalidate(user_id)
     logger.info(f"Telegram Chat ID успешно сохранён для пользователя ID: {user_id}")
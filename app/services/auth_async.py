@@ -0,0 +1,115 @@
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
+
+from app.core.cache import get_principal_cache
+from app.core.db import get_async_db
+from app.core.db_routing import async_replica_reads, commit_and_pin, pin_to_primary
+from app.core.logger import logger
+from app.core.passwords import get_password_hasher
+from app.models.user import User
+from app.schemas.auth import UserResponse
+from app.services.auth import access_token_payload, cache_principal, create_user_stmt, user_by_email_stmt
+
+# Асинхронные варианты функций app.services.auth, работающих с базой
+
+
+async def get_current_user(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+) -> UserResponse:
+    """
+    Получает текущего пользователя из токена.
+
+    :param request: HTTP запрос.
+    :param db: Асинхронная сессия базы данных.
+    :return: Схема пользователя UserResponse.
+    :raises HTTPException: Если токен или пользователь недействителен.
+    """
+    logger.info("Получение текущего пользователя")
+    payload = access_token_payload(request)
+    user = await get_user_principal(db, payload["sub"], expires_at=payload.get("exp"))
+    if not user:
+        logger.warning("Пользователь с указанным ID не найден")
+        raise HTTPException(status_code=401, detail="User not found")
+
+    logger.debug(f"Пользователь найден: {user.email}")
+    return user
+
+
+async def get_user_principal(
+    db: AsyncSession, user_id: str, expires_at: Optional[float] = None
+) -> Optional[UserResponse]:
+    """
+    Получает данные пользователя, обращаясь к базе только при промахе кэша.
+
+    :return: Схема пользователя UserResponse или None, если пользователь не найден.
+    """
+    # Общий уровень кэша в Redis синхронный, поэтому кэш читается и пополняется через пул потоков
+    principal = await run_in_threadpool(get_principal_cache().get, user_id)
+    if principal is not None:
+        logger.debug(f"Пользователь {user_id} найден в кэше")
+        return UserResponse(**principal)
+
+    async with async_replica_reads(db, user_id):
+        user = await get_user_by_id(db, user_id)
+    if not user:
+        return None
+    return await run_in_threadpool(cache_principal, user, expires_at)
+
+
+async def get_user_by_id(db: AsyncSession, user_id: str) -> Optional[User]:
+    """Получить пользователя по ID без загрузки задач."""
+    return await db.scalar(select(User).options(raiseload(User.tasks)).where(User.id == user_id))
+
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    """Получить пользователя по email без учёта регистра, без загрузки задач."""
+    return await db.scalar(user_by_email_stmt(email))
+
+
+async def create_user(db: AsyncSession, email: str, hashed_password: str,
+                      phone_number: Optional[str] = None) -> Optional[UserResponse]:
+    """
+    Регистрирует пользователя одним запросом INSERT ... ON CONFLICT DO NOTHING RETURNING.
+
+    :return: Схема пользователя UserResponse или None, если email уже зарегистрирован.
+    """
+    stmt = create_user_stmt(db.get_bind().dialect.name, email, hashed_password, phone_number)
+    try:
+        row = (await db.execute(stmt)).first()
+        if row is None:
+            await db.rollback()
+            return None
+        pin_to_primary(db, row.id)
+        await commit_and_pin(db)
+    except SQLAlchemyError:
+        await db.rollback()
+        logger.exception(f"Ошибка регистрации пользователя {email}")
+        raise
+    return UserResponse(**row._mapping)
+
+
+async def hash_password(password: str) -> str:
+    """
+    Хэширует пароль в пуле хэширования паролей, не занимая цикл событий и пул потоков.
+
+    :raises PasswordHasherBusyError: Если очередь хэширования заполнена.
+    """
+    logger.info("Хэширование пароля")
+    return await get_password_hasher().hash_async(password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Проверяет пароль в пуле хэширования паролей, не занимая цикл событий и пул потоков.
+
+    :raises PasswordHasherBusyError: Если очередь хэширования заполнена.
+    """
+    logger.info("Проверка пароля")
+    return await get_password_hasher().verify_async(plain_password, hashed_password)
@@ -0,0 +1,139 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import OUTBOX_MAX_ATTEMPTS, REMINDER_CHUNK_SIZE
+from app.core.logger import logger
+from app.models.notification import NotificationOutbox
+
+
+def enqueue_notifications(db: Session, notifications: List[dict]) -> int:
+    """
+    Добавить уведомления в outbox одним многострочным INSERT.
+
+    Изменения фиксирует вызывающий код в одной транзакции с изменением задач.
+
+    :param db: Сессия базы данных.
+    :param notifications: Словари с полями channel, recipient, subject, body, user_id, task_id.
+    :return: Количество добавленных уведомлений.
+    """
+    if not notifications:
+        return 0
+    try:
+        db.execute(insert(NotificationOutbox).values(notifications))
+        logger.info(f"В outbox добавлено уведомлений: {len(notifications)}")
+        return len(notifications)
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при добавлении уведомлений в outbox: {e}")
+        raise
+
+
+def claim_pending_notifications(
+    db: Session, limit: int = REMINDER_CHUNK_SIZE, after_id: int = 0
+) -> List[NotificationOutbox]:
+    """
+    Захватить уведомления, ожидающие отправки.
+
+    Строки блокируются с ``FOR UPDATE SKIP LOCKED`` до конца транзакции,
+    поэтому параллельные воркеры получают непересекающиеся наборы.
+
+    :param db: Сессия базы данных.
+    :param limit: Максимальное количество уведомлений.
+    :param after_id: Захватывать только уведомления с ID больше указанного.
+    :return: Захваченные уведомления в порядке ID.
+    """
+    try:
+        notifications = (
+            db.query(NotificationOutbox)
+            .filter(NotificationOutbox.status == "pending", NotificationOutbox.id > after_id)
+            .order_by(NotificationOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        logger.info(f"Захвачено уведомлений из outbox: {len(notifications)}")
+        return notifications
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при захвате уведомлений из outbox: {e}")
+        raise
+
+
+def mark_notification_results(db: Session, results: List[Tuple[NotificationOutbox, Optional[str]]]) -> None:
+    """
+    Отметить результаты отправки уведомлений.
+
+    Успешно отправленные получают статус sent. Неудачные остаются в очереди
+    с увеличенным счётчиком попыток, пока он не достигнет OUTBOX_MAX_ATTEMPTS,
+    после чего получают статус failed.
+
+    :param db: Сессия базы данных.
+    :param results: Пары (уведомление, текст ошибки или None при успехе).
+    """
+    now = datetime.utcnow()
+    rows = []
+    for notification, error in results:
+        if error is None:
+            rows.append({"id": notification.id, "status": "sent", "sent_at": now, "last_error": None})
+        else:
+            attempts = notification.attempts + 1
+            rows.append({
+                "id": notification.id,
+                "status": "failed" if attempts >= OUTBOX_MAX_ATTEMPTS else "pending",
+                "attempts": attempts,
+                "last_error": error,
+            })
+    if not rows:
+        return
+    try:
+        db.execute(update(NotificationOutbox), rows)
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при сохранении результатов отправки уведомлений: {e}")
+        raise
+
+
+def get_outbox_depth(db: Session, limit: Optional[int] = None) -> int:
+    """
+    Количество уведомлений, ожидающих отправки.
+
+    :param db: Сессия базы данных.
+    :param limit: Считать не больше limit уведомлений, не просматривая всю очередь.
+    :return: Количество уведомлений в статусе pending (не больше limit).
+    """
+    try:
+        query = db.query(NotificationOutbox.id).filter(NotificationOutbox.status == "pending")
+        if limit is not None:
+            query = query.limit(limit)
+        return query.count()
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при подсчёте очереди outbox: {e}")
+        raise
+
+
+def purge_sent_notifications(db: Session, sent_before: datetime, limit: int = REMINDER_CHUNK_SIZE) -> int:
+    """
+    Удалить порцию отправленных уведомлений старше указанного времени.
+
+    Изменения фиксирует вызывающий код; удаление порциями не держит
+    долгих блокировок на таблице.
+
+    :param db: Сессия базы данных.
+    :param sent_before: Удалять уведомления, отправленные раньше этого времени (UTC).
+    :param limit: Максимальное количество удаляемых уведомлений.
+    :return: Количество удалённых уведомлений.
+    """
+    try:
+        ids = (
+            db.query(NotificationOutbox.id)
+            .filter(NotificationOutbox.status == "sent", NotificationOutbox.sent_at < sent_before)
+            .order_by(NotificationOutbox.id)
+            .limit(limit)
+            .scalar_subquery()
+        )
+        result = db.execute(delete(NotificationOutbox).where(NotificationOutbox.id.in_(ids)))
+        return result.rowcount
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при удалении отправленных уведомлений из outbox: {e}")
+        raise
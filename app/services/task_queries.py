@@ -0,0 +1,235 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import (
+    Boolean, Integer, String, and_, case, cast, column, delete, func, literal, or_, select, tuple_, update, values,
+)
+from sqlalchemy.sql import Delete, Select, Update
+from sqlalchemy.orm import raiseload
+
+from app.core.config import REMINDER_INTERVAL_MINUTES
+from app.models.task import Task
+from app.models.user import User
+from app.schemas.tasks import TaskBulkUpdateItem, TaskCreate, TaskUpdate
+from app.utils.pagination import decode_cursor, encode_cursor
+
+# Построение запросов к задачам, общее для app.services.tasks и app.services.tasks_async.
+# Функции только строят запросы и ничего не выполняют.
+
+
+# Допустимые сортировки списка задач: имя -> (поле, по убыванию)
+TASK_SORTS = {
+    "id": (Task.id, False),
+    "-id": (Task.id, True),
+    "title": (Task.title, False),
+    "-title": (Task.title, True),
+}
+
+
+def tasks_page_stmt(
+    user_id: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    sort: str = "id",
+    filters: Optional[Dict[str, bool]] = None,
+) -> Select:
+    """
+    Запрос страницы задач пользователя с keyset-пагинацией (с одной лишней строкой).
+
+    :raises InvalidCursorError: Если курсор некорректен.
+    """
+    column, descending = TASK_SORTS[sort]
+    stmt = (
+        select(Task)
+        .options(raiseload(Task.user))
+        .where(Task.user_id == user_id)
+        .where(*(getattr(Task, field) == value for field, value in (filters or {}).items()))
+    )
+    if cursor:
+        sort_key, last_id = decode_cursor(cursor, sort, column.type.python_type)
+        position = tuple_(column, Task.id)
+        stmt = stmt.where(position < (sort_key, last_id) if descending else position > (sort_key, last_id))
+    if column is not Task.id:
+        stmt = stmt.order_by(column.desc() if descending else column)
+    # Одна лишняя строка показывает, есть ли следующая страница
+    return stmt.order_by(Task.id.desc() if descending else Task.id).limit(limit + 1)
+
+
+def split_page(tasks: List[Task], limit: int, sort: str) -> Tuple[List[Task], Optional[str]]:
+    """
+    Отделить лишнюю строку страницы и построить курсор следующей страницы.
+    """
+    if len(tasks) <= limit:
+        return tasks, None
+    tasks = tasks[:limit]
+    last = tasks[-1]
+    column, _ = TASK_SORTS[sort]
+    return tasks, encode_cursor(sort, getattr(last, column.key), last.id)
+
+
+def tasks_version_stmt(user_id: str) -> Select:
+    return select(User.tasks_version).where(User.id == user_id)
+
+
+def bump_tasks_version_stmt(user_id: str) -> Update:
+    return (
+        update(User)
+        .where(User.id == user_id)
+        .values(tasks_version=User.tasks_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def task_stmt(task_id: int, user_id: str) -> Select:
+    return select(Task).options(raiseload(Task.user)).where(Task.id == task_id, Task.user_id == user_id)
+
+
+def update_task_stmt(task_id: int, task_data: TaskUpdate, user_id: str) -> Update:
+    """
+    ``UPDATE ... RETURNING`` задачи пользователя с пересчётом времени следующего напоминания.
+    """
+    changes = task_data.dict(exclude_unset=True)
+    new_values = {
+        field: literal(changes[field], Task.__table__.c[field].type) if field in changes else getattr(Task, field)
+        for field in REMINDER_FIELDS
+    }
+    return (
+        update(Task)
+        .where(Task.id == task_id, Task.user_id == user_id)
+        .values(
+            **changes,
+            next_reminder_at=next_reminder_at_expr(new_values, datetime.utcnow()),
+            version=Task.version + 1,
+        )
+        .returning(*Task.__table__.c)
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+def delete_task_stmt(task_id: int, user_id: str) -> Delete:
+    return (
+        delete(Task)
+        .where(Task.id == task_id, Task.user_id == user_id)
+        .returning(Task.id)
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+# Поля, от которых зависит время следующего напоминания
+REMINDER_FIELDS = ("completed", "email_notification", "telegram_notification", "sms_notification")
+
+
+def next_reminder_at_expr(new_values: dict, now: datetime):
+    """
+    SQL-выражение времени следующего напоминания по правилам schedule_task_reminder.
+
+    Правые части SET вычисляются по старым значениям строки, поэтому условие
+    строится по новым значениям полей из new_values.
+
+    :param new_values: Выражения новых значений полей из REMINDER_FIELDS.
+    :param now: Текущее время (UTC).
+    """
+    no_reminder = or_(
+        func.coalesce(new_values["completed"], False) == True,
+        and_(*(
+            func.coalesce(new_values[flag], False) == False
+            for flag in ("email_notification", "telegram_notification", "sms_notification")
+        )),
+    )
+    return case(
+        (no_reminder, None),
+        (Task.next_reminder_at.is_(None), now + timedelta(minutes=REMINDER_INTERVAL_MINUTES)),
+        else_=Task.next_reminder_at,
+    )
+
+
+# Поля задачи, которые можно менять массовым обновлением, и их типы
+BULK_UPDATE_FIELDS = {
+    "title": String,
+    "description": String,
+    "completed": Boolean,
+    "email_notification": Boolean,
+    "telegram_notification": Boolean,
+    "sms_notification": Boolean,
+}
+
+
+def bulk_create_rows(tasks: List[TaskCreate], user_id: str) -> List[dict]:
+    """
+    Параметры строк многострочного INSERT с рассчитанным временем первого напоминания.
+    """
+    now = datetime.utcnow()
+    rows = []
+    for task in tasks:
+        row = dict(task.dict(), user_id=user_id)
+        has_reminder = not row["completed"] and (
+            row["email_notification"] or row["telegram_notification"] or row["sms_notification"]
+        )
+        row["next_reminder_at"] = now + timedelta(minutes=REMINDER_INTERVAL_MINUTES) if has_reminder else None
+        rows.append(row)
+    return rows
+
+
+# Ограничение PostgreSQL на количество параметров одного запроса
+MAX_QUERY_PARAMS = 65535
+# Строк VALUES в одном UPDATE массового обновления: по параметру на id и пару
+# (значение, флаг) на каждое поле, с запасом на параметры вне VALUES
+BULK_UPDATE_CHUNK_SIZE = (MAX_QUERY_PARAMS - 100) // (1 + 2 * len(BULK_UPDATE_FIELDS))
+
+
+def bulk_update_stmts(items: List[TaskBulkUpdateItem], user_id: str) -> List[Update]:
+    """
+    Запросы массового обновления задач пользователя, по BULK_UPDATE_CHUNK_SIZE элементов в каждом.
+    """
+    return [
+        bulk_update_stmt(items[start:start + BULK_UPDATE_CHUNK_SIZE], user_id)
+        for start in range(0, len(items), BULK_UPDATE_CHUNK_SIZE)
+    ]
+
+
+def bulk_update_stmt(items: List[TaskBulkUpdateItem], user_id: str) -> Update:
+    """
+    ``UPDATE ... FROM (VALUES ...) RETURNING`` для массового обновления задач пользователя.
+
+    Для каждого поля в VALUES передаётся флаг ``<поле>_set``: поля, не указанные
+    в элементе запроса, сохраняют текущее значение. Элементов должно быть не больше
+    BULK_UPDATE_CHUNK_SIZE, иначе запрос превысит лимит параметров PostgreSQL.
+    """
+    columns = [column("id", Integer)]
+    for field, field_type in BULK_UPDATE_FIELDS.items():
+        columns += [column(field, field_type), column(f"{field}_set", Boolean)]
+
+    data = []
+    for item in items:
+        changes = item.dict(exclude_unset=True, exclude={"id"})
+        row = [item.id]
+        for field in BULK_UPDATE_FIELDS:
+            row += [changes.get(field), field in changes]
+        data.append(tuple(row))
+    source = values(*columns, name="changes").data(data)
+
+    # Незаданные поля передаются как NULL без типа: если поле не задано ни в одном
+    # элементе, PostgreSQL выводит для колонки VALUES тип text, поэтому тип указывается явно
+    new_values = {
+        field: case((source.c[f"{field}_set"] == True, cast(source.c[field], field_type)),
+                    else_=getattr(Task, field))
+        for field, field_type in BULK_UPDATE_FIELDS.items()
+    }
+    next_reminder_at = next_reminder_at_expr(new_values, datetime.utcnow())
+
+    return (
+        update(Task)
+        .where(Task.id == source.c.id, Task.user_id == user_id)
+        .values(**new_values, next_reminder_at=next_reminder_at, version=Task.version + 1)
+        .returning(*Task.__table__.c)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def bulk_delete_stmt(task_ids: List[int], user_id: str) -> Delete:
+    return (
+        delete(Task)
+        .where(Task.user_id == user_id, Task.id.in_(task_ids))
+        .returning(Task.id)
+        .execution_options(synchronize_session=False)
+    )
@@ -1,9 +1,29 @@
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, raiseload, selectinload
 from sqlalchemy.exc import SQLAlchemyError
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple, Union
+from app.core.cache import get_task_list_cache
+from app.core.config import REMINDER_CHUNK_SIZE, REMINDER_INTERVAL_MINUTES
+from app.core.db_routing import pin_to_primary, replica_reads
 from app.core.logger import logger
 from app.models.task import Task
-from app.schemas.tasks import TaskCreate, TaskUpdate
+from app.models.user import User
+from app.schemas.tasks import TaskBulkUpdateItem, TaskCreate, TaskUpdate
+from app.services.task_queries import (
+    bulk_create_rows,
+    bulk_delete_stmt,
+    bulk_update_stmts,
+    bump_tasks_version_stmt,
+    delete_task_stmt,
+    split_page,
+    task_stmt,
+    tasks_page_stmt,
+    tasks_version_stmt,
+    update_task_stmt,
+)
 
 
 def get_tasks_by_user_id(db: Session, user_id: str) -> List[Task]:
@@ -12,7 +32,8 @@ def get_tasks_by_user_id(db: Session, user_id: str) -> List[Task]:
     """
     logger.info(f"Получение всех задач для пользователя: {user_id}")
     try:
-        tasks = db.query(Task).filter(Task.user_id == user_id).all()
+        with replica_reads(db, user_id):
+            tasks = db.query(Task).options(raiseload(Task.user)).filter(Task.user_id == user_id).all()
         logger.info(f"Найдено задач: {len(tasks)} для пользователя {user_id}")
         return tasks
     except SQLAlchemyError as e:
@@ -20,6 +41,90 @@ def get_tasks_by_user_id(db: Session, user_id: str) -> List[Task]:
         raise
 
 
+def get_tasks_page(
+    db: Session,
+    user_id: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    sort: str = "id",
+    filters: Optional[Dict[str, bool]] = None,
+) -> Tuple[List[Task], Optional[str]]:
+    """
+    Получить страницу задач пользователя с keyset-пагинацией.
+
+    Следующая страница начинается строго после пары (поле сортировки, id)
+    последней задачи, поэтому стоимость запроса не зависит от глубины страницы.
+
+    :param db: Сессия базы данных.
+    :param user_id: ID пользователя.
+    :param limit: Размер страницы.
+    :param cursor: Курсор из предыдущей страницы.
+    :param sort: Сортировка из task_queries.TASK_SORTS.
+    :param filters: Фильтры по полям completed и флагам уведомлений.
+    :return: Задачи страницы и курсор следующей страницы (None, если страница последняя).
+    :raises InvalidCursorError: Если курсор некорректен.
+    """
+    logger.info(f"Получение страницы задач для пользователя {user_id}: sort={sort}, limit={limit}")
+    stmt = tasks_page_stmt(user_id, limit, cursor, sort, filters)
+    try:
+        with replica_reads(db, user_id):
+            tasks = db.scalars(stmt).all()
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при получении страницы задач для пользователя {user_id}: {e}")
+        raise
+
+    tasks, next_cursor = split_page(tasks, limit, sort)
+    logger.info(f"Найдено задач на странице: {len(tasks)} для пользователя {user_id}")
+    return tasks, next_cursor
+
+
+def get_tasks_version(db: Session, user_id: str) -> Optional[int]:
+    """
+    Получить версию списка задач пользователя без обращения к таблице задач.
+
+    :return: Версия или None, если пользователь не найден.
+    """
+    try:
+        with replica_reads(db, user_id):
+            return db.scalar(tasks_version_stmt(user_id))
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при получении версии задач пользователя {user_id}: {e}")
+        raise
+
+
+def schedule_task_list_invalidation(db: Union[Session, AsyncSession], user_id: str) -> None:
+    """
+    Инвалидировать кэш списков задач пользователя после commit текущей транзакции.
+    """
+    db.info.setdefault("invalidate_task_lists", set()).add(user_id)
+
+
+def bump_tasks_version(db: Session, user_id: str) -> None:
+    """
+    Увеличить версию списка задач пользователя.
+
+    Вызывается каждой операцией изменения задач до commit, чтобы новая версия
+    фиксировалась атомарно вместе с изменением. Кэш списков задач пользователя
+    инвалидируется, а его чтения закрепляются за primary только после успешного commit.
+    """
+    db.execute(bump_tasks_version_stmt(user_id))
+    schedule_task_list_invalidation(db, user_id)
+    pin_to_primary(db, user_id)
+
+
+# События Session срабатывают и для AsyncSession, которая работает поверх неё
+@event.listens_for(Session, "after_commit")
+def _invalidate_task_lists_after_commit(session: Session) -> None:
+    user_ids = session.info.pop("invalidate_task_lists", None)
+    if user_ids:
+        get_task_list_cache().invalidate(*user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_task_list_invalidation(session: Session) -> None:
+    session.info.pop("invalidate_task_lists", None)
+
+
 def create_task_for_user(db: Session, task: TaskCreate, user_id: str) -> Task:
     """
     Создать задачу для пользователя.
@@ -27,8 +132,10 @@ def create_task_for_user(db: Session, task: TaskCreate, user_id: str) -> Task:
     logger.info(f"Создание задачи для пользователя {user_id}: {task.dict()}")
     try:
         db_task = Task(**task.dict(), user_id=user_id)
+        schedule_task_reminder(db_task)
         db.add(db_task)
         db.flush()  # Генерация ID
+        bump_tasks_version(db, user_id)
         db.commit()
         logger.info(f"Задача успешно создана с ID {db_task.id} для пользователя {user_id}")
         return db_task
@@ -43,7 +150,8 @@ def get_task_by_id_and_user(db: Session, task_id: int, user_id: str) -> Optional
     """
     logger.info(f"Получение задачи ID {task_id} для пользователя {user_id}")
     try:
-        task = db.query(Task).filter(Task.id == task_id, Task.user_id == user_id).first()
+        with replica_reads(db, user_id):
+            task = db.scalars(task_stmt(task_id, user_id)).first()
         if task:
             logger.info(f"Задача найдена: {task.id} для пользователя {user_id}")
         else:
@@ -54,86 +162,236 @@ def get_task_by_id_and_user(db: Session, task_id: int, user_id: str) -> Optional
         raise
 
 
-def update_task_by_id(db: Session, task_id: int, task_data: TaskUpdate, user_id: str) -> Optional[Task]:
+def update_task_by_id(db: Session, task_id: int, task_data: TaskUpdate, user_id: str) -> Optional[Row]:
     """
-    Обновить задачу по ID и пользователю.
+    Обновить задачу по ID и пользователю одним ``UPDATE ... RETURNING``.
+
+    Принадлежность задачи проверяется в WHERE, время следующего напоминания
+    пересчитывается в том же запросе, изменения сразу фиксируются.
+
+    :return: Строка обновлённой задачи или None, если задача не найдена.
     """
     logger.info(f"Обновление задачи ID {task_id} для пользователя {user_id}")
-    task = get_task_by_id_and_user(db, task_id, user_id)
-    if not task:
-        logger.warning(f"Задача ID {task_id} не найдена для обновления пользователем {user_id}")
-        return None
-
     try:
-        for key, value in task_data.dict(exclude_unset=True).items():
-            setattr(task, key, value)
-        db.flush()  # Применение изменений
-        logger.info(f"Задача ID {task.id} успешно обновлена для пользователя {user_id}")
-        return task
+        task = db.execute(update_task_stmt(task_id, task_data, user_id)).first()
+        if task:
+            bump_tasks_version(db, user_id)
+        db.commit()
     except SQLAlchemyError as e:
         logger.exception(f"Ошибка при обновлении задачи ID {task_id}: {e}")
         raise
 
+    if not task:
+        logger.warning(f"Задача ID {task_id} не найдена для обновления пользователем {user_id}")
+        return None
+    logger.info(f"Задача ID {task.id} успешно обновлена для пользователя {user_id}")
+    return task
+
 
 def delete_task_by_id(db: Session, task_id: int, user_id: str) -> bool:
     """
-    Удалить задачу по ID и пользователю.
+    Удалить задачу по ID и пользователю одним ``DELETE ... RETURNING id``.
     """
     logger.info(f"Удаление задачи ID {task_id} для пользователя {user_id}")
-    task = get_task_by_id_and_user(db, task_id, user_id)
-    if not task:
+    try:
+        deleted_id = db.execute(delete_task_stmt(task_id, user_id)).scalar()
+        if deleted_id is not None:
+            bump_tasks_version(db, user_id)
+        db.commit()
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при удалении задачи ID {task_id}: {e}")
+        raise
+
+    if deleted_id is None:
         logger.warning(f"Задача ID {task_id} не найдена для удаления пользователем {user_id}")
         return False
+    logger.info(f"Задача ID {task_id} успешно удалена для пользователя {user_id}")
+    return True
+
+
+def bulk_create_tasks(db: Session, tasks: List[TaskCreate], user_id: str) -> List[Row]:
+    """
+    Создать задачи пользователя многострочным ``INSERT ... RETURNING`` в одной транзакции.
+
+    Возвращаются строки RETURNING, а не объекты ORM: они не истекают после commit
+    и не перечитываются из базы при сериализации ответа.
 
+    :return: Строки созданных задач в порядке запроса.
+    """
+    logger.info(f"Массовое создание {len(tasks)} задач для пользователя {user_id}")
+    rows = bulk_create_rows(tasks, user_id)
     try:
-        db.delete(task)
+        # Строки RETURNING возвращаются в порядке параметров, даже если INSERT разбит на пакеты
+        created = db.execute(insert(Task).returning(*Task.__table__.c, sort_by_parameter_order=True), rows).all()
+        bump_tasks_version(db, user_id)
         db.commit()
-        logger.info(f"Задача ID {task_id} успешно удалена для пользователя {user_id}")
-        return True
+        logger.info(f"Создано задач: {len(created)} для пользователя {user_id}")
+        return created
     except SQLAlchemyError as e:
-        logger.exception(f"Ошибка при удалении задачи ID {task_id}: {e}")
+        logger.exception(f"Ошибка при массовом создании задач для пользователя {user_id}: {e}")
+        raise
+
+
+def bulk_update_tasks(db: Session, items: List[TaskBulkUpdateItem], user_id: str) -> List[Optional[Row]]:
+    """
+    Обновить задачи пользователя запросами ``UPDATE ... FROM (VALUES ...) RETURNING`` в одной транзакции.
+
+    Поля, не указанные в элементе запроса, сохраняют текущее значение. Время
+    следующего напоминания пересчитывается по тем же правилам, что и в schedule_task_reminder.
+    Большие запросы делятся на части по task_queries.BULK_UPDATE_CHUNK_SIZE элементов.
+
+    :return: Для каждого элемента запроса строка обновлённой задачи или None, если задача не найдена.
+    """
+    logger.info(f"Массовое обновление {len(items)} задач для пользователя {user_id}")
+    try:
+        updated = {
+            task.id: task
+            for stmt in bulk_update_stmts(items, user_id)
+            for task in db.execute(stmt)
+        }
+        if updated:
+            bump_tasks_version(db, user_id)
+        db.commit()
+        logger.info(f"Обновлено задач: {len(updated)} из {len(items)} для пользователя {user_id}")
+        return [updated.get(item.id) for item in items]
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при массовом обновлении задач для пользователя {user_id}: {e}")
+        raise
+
+
+def bulk_delete_tasks(db: Session, task_ids: List[int], user_id: str) -> List[bool]:
+    """
+    Удалить задачи пользователя одним ``DELETE ... RETURNING id``.
+
+    :return: Для каждого ID из запроса признак того, что задача была удалена.
+    """
+    logger.info(f"Массовое удаление {len(task_ids)} задач для пользователя {user_id}")
+    try:
+        deleted = set(db.scalars(bulk_delete_stmt(task_ids, user_id)))
+        if deleted:
+            bump_tasks_version(db, user_id)
+        db.commit()
+        logger.info(f"Удалено задач: {len(deleted)} из {len(task_ids)} для пользователя {user_id}")
+        return [task_id in deleted for task_id in task_ids]
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при массовом удалении задач для пользователя {user_id}: {e}")
         raise
 
 
-def get_tasks_with_email_notifications(db: Session) -> List[Task]:
+def _has_notifications(task: Task) -> bool:
+    return bool(task.email_notification or task.telegram_notification or task.sms_notification)
+
+
+def schedule_task_reminder(task: Task, now: Optional[datetime] = None) -> None:
+    """
+    Пересчитать время следующего напоминания после создания или изменения задачи.
+
+    Невыполненной задаче с включёнными уведомлениями назначается напоминание
+    через REMINDER_INTERVAL_MINUTES (уже назначенное не сдвигается),
+    остальным задачам напоминание снимается.
+    """
+    if task.completed or not _has_notifications(task):
+        task.next_reminder_at = None
+    elif task.next_reminder_at is None:
+        task.next_reminder_at = (now or datetime.utcnow()) + timedelta(minutes=REMINDER_INTERVAL_MINUTES)
+
+
+def _due_criteria(now: datetime):
+    """
+    Условия выборки задач, время напоминания которых наступило (совпадают с частичным индексом).
+    """
+    return (
+        Task.next_reminder_at <= now,
+        Task.completed == False,
+    )
+
+
+def claim_due_tasks(db: Session, now: datetime, limit: int = REMINDER_CHUNK_SIZE) -> List[Task]:
     """
-    Получить задачи с активными email-уведомлениями и статусом невыполненные.
+    Захватить задачи, время напоминания которых наступило.
+
+    Строки блокируются с ``FOR UPDATE SKIP LOCKED`` до конца транзакции,
+    поэтому параллельные воркеры получают непересекающиеся наборы задач.
+
+    :param db: Сессия базы данных.
+    :param now: Текущее время (UTC).
+    :param limit: Максимальное количество задач.
+    :return: Захваченные задачи в порядке Task.id.
     """
-    logger.info("Получение задач с email-уведомлениями.")
     try:
-        tasks = db.query(Task).filter(
-            Task.email_notification == True,
-            Task.completed == False,
-        ).all()
-        logger.info(f"Найдено задач с email-уведомлениями: {len(tasks)}")
+        tasks = (
+            db.query(Task)
+            # Пользователи догружаются одним отдельным SELECT ... IN, без JOIN под FOR UPDATE
+            .options(selectinload(Task.user))
+            .filter(*_due_criteria(now))
+            .order_by(Task.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True, of=Task)
+            .all()
+        )
+        logger.info(f"Захвачено задач для напоминаний: {len(tasks)}")
         return tasks
     except SQLAlchemyError as e:
-        logger.exception(f"Ошибка при получении задач с email-уведомлениями: {e}")
+        logger.exception(f"Ошибка при захвате задач для напоминаний: {e}")
         raise
 
 
-def get_tasks_with_telegram_notifications(db: Session) -> List[Task]:
+def claim_due_user_tasks(db: Session, now: datetime, user_limit: int = REMINDER_CHUNK_SIZE) -> List[Task]:
     """
-    Получить задачи с активными Telegram-уведомлениями и статусом невыполненные.
+    Захватить задачи с напоминаниями для группы пользователей, у которых наступило время напоминания.
+
+    Используется в режиме сводок. Если у пользователя наступило напоминание хотя бы
+    по одной задаче, захватываются все его невыполненные задачи с напоминаниями:
+    они попадают в одну сводку и после сдвига получают общее время следующего
+    напоминания, поэтому пользователь получает одну сводку за интервал.
+    Пользователи захватываются блокировкой своей строки с ``SKIP LOCKED``,
+    задачи захваченного пользователя блокируются все без пропусков.
+
+    :param db: Сессия базы данных.
+    :param now: Текущее время (UTC).
+    :param user_limit: Максимальное количество пользователей.
+    :return: Захваченные задачи в порядке (user_id, id).
     """
-    logger.info("Получение задач с Telegram-уведомлениями.")
     try:
-        tasks = db.query(Task).filter(
-            Task.telegram_notification == True,
-            Task.completed == False,
-        ).all()
-        logger.info(f"Найдено задач с Telegram-уведомлениями: {len(tasks)}")
+        # Блокировка строк пользователей: параллельный планировщик пропускает
+        # пользователя целиком и не может забрать часть его задач в свою сводку
+        user_ids = [
+            row.id
+            for row in db.query(User.id)
+            .filter(User.id.in_(db.query(Task.user_id).filter(*_due_criteria(now))))
+            .order_by(User.id)
+            .limit(user_limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        ]
+        if not user_ids:
+            return []
+        tasks = (
+            db.query(Task)
+            .options(selectinload(Task.user))
+            .filter(Task.next_reminder_at.isnot(None), Task.completed == False, Task.user_id.in_(user_ids))
+            .order_by(Task.user_id, Task.id)
+            .with_for_update(of=Task)
+            .all()
+        )
+        logger.info(f"Захвачено задач для сводных напоминаний: {len(tasks)}")
         return tasks
     except SQLAlchemyError as e:
-        logger.exception(f"Ошибка при получении задач с Telegram-уведомлениями: {e}")
+        logger.exception(f"Ошибка при захвате задач для сводных напоминаний: {e}")
         raise
 
 
-def get_tasks_with_sms_notifications(db: Session):
+def advance_task_reminders(db: Session, task_ids: List[int], now: datetime) -> None:
     """
-    Получить задачи, которые требуют SMS-уведомлений.
+    Назначить следующее напоминание для задач после отправки текущего.
+
+    Изменения фиксирует вызывающий код вместе со снятием блокировок захвата.
     """
-    return db.query(Task).filter(
-        Task.sms_notification == True,
-        Task.completed == False,
-    ).all()
+    try:
+        db.query(Task).filter(Task.id.in_(task_ids)).update(
+            {Task.next_reminder_at: now + timedelta(minutes=REMINDER_INTERVAL_MINUTES)},
+            synchronize_session=False,
+        )
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при назначении следующих напоминаний: {e}")
+        raise
@@ -0,0 +1,232 @@
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import get_task_list_cache
+from app.core.db_routing import async_replica_reads, commit_and_pin, pin_to_primary
+from app.core.logger import logger
+from app.models.task import Task
+from app.schemas.tasks import TaskBulkUpdateItem, TaskCreate, TaskUpdate
+from app.services.task_queries import (
+    bulk_create_rows,
+    bulk_delete_stmt,
+    bulk_update_stmts,
+    bump_tasks_version_stmt,
+    delete_task_stmt,
+    split_page,
+    task_stmt,
+    tasks_page_stmt,
+    tasks_version_stmt,
+    update_task_stmt,
+)
+from app.services.tasks import schedule_task_list_invalidation, schedule_task_reminder
+
+# Асинхронные варианты функций app.services.tasks для маршрутов на AsyncSession.
+# Запросы строятся теми же функциями app.services.task_queries, что и в синхронной версии.
+
+
+async def get_tasks_page(
+    db: AsyncSession,
+    user_id: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    sort: str = "id",
+    filters: Optional[Dict[str, bool]] = None,
+) -> Tuple[List[Task], Optional[str]]:
+    """
+    Получить страницу задач пользователя с keyset-пагинацией.
+
+    :return: Задачи страницы и курсор следующей страницы (None, если страница последняя).
+    :raises InvalidCursorError: Если курсор некорректен.
+    """
+    logger.info(f"Получение страницы задач для пользователя {user_id}: sort={sort}, limit={limit}")
+    stmt = tasks_page_stmt(user_id, limit, cursor, sort, filters)
+    try:
+        async with async_replica_reads(db, user_id):
+            tasks = (await db.scalars(stmt)).all()
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при получении страницы задач для пользователя {user_id}: {e}")
+        raise
+
+    tasks, next_cursor = split_page(tasks, limit, sort)
+    logger.info(f"Найдено задач на странице: {len(tasks)} для пользователя {user_id}")
+    return tasks, next_cursor
+
+
+async def get_tasks_version(db: AsyncSession, user_id: str) -> Optional[int]:
+    """
+    Получить версию списка задач пользователя без обращения к таблице задач.
+    """
+    try:
+        async with async_replica_reads(db, user_id):
+            return await db.scalar(tasks_version_stmt(user_id))
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при получении версии задач пользователя {user_id}: {e}")
+        raise
+
+
+async def commit(db: AsyncSession) -> None:
+    """
+    Зафиксировать транзакцию и инвалидировать кэш списков задач в пуле потоков.
+
+    Обработчик after_commit обращается к Redis синхронно и в AsyncSession занял бы
+    цикл событий, поэтому пользователи для инвалидации забираются из сессии до commit.
+    """
+    user_ids = db.info.pop("invalidate_task_lists", None)
+    await commit_and_pin(db)
+    if user_ids:
+        await run_in_threadpool(get_task_list_cache().invalidate, *user_ids)
+
+
+async def bump_tasks_version(db: AsyncSession, user_id: str) -> None:
+    """
+    Увеличить версию списка задач пользователя до commit изменения.
+    """
+    await db.execute(bump_tasks_version_stmt(user_id))
+    schedule_task_list_invalidation(db, user_id)
+    pin_to_primary(db, user_id)
+
+
+async def create_task_for_user(db: AsyncSession, task: TaskCreate, user_id: str) -> Task:
+    """
+    Создать задачу для пользователя.
+    """
+    logger.info(f"Создание задачи для пользователя {user_id}: {task.dict()}")
+    try:
+        db_task = Task(**task.dict(), user_id=user_id)
+        schedule_task_reminder(db_task)
+        db.add(db_task)
+        await db.flush()  # Генерация ID
+        await bump_tasks_version(db, user_id)
+        await commit(db)
+        logger.info(f"Задача успешно создана с ID {db_task.id} для пользователя {user_id}")
+        return db_task
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при создании задачи для пользователя {user_id}: {e}")
+        raise
+
+
+async def get_task_by_id_and_user(db: AsyncSession, task_id: int, user_id: str) -> Optional[Task]:
+    """
+    Получить задачу по ID и пользователю.
+    """
+    logger.info(f"Получение задачи ID {task_id} для пользователя {user_id}")
+    try:
+        async with async_replica_reads(db, user_id):
+            task = (await db.scalars(task_stmt(task_id, user_id))).first()
+        if task:
+            logger.info(f"Задача найдена: {task.id} для пользователя {user_id}")
+        else:
+            logger.warning(f"Задача ID {task_id} не найдена для пользователя {user_id}")
+        return task
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при получении задачи ID {task_id} для пользователя {user_id}: {e}")
+        raise
+
+
+async def update_task_by_id(db: AsyncSession, task_id: int, task_data: TaskUpdate, user_id: str) -> Optional[Row]:
+    """
+    Обновить задачу по ID и пользователю одним ``UPDATE ... RETURNING``.
+
+    :return: Строка обновлённой задачи или None, если задача не найдена.
+    """
+    logger.info(f"Обновление задачи ID {task_id} для пользователя {user_id}")
+    try:
+        task = (await db.execute(update_task_stmt(task_id, task_data, user_id))).first()
+        if task:
+            await bump_tasks_version(db, user_id)
+        await commit(db)
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при обновлении задачи ID {task_id}: {e}")
+        raise
+
+    if not task:
+        logger.warning(f"Задача ID {task_id} не найдена для обновления пользователем {user_id}")
+        return None
+    logger.info(f"Задача ID {task.id} успешно обновлена для пользователя {user_id}")
+    return task
+
+
+async def delete_task_by_id(db: AsyncSession, task_id: int, user_id: str) -> bool:
+    """
+    Удалить задачу по ID и пользователю одним ``DELETE ... RETURNING id``.
+    """
+    logger.info(f"Удаление задачи ID {task_id} для пользователя {user_id}")
+    try:
+        deleted_id = (await db.execute(delete_task_stmt(task_id, user_id))).scalar()
+        if deleted_id is not None:
+            await bump_tasks_version(db, user_id)
+        await commit(db)
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при удалении задачи ID {task_id}: {e}")
+        raise
+
+    if deleted_id is None:
+        logger.warning(f"Задача ID {task_id} не найдена для удаления пользователем {user_id}")
+        return False
+    logger.info(f"Задача ID {task_id} успешно удалена для пользователя {user_id}")
+    return True
+
+
+async def bulk_create_tasks(db: AsyncSession, tasks: List[TaskCreate], user_id: str) -> List[Row]:
+    """
+    Создать задачи пользователя многострочным ``INSERT ... RETURNING`` в одной транзакции.
+
+    :return: Строки созданных задач в порядке запроса.
+    """
+    logger.info(f"Массовое создание {len(tasks)} задач для пользователя {user_id}")
+    rows = bulk_create_rows(tasks, user_id)
+    try:
+        result = await db.execute(insert(Task).returning(*Task.__table__.c, sort_by_parameter_order=True), rows)
+        created = result.all()
+        await bump_tasks_version(db, user_id)
+        await commit(db)
+        logger.info(f"Создано задач: {len(created)} для пользователя {user_id}")
+        return created
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при массовом создании задач для пользователя {user_id}: {e}")
+        raise
+
+
+async def bulk_update_tasks(db: AsyncSession, items: List[TaskBulkUpdateItem], user_id: str) -> List[Optional[Row]]:
+    """
+    Обновить задачи пользователя запросами ``UPDATE ... FROM (VALUES ...) RETURNING`` в одной транзакции.
+
+    :return: Для каждого элемента запроса строка обновлённой задачи или None, если задача не найдена.
+    """
+    logger.info(f"Массовое обновление {len(items)} задач для пользователя {user_id}")
+    try:
+        updated = {}
+        for stmt in bulk_update_stmts(items, user_id):
+            updated.update((task.id, task) for task in await db.execute(stmt))
+        if updated:
+            await bump_tasks_version(db, user_id)
+        await commit(db)
+        logger.info(f"Обновлено задач: {len(updated)} из {len(items)} для пользователя {user_id}")
+        return [updated.get(item.id) for item in items]
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при массовом обновлении задач для пользователя {user_id}: {e}")
+        raise
+
+
+async def bulk_delete_tasks(db: AsyncSession, task_ids: List[int], user_id: str) -> List[bool]:
+    """
+    Удалить задачи пользователя одним ``DELETE ... RETURNING id``.
+
+    :return: Для каждого ID из запроса признак того, что задача была удалена.
+    """
+    logger.info(f"Массовое удаление {len(task_ids)} задач для пользователя {user_id}")
+    try:
+        deleted = set(await db.scalars(bulk_delete_stmt(task_ids, user_id)))
+        if deleted:
+            await bump_tasks_version(db, user_id)
+        await commit(db)
+        logger.info(f"Удалено задач: {len(deleted)} из {len(task_ids)} для пользователя {user_id}")
+        return [task_id in deleted for task_id in task_ids]
+    except SQLAlchemyError as e:
+        logger.exception(f"Ошибка при массовом удалении задач для пользователя {user_id}: {e}")
+        raise
@@ -1,54 +1,413 @@
 import asyncio
+import math
+import uuid
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Dict, List, Optional, Tuple
 
+from celery import chord, group
+from redis.exceptions import RedisError
 from sqlalchemy.orm import Session
 
+from app.core.config import (
+    OUTBOX_RETENTION_DAYS,
+    REMINDER_BATCH_SIZE,
+    REMINDER_CHUNK_SIZE,
+    REMINDER_DELIVERY_LOCK_SECONDS,
+    REMINDER_DELIVERY_MODE,
+    REMINDER_MAX_BATCHES,
+    EMAIL_DIGEST_MAX_LENGTH,
+    TELEGRAM_DIGEST_MAX_LENGTH,
+    SMS_DIGEST_MAX_LENGTH,
+)
 from app.core.db import SessionLocal
-from app.services.tasks import get_tasks_with_email_notifications, get_tasks_with_telegram_notifications, \
-    get_tasks_with_sms_notifications
-from app.utils.email import send_task_email_notification
-from app.utils.sms import send_sms_notification
-from app.utils.telegram import send_task_telegram_notification
+from app.core.redis_client import get_redis
+from app.models.notification import NotificationOutbox
+from app.models.task import Task
+from app.services.notifications import (
+    claim_pending_notifications,
+    enqueue_notifications,
+    get_outbox_depth,
+    mark_notification_results,
+    purge_sent_notifications,
+)
+from app.services.tasks import (
+    advance_task_reminders,
+    claim_due_tasks,
+    claim_due_user_tasks,
+)
+from app.utils.email import deliver_email
+from app.utils.messages import render_digest_reminder, render_task_reminder
+from app.utils.sms import send_sms_notifications
+from app.utils.telegram import send_telegram_messages
 from app.core.logger import logger
 from app.core.celery_app import celery
 
 
+# Блокировка рассылки: пока воркеры предыдущего chord разбирают outbox, новые не запускаются
+DELIVERY_LOCK_KEY = "reminders:delivery"
+
+# Снять блокировку, только если она принадлежит этой рассылке
+RELEASE_DELIVERY_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _acquire_delivery_lock() -> Optional[str]:
+    """
+    Захватить блокировку рассылки.
+
+    :return: Токен блокировки или None, если предыдущая рассылка ещё идёт.
+        Если Redis недоступен, рассылка запускается без блокировки.
+    """
+    token = uuid.uuid4().hex
+    try:
+        if not get_redis().set(DELIVERY_LOCK_KEY, token, nx=True, ex=REMINDER_DELIVERY_LOCK_SECONDS):
+            return None
+    except RedisError as e:
+        logger.warning(f"Не удалось захватить блокировку рассылки, запуск без неё: {e}")
+    return token
+
+
+def _release_delivery_lock(token: str) -> None:
+    try:
+        get_redis().eval(RELEASE_DELIVERY_LOCK_SCRIPT, 1, DELIVERY_LOCK_KEY, token)
+    except RedisError as e:
+        logger.warning(f"Не удалось снять блокировку рассылки, она истечёт через "
+                       f"{REMINDER_DELIVERY_LOCK_SECONDS} сек.: {e}")
+
+
+def _outbox_row(channel: str, recipient: str, body: str, user_id: str,
+                task_id: Optional[int] = None, subject: Optional[str] = None) -> dict:
+    return {
+        "channel": channel,
+        "recipient": recipient,
+        "subject": subject,
+        "body": body,
+        "user_id": user_id,
+        "task_id": task_id,
+    }
+
+
+def _build_task_reminders(tasks: List[Task]) -> List[dict]:
+    """
+    Подготовить отдельное напоминание по каждому включённому каналу каждой задачи.
+
+    :param tasks: Задачи для напоминания.
+    :return: Строки для outbox.
+    """
+    rows = []
+    for task in tasks:
+        user = task.user
+        if not user:
+            logger.warning(f"Пользователь не найден для задачи ID {task.id}")
+            continue
+        body = render_task_reminder(task)
+
+        if task.email_notification:
+            if user.email:
+                rows.append(_outbox_row("email", user.email, body, user.id, task.id,
+                                        subject=f"Напоминание о задаче: {task.title}"))
+            else:
+                logger.warning(f"Email пользователя отсутствует для задачи ID {task.id}")
+
+        if task.telegram_notification:
+            if user.telegram_chat_id:
+                rows.append(_outbox_row("telegram", user.telegram_chat_id, body, user.id, task.id))
+            else:
+                logger.warning(f"Telegram Chat ID отсутствует для задачи ID {task.id}")
+
+        if task.sms_notification:
+            if user.phone_number:
+                rows.append(_outbox_row("sms", user.phone_number, body, user.id, task.id))
+            else:
+                logger.warning(f"Номер телефона отсутствует для задачи ID {task.id}")
+    return rows
+
+
+def _build_digest_reminders(tasks: List[Task]) -> List[dict]:
+    """
+    Подготовить по каждому каналу одну сводку обо всех задачах пользователя.
+
+    :param tasks: Задачи в порядке (user_id, id).
+    :return: Строки для outbox.
+    """
+    rows = []
+    for _, user_tasks in groupby(tasks, key=lambda task: task.user_id):
+        user_tasks = list(user_tasks)
+        user = user_tasks[0].user
+        if not user:
+            logger.warning(f"Пользователь не найден для задач ID {[task.id for task in user_tasks]}")
+            continue
+
+        email_tasks = [task for task in user_tasks if task.email_notification]
+        if email_tasks and user.email:
+            rows.append(_outbox_row(
+                "email", user.email, render_digest_reminder(email_tasks, EMAIL_DIGEST_MAX_LENGTH), user.id,
+                subject=f"Напоминание о невыполненных задачах: {len(email_tasks)}",
+            ))
+
+        telegram_tasks = [task for task in user_tasks if task.telegram_notification]
+        if telegram_tasks and user.telegram_chat_id:
+            rows.append(_outbox_row(
+                "telegram", user.telegram_chat_id,
+                render_digest_reminder(telegram_tasks, TELEGRAM_DIGEST_MAX_LENGTH), user.id,
+            ))
+
+        sms_tasks = [task for task in user_tasks if task.sms_notification]
+        if sms_tasks and user.phone_number:
+            rows.append(_outbox_row(
+                "sms", user.phone_number, render_digest_reminder(sms_tasks, SMS_DIGEST_MAX_LENGTH), user.id,
+            ))
+    return rows
+
+
+def _send_email_batch(notifications: List[NotificationOutbox]) -> List[Optional[str]]:
+    errors = []
+    for notification in notifications:
+        try:
+            deliver_email(notification.recipient, notification.subject, notification.body)
+            errors.append(None)
+        except Exception as e:
+            logger.error(f"Ошибка при отправке email уведомления ID {notification.id}: {e}")
+            errors.append(str(e))
+    return errors
+
+
+def _send_telegram_batch(notifications: List[NotificationOutbox]) -> List[Optional[str]]:
+    # Один цикл событий на всю порцию, сообщения отправляются параллельно
+    return asyncio.run(send_telegram_messages([(n.recipient, n.body) for n in notifications]))
+
+
+def _send_sms_batch(notifications: List[NotificationOutbox]) -> List[Optional[str]]:
+    # SMS отправляются пакетами по нескольку получателей в запросе
+    return send_sms_notifications([(n.recipient, n.body) for n in notifications])
+
+
+CHANNEL_SENDERS = {
+    "email": _send_email_batch,
+    "telegram": _send_telegram_batch,
+    "sms": _send_sms_batch,
+}
+
+
+def _deliver_notifications(
+    notifications: List[NotificationOutbox],
+) -> List[Tuple[NotificationOutbox, Optional[str]]]:
+    """
+    Отправить порцию уведомлений из outbox, группируя их по каналу.
+
+    :return: Пары (уведомление, текст ошибки или None при успехе).
+    """
+    results = []
+    by_channel: Dict[str, List[NotificationOutbox]] = {}
+    for notification in notifications:
+        by_channel.setdefault(notification.channel, []).append(notification)
+
+    for channel, channel_notifications in by_channel.items():
+        sender = CHANNEL_SENDERS.get(channel)
+        if sender is None:
+            logger.error(f"Неизвестный канал уведомлений: {channel}")
+            errors = [f"Unknown channel: {channel}"] * len(channel_notifications)
+        else:
+            errors = sender(channel_notifications)
+        results.extend(zip(channel_notifications, errors))
+    return results
+
+
 @celery.task
 def send_task_reminder():
     """
-    Периодическая задача для отправки напоминаний обо всех нерешённых задачах.
+    Периодическая задача-планировщик напоминаний.
+
+    Захватывает задачи с наступившим временем напоминания, в той же транзакции
+    записывает подготовленные уведомления в outbox и сдвигает время следующего
+    напоминания. Затем запускает через chord столько воркеров доставки,
+    сколько нужно для разбора очереди, но не больше REMINDER_MAX_BATCHES;
+    итоги собирает aggregate_reminder_results. Пока воркеры предыдущего chord
+    не завершились, новые не запускаются: уведомления дождутся их или следующего запуска.
     """
-    logger.info("Запуск задачи для отправки напоминаний обо всех нерешённых задачах.")
+    logger.info("Запуск планирования напоминаний.")
     db: Session = SessionLocal()
+    digest = REMINDER_DELIVERY_MODE == "digest"
+    lock_token = None
 
     try:
-        tasks_email = get_tasks_with_email_notifications(db)
-        tasks_telegram = get_tasks_with_telegram_notifications(db)
-        tasks_sms = get_tasks_with_sms_notifications(db)
+        due_count = 0
+        enqueued = 0
+        while True:
+            now = datetime.utcnow()
+            if digest:
+                tasks = claim_due_user_tasks(db, now, REMINDER_CHUNK_SIZE)
+                rows = _build_digest_reminders(tasks)
+            else:
+                tasks = claim_due_tasks(db, now, REMINDER_CHUNK_SIZE)
+                rows = _build_task_reminders(tasks)
+            if not tasks:
+                db.rollback()
+                break
 
-        if not tasks_email and not tasks_telegram and not tasks_sms:
+            # Уведомления и сдвиг напоминания фиксируются атомарно
+            enqueued += enqueue_notifications(db, rows)
+            advance_task_reminders(db, [task.id for task in tasks], now)
+            db.commit()
+            due_count += len(tasks)
+
+        lock_token = _acquire_delivery_lock()
+        if lock_token is None:
+            logger.info(f"Предыдущая рассылка ещё идёт, новые воркеры не запускаются: {due_count} задач, "
+                        f"{enqueued} новых уведомлений.")
+            return {
+                "status": "success",
+                "message": "Delivery already running.",
+                "due_count": due_count,
+                "enqueued_count": enqueued,
+            }
+
+        # Очередь считается только до объёма, который разберут REMINDER_MAX_BATCHES воркеров
+        outbox_depth = get_outbox_depth(db, REMINDER_MAX_BATCHES * REMINDER_BATCH_SIZE)
+        if not outbox_depth:
+            _release_delivery_lock(lock_token)
             logger.info("Нет задач для отправки напоминаний.")
             return {"status": "success", "message": "No tasks to send reminders for."}
 
-        for task in tasks_email:
-            send_task_email_notification(task)
+        batch_count = math.ceil(outbox_depth / REMINDER_BATCH_SIZE)
+        chord(
+            group(deliver_outbox_batch.s() for _ in range(batch_count))
+        )(aggregate_reminder_results.s(lock_token))
+
+        logger.info(
+            f"Запущена рассылка напоминаний: {due_count} задач, {enqueued} новых уведомлений, "
+            f"в очереди {outbox_depth}, {batch_count} воркеров."
+        )
+        return {
+            "status": "success",
+            "due_count": due_count,
+            "enqueued_count": enqueued,
+            "outbox_depth": outbox_depth,
+            "batch_count": batch_count,
+        }
+
+    except Exception as e:
+        db.rollback()
+        if lock_token is not None:
+            _release_delivery_lock(lock_token)
+        logger.error(f"Ошибка при планировании напоминаний: {e}", exc_info=True)
+        return {"status": "error", "error": str(e)}
+    finally:
+        db.close()
+
+
+@celery.task
+def deliver_outbox_batch(limit: int = REMINDER_BATCH_SIZE):
+    """
+    Отправить уведомления, ожидающие в outbox.
+
+    Уведомления захватываются порциями с SKIP LOCKED, поэтому параллельные
+    воркеры не пересекаются. Результат отправки порции фиксируется сразу,
+    так что после падения воркера повторно отправляются только уведомления
+    незафиксированной порции. Неудачные уведомления остаются в очереди
+    до следующего запуска планировщика.
+    """
+    logger.info("Рассылка уведомлений из outbox.")
+    db: Session = SessionLocal()
+
+    try:
+        counts = {"email_count": 0, "telegram_count": 0, "sms_count": 0}
+        failed = 0
+        claimed = 0
+        last_id = 0
+        while claimed < limit:
+            notifications = claim_pending_notifications(db, min(REMINDER_CHUNK_SIZE, limit - claimed), last_id)
+            if not notifications:
+                db.rollback()
+                break
 
-        for task in tasks_telegram:
-            asyncio.run(send_task_telegram_notification(task))
+            results = _deliver_notifications(notifications)
+            mark_notification_results(db, results)
+            db.commit()
 
-        for task in tasks_sms:
-            user = task.user
-            if user and user.phone_number:  # Убедитесь, что у пользователя есть телефон
-                message = (
-                    f"Здравствуйте! Напоминаем вам о задаче:\n\n"
-                    f"Название: {task.title}\n"
-                    f"Описание: {task.description or 'Без описания'}\n\n"
-                    f"Задача ещё не выполнена. Пожалуйста, завершите её!\n"
-                )
-                send_sms_notification(user.phone_number, message)
+            # Неудачные уведомления не перезахватываются в этом же запуске
+            last_id = notifications[-1].id
+            claimed += len(notifications)
+            for notification, error in results:
+                if error is None:
+                    counts[f"{notification.channel}_count"] += 1
+                else:
+                    failed += 1
+
+        logger.info(f"Отправлено уведомлений: {counts}, с ошибкой: {failed}")
+        return {"status": "success", "failed_count": failed, **counts}
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Ошибка при рассылке уведомлений из outbox: {e}", exc_info=True)
+        return {"status": "error", "error": str(e)}
+    finally:
+        db.close()
+
+
+@celery.task
+def aggregate_reminder_results(results: List[dict], lock_token: Optional[str] = None):
+    """
+    Callback chord: суммировать результаты пакетов рассылки и снять блокировку рассылки.
+    """
+    if lock_token is not None:
+        _release_delivery_lock(lock_token)
+    totals = {"email_count": 0, "telegram_count": 0, "sms_count": 0}
+    failed_count = 0
+    failed_batches = 0
+    for result in results:
+        if result.get("status") != "success":
+            failed_batches += 1
+            continue
+        failed_count += result.get("failed_count", 0)
+        for channel in totals:
+            totals[channel] += result.get(channel, 0)
+
+    sent_count = sum(totals.values())
+    if failed_batches:
+        logger.error(f"Рассылка напоминаний завершена с ошибками в {failed_batches} пакетах.")
+    logger.info(f"Уведомления отправлены: {sent_count} ({totals}), с ошибкой: {failed_count}")
+    return {
+        "status": "error" if failed_batches else "success",
+        "sent_count": sent_count,
+        "failed_count": failed_count,
+        "failed_batches": failed_batches,
+        **totals,
+    }
+
+
+@celery.task
+def purge_notification_outbox():
+    """
+    Периодическая задача: удалить отправленные уведомления старше OUTBOX_RETENTION_DAYS.
+
+    Уведомления удаляются порциями, каждая в своей транзакции.
+    Неотправленные (pending, failed) уведомления не удаляются.
+    """
+    logger.info("Очистка outbox от отправленных уведомлений.")
+    db: Session = SessionLocal()
+    sent_before = datetime.utcnow() - timedelta(days=OUTBOX_RETENTION_DAYS)
+
+    try:
+        deleted = 0
+        while True:
+            count = purge_sent_notifications(db, sent_before, REMINDER_CHUNK_SIZE)
+            db.commit()
+            deleted += count
+            if count < REMINDER_CHUNK_SIZE:
+                break
 
-        logger.info("Напоминания обо всех задачах успешно отправлены.")
-        return {"status": "success", "task_count": len(tasks_email) + len(tasks_telegram) + len(tasks_sms)}
+        logger.info(f"Удалено отправленных уведомлений из outbox: {deleted}")
+        return {"status": "success", "deleted_count": deleted}
 
     except Exception as e:
-        logger.error(f"Ошибка при отправке напоминаний: {e}", exc_info=True)
+        db.rollback()
+        logger.error(f"Ошибка при очистке outbox: {e}", exc_info=True)
         return {"status": "error", "error": str(e)}
+    finally:
+        db.close()
@@ -1,61 +1,185 @@
+import os
 import smtplib
+import threading
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from os import getenv
+from queue import Empty, LifoQueue
+from typing import Optional
 
 from app.core.logger import logger
-from app.models.task import Task
-from app.models.user import User
+from app.utils.rate_limit import get_rate_limiter
 
 
-def send_email(to_email: str, subject: str, body: str):
+class SMTPConnectionPool:
     """
-    Отправка email с использованием SMTP.
+    Пул авторизованных SMTP-соединений в пределах процесса.
+
+    Соединение переиспользуется для многих писем, пока не отправит
+    ``max_messages_per_connection`` сообщений; разорванное сервером
+    соединение прозрачно пересоздаётся.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = True,
+        max_size: int = 2,
+        max_messages_per_connection: int = 100,
+        timeout: float = 30,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_size = max_size
+        self.max_messages_per_connection = max_messages_per_connection
+        self.timeout = timeout
+        self._idle = LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def _connect(self) -> smtplib.SMTP:
+        """Открыть новое соединение, выполнить STARTTLS и авторизацию."""
+        logger.info(f"Открытие SMTP-соединения с {self.host}:{self.port}")
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.username and self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            self._discard(server)
+            raise
+        server.messages_sent = 0
+        return server
+
+    @staticmethod
+    def _discard(server: smtplib.SMTP) -> None:
+        """Закрыть соединение, игнорируя ошибки уже разорванного сокета."""
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    @contextmanager
+    def connection(self, fresh: bool = False):
+        """
+        Взять соединение из пула на время отправки.
+
+        Если соединений больше ``max_size``, ожидает освобождения одного из них.
+
+        :param fresh: Открыть новое соединение, не беря простаивающее из пула.
+        """
+        self._slots.acquire()
+        server = None
+        try:
+            try:
+                if fresh:
+                    raise Empty
+                server = self._idle.get_nowait()
+            except Empty:
+                server = self._connect()
+            yield server
+        except Exception:
+            if server is not None:
+                self._discard(server)
+                server = None
+            raise
+        finally:
+            if server is not None:
+                if server.messages_sent >= self.max_messages_per_connection:
+                    self._discard(server)
+                else:
+                    self._idle.put(server)
+            self._slots.release()
+
+    def sendmail(self, from_addr: str, to_addrs, msg: str) -> None:
+        """
+        Отправить письмо через соединение из пула.
+
+        При разрыве соединения сервером письмо отправляется повторно
+        через новое соединение: простаивающие соединения пула, скорее всего,
+        закрыты сервером по той же причине.
+        """
+        try:
+            self._sendmail_once(from_addr, to_addrs, msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+            logger.warning(f"SMTP-соединение разорвано ({e}), переподключение")
+            self._sendmail_once(from_addr, to_addrs, msg, fresh=True)
+
+    def _sendmail_once(self, from_addr: str, to_addrs, msg: str, fresh: bool = False) -> None:
+        with self.connection(fresh=fresh) as server:
+            server.sendmail(from_addr, to_addrs, msg)
+            server.messages_sent += 1
+
+    def close(self) -> None:
+        """Закрыть все простаивающие соединения."""
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except Empty:
+                return
+
+
+_smtp_pool: Optional[SMTPConnectionPool] = None
+_smtp_pool_lock = threading.Lock()
+
+
+def get_smtp_pool() -> SMTPConnectionPool:
+    """
+    Получить пул SMTP-соединений текущего процесса, создав его при первом вызове.
+    """
+    global _smtp_pool
+    with _smtp_pool_lock:
+        if _smtp_pool is None:
+            _smtp_pool = SMTPConnectionPool(
+                host=getenv("SMTP_SERVER", "smtp.gmail.com"),
+                port=int(getenv("SMTP_PORT", 587)),
+                username=getenv("SMTP_EMAIL"),
+                password=getenv("SMTP_PASSWORD"),
+                max_size=int(getenv("SMTP_POOL_SIZE", 2)),
+                max_messages_per_connection=int(getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", 100)),
+            )
+        return _smtp_pool
+
+
+def _reset_smtp_pool_after_fork() -> None:
+    """Не разделять сокеты родителя с дочерними процессами (prefork-воркеры Celery)."""
+    global _smtp_pool, _smtp_pool_lock
+    _smtp_pool = None
+    _smtp_pool_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_smtp_pool_after_fork)
+
+
+def deliver_email(to_email: str, subject: str, body: str) -> None:
+    """
+    Отправить email через пул SMTP-соединений.
+
+    :raises RuntimeError: Если не заданы учётные данные SMTP.
+    :raises smtplib.SMTPException: При ошибке отправки.
     """
-    smtp_server = getenv("SMTP_SERVER", "smtp.gmail.com")
-    smtp_port = int(getenv("SMTP_PORT", 587))
     sender_email = getenv("SMTP_EMAIL")
     sender_password = getenv("SMTP_PASSWORD")
 
     if not sender_email or not sender_password:
-        logger.error("Email или пароль SMTP не указаны в переменных окружения.")
-        return
-
-    try:
-        # Настраиваем сообщение
-        msg = MIMEMultipart()
-        msg["From"] = sender_email
-        msg["To"] = to_email
-        msg["Subject"] = subject
-        msg.attach(MIMEText(body, "plain"))
-
-        # Подключаемся к серверу
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, to_email, msg.as_string())
-
-        logger.info(f"Email успешно отправлен на {to_email}")
-    except Exception as e:
-        logger.error(f"Ошибка при отправке email: {e}")
-
-
-def send_task_email_notification(task: Task):
-    user = task.user
-    if not user or not user.email:
-        logger.warning(f"Email пользователя отсутствует для задачи ID {task.id}")
-        return
-
-    subject = f"Напоминание о задаче: {task.title}"
-    body = (
-        f"Здравствуйте! Напоминаем вам о задаче:\n\n"
-        f"Название: {task.title}\n"
-        f"Описание: {task.description or 'Без описания'}\n\n"
-        f"Задача ещё не выполнена. Пожалуйста, завершите её!\n"
-    )
-
-    try:
-        logger.info(f"Отправка email на {user.email} для задачи ID {task.id}")
-        send_email(user.email, subject, body)
-    except Exception as e:
-        logger.error(f"Ошибка отправки email для задачи ID {task.id}: {e}")
+        raise RuntimeError("Email или пароль SMTP не указаны в переменных окружения.")
+
+    # Настраиваем сообщение
+    msg = MIMEMultipart()
+    msg["From"] = sender_email
+    msg["To"] = to_email
+    msg["Subject"] = subject
+    msg.attach(MIMEText(body, "plain"))
+
+    # Отправляем через уже авторизованное соединение
+    get_rate_limiter().acquire("email", to_email)
+    get_smtp_pool().sendmail(sender_email, to_email, msg.as_string())
+
+    logger.info(f"Email успешно отправлен на {to_email}")
@@ -0,0 +1,45 @@
+import hashlib
+from typing import List, Optional
+
+
+def make_etag(*parts) -> str:
+    """
+    Собрать сильный ETag из частей.
+
+    :param parts: Значения, однозначно определяющие представление ресурса.
+    :return: ETag в кавычках.
+    """
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def digest(*parts) -> str:
+    """
+    Короткий хэш произвольных значений для включения в ETag.
+    """
+    return hashlib.sha1("\x1f".join(str(part) for part in parts).encode()).hexdigest()[:16]
+
+
+def parse_if_none_match(header: Optional[str]) -> List[str]:
+    """
+    Разобрать заголовок If-None-Match в список ETag.
+
+    Слабые ETag (W/"...") сравниваются по значению, как требует RFC 9110 для If-None-Match.
+    """
+    if not header:
+        return []
+    tags = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag:
+            tags.append(tag)
+    return tags
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """
+    Проверить, совпадает ли ETag с одним из перечисленных в If-None-Match.
+    """
+    tags = parse_if_none_match(header)
+    return "*" in tags or etag in tags
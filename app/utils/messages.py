@@ -0,0 +1,45 @@
+from typing import List
+
+from app.models.task import Task
+
+
+def render_task_reminder(task: Task) -> str:
+    """
+    Текст напоминания об одной задаче.
+    """
+    return (
+        f"Здравствуйте! Напоминаем вам о задаче:\n\n"
+        f"Название: {task.title}\n"
+        f"Описание: {task.description or 'Без описания'}\n\n"
+        f"Задача ещё не выполнена. Пожалуйста, завершите её!\n"
+    )
+
+
+def render_digest_reminder(tasks: List[Task], max_length: int) -> str:
+    """
+    Текст сводного напоминания обо всех невыполненных задачах пользователя.
+
+    Задачи перечисляются по порядку, пока текст помещается в ``max_length``
+    символов; об остальных сообщается одной строкой.
+
+    :param tasks: Задачи пользователя.
+    :param max_length: Ограничение длины сообщения канала.
+    :return: Текст сообщения.
+    """
+    header = f"Здравствуйте! Напоминаем вам о невыполненных задачах ({len(tasks)}):\n\n"
+    footer = "\nПожалуйста, завершите их!\n"
+
+    lines = []
+    length = len(header) + len(footer)
+    for index, task in enumerate(tasks):
+        line = f"{index + 1}. {task.title}\n"
+        remaining = len(tasks) - index - 1
+        # Оставляем место под строку об оставшихся задачах, если эта задача не последняя
+        reserve = len(f"...и ещё {remaining}\n") if remaining else 0
+        if length + len(line) + reserve > max_length:
+            lines.append(f"...и ещё {len(tasks) - index}\n")
+            break
+        lines.append(line)
+        length += len(line)
+
+    return (header + "".join(lines) + footer)[:max_length]
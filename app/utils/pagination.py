@@ -0,0 +1,50 @@
+import base64
+import binascii
+import json
+from typing import Any, Tuple
+
+
+class InvalidCursorError(ValueError):
+    """Курсор страницы повреждён или относится к другой сортировке."""
+
+
+def encode_cursor(sort: str, sort_key: Any, last_id: int) -> str:
+    """
+    Закодировать позицию последнего элемента страницы в непрозрачный курсор.
+
+    :param sort: Сортировка, для которой выдан курсор.
+    :param sort_key: Значение поля сортировки последнего элемента.
+    :param last_id: ID последнего элемента.
+    :return: Курсор в base64url без выравнивания.
+    """
+    raw = json.dumps([sort, sort_key, last_id], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _is_instance(value: Any, value_type: type) -> bool:
+    # bool в Python — подкласс int, но в курсоре не допускается
+    return isinstance(value, value_type) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor: str, sort: str, sort_key_type: type) -> Tuple[Any, int]:
+    """
+    Раскодировать курсор страницы.
+
+    :param cursor: Курсор из предыдущего ответа.
+    :param sort: Текущая сортировка; должна совпадать с сортировкой курсора.
+    :param sort_key_type: Тип значения поля сортировки (например, int или str).
+    :return: Пара (значение поля сортировки, ID).
+    :raises InvalidCursorError: Если курсор некорректен.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, sort_key, last_id = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Некорректный курсор: {e}")
+    if cursor_sort != sort:
+        raise InvalidCursorError("Курсор выдан для другой сортировки")
+    # Значения попадают в сравнение с колонками, поэтому их тип проверяется до запроса к базе
+    if not _is_instance(sort_key, sort_key_type) or not _is_instance(last_id, int):
+        raise InvalidCursorError("Некорректный тип значений курсора")
+    return sort_key, last_id
+
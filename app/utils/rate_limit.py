@@ -0,0 +1,386 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from typing import Dict, List, NamedTuple, Optional
+
+import redis
+
+from app.core.config import (
+    AUTH_RATE_LIMIT_ENABLED,
+    AUTH_RATE_LIMIT_BACKEND,
+    LOGIN_IP_LIMIT,
+    LOGIN_IP_WINDOW_SECONDS,
+    LOGIN_EMAIL_LIMIT,
+    LOGIN_EMAIL_WINDOW_SECONDS,
+    REFRESH_IP_LIMIT,
+    REFRESH_IP_WINDOW_SECONDS,
+    RATE_LIMIT_ENABLED,
+    TELEGRAM_GLOBAL_RATE_PER_SECOND,
+    TELEGRAM_CHAT_RATE_PER_SECOND,
+    EMAIL_GLOBAL_RATE_PER_MINUTE,
+    EMAIL_RECIPIENT_RATE_PER_MINUTE,
+    SMS_GLOBAL_RATE_PER_SECOND,
+    SMS_RECIPIENT_RATE_PER_MINUTE,
+)
+from app.core.logger import logger
+from app.core.redis_client import get_redis
+
+
+class Bucket(NamedTuple):
+    """Параметры токен-бакета: скорость пополнения (токенов в секунду) и ёмкость."""
+    rate: float
+    capacity: float
+
+
+class ChannelLimits(NamedTuple):
+    """Глобальный бакет канала и бакет на одного получателя."""
+    global_bucket: Bucket
+    recipient_bucket: Bucket
+
+
+CHANNEL_LIMITS: Dict[str, ChannelLimits] = {
+    "telegram": ChannelLimits(
+        Bucket(TELEGRAM_GLOBAL_RATE_PER_SECOND, TELEGRAM_GLOBAL_RATE_PER_SECOND),
+        Bucket(TELEGRAM_CHAT_RATE_PER_SECOND, 1),
+    ),
+    "email": ChannelLimits(
+        Bucket(EMAIL_GLOBAL_RATE_PER_MINUTE / 60, EMAIL_GLOBAL_RATE_PER_MINUTE),
+        Bucket(EMAIL_RECIPIENT_RATE_PER_MINUTE / 60, EMAIL_RECIPIENT_RATE_PER_MINUTE),
+    ),
+    "sms": ChannelLimits(
+        Bucket(SMS_GLOBAL_RATE_PER_SECOND, SMS_GLOBAL_RATE_PER_SECOND),
+        Bucket(SMS_RECIPIENT_RATE_PER_MINUTE / 60, SMS_RECIPIENT_RATE_PER_MINUTE),
+    ),
+}
+
+# Атомарно списывает токены сразу из всех бакетов или ни из одного.
+# KEYS — ключи бакетов, ARGV — тройки (скорость, ёмкость, запрошено) для каждого ключа.
+# Возвращает 0, если токены списаны, иначе время ожидания в секундах.
+TOKEN_BUCKET_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+
+local tokens = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 3 - 2])
+    local capacity = tonumber(ARGV[i * 3 - 1])
+    local requested = tonumber(ARGV[i * 3])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    available = math.min(capacity, available + math.max(0, now - ts) * rate)
+    tokens[i] = available
+    if available < requested then
+        wait = math.max(wait, (requested - available) / rate)
+    end
+end
+
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 3 - 2])
+    local capacity = tonumber(ARGV[i * 3 - 1])
+    local available = tokens[i]
+    if wait == 0 then
+        available = available - tonumber(ARGV[i * 3])
+    end
+    redis.call('HSET', key, 'tokens', available, 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000) + 1000)
+end
+
+return tostring(wait)
+"""
+
+
+class TokenBucketLimiter:
+    """
+    Распределённый ограничитель скорости отправки на токен-бакетах в Redis.
+
+    Каждая отправка берёт токены из глобального бакета канала и из бакета
+    получателя; бакеты общие для всех процессов и узлов Celery.
+    """
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        limits: Dict[str, ChannelLimits] = CHANNEL_LIMITS,
+        prefix: str = "ratelimit",
+    ):
+        self._redis = redis_client
+        self.limits = limits
+        self.prefix = prefix
+        self._script = None
+
+    def _get_script(self):
+        if self._script is None:
+            self._redis = self._redis or get_redis()
+            self._script = self._redis.register_script(TOKEN_BUCKET_SCRIPT)
+        return self._script
+
+    def try_acquire(self, channel: str, *recipients: str) -> float:
+        """
+        Попытаться получить токены на отправку сообщений получателям.
+
+        :param channel: Канал доставки ("telegram", "email", "sms").
+        :param recipients: Получатели, по одному на сообщение.
+        :return: 0, если отправка разрешена, иначе сколько секунд подождать.
+        """
+        limits = self.limits[channel]
+        if len(recipients) > limits.global_bucket.capacity:
+            raise ValueError(f"Нельзя запросить больше {limits.global_bucket.capacity} токенов канала {channel} за раз")
+        keys = [f"{self.prefix}:{channel}:global"]
+        args = [limits.global_bucket.rate, limits.global_bucket.capacity, len(recipients)]
+        for recipient, count in Counter(recipients).items():
+            keys.append(f"{self.prefix}:{channel}:recipient:{recipient}")
+            args.extend([limits.recipient_bucket.rate, limits.recipient_bucket.capacity, count])
+
+        try:
+            return float(self._get_script()(keys=keys, args=args))
+        except redis.RedisError as e:
+            # Недоступность Redis не должна останавливать рассылку
+            logger.warning(f"Ограничитель скорости недоступен, отправка без ограничения: {e}")
+            return 0.0
+
+    def acquire(self, channel: str, *recipients: str) -> None:
+        """Дождаться разрешения на отправку (блокирующе)."""
+        while (wait := self.try_acquire(channel, *recipients)) > 0:
+            logger.debug(f"Ограничение скорости {channel}: ожидание {wait:.3f} с")
+            time.sleep(wait)
+
+    def acquire_many(self, channel: str, recipients: List[str]) -> None:
+        """
+        Дождаться разрешения на отправку пакета сообщений (блокирующе).
+
+        Токены берутся одним вызовом скрипта на часть пакета, которая помещается
+        в ёмкость глобального бакета и бакетов получателей.
+        """
+        for part in self._split(channel, recipients):
+            self.acquire(channel, *part)
+
+    def _split(self, channel: str, recipients: List[str]) -> List[List[str]]:
+        limits = self.limits[channel]
+        parts: List[List[str]] = []
+        counts: Counter = Counter()
+        for recipient in recipients:
+            if (not parts or len(parts[-1]) >= limits.global_bucket.capacity
+                    or counts[recipient] + 1 > limits.recipient_bucket.capacity):
+                parts.append([])
+                counts.clear()
+            parts[-1].append(recipient)
+            counts[recipient] += 1
+        return parts
+
+    async def acquire_async(self, channel: str, *recipients: str) -> None:
+        """Дождаться разрешения на отправку, не блокируя цикл событий ни запросом к Redis, ни ожиданием."""
+        while (wait := await asyncio.to_thread(self.try_acquire, channel, *recipients)) > 0:
+            logger.debug(f"Ограничение скорости {channel}: ожидание {wait:.3f} с")
+            await asyncio.sleep(wait)
+
+
+class _NoopLimiter:
+    """Ограничитель, который всегда разрешает отправку (RATE_LIMIT_ENABLED=false)."""
+
+    def try_acquire(self, channel: str, *recipients: str) -> float:
+        return 0.0
+
+    def acquire(self, channel: str, *recipients: str) -> None:
+        pass
+
+    def acquire_many(self, channel: str, recipients: List[str]) -> None:
+        pass
+
+    async def acquire_async(self, channel: str, *recipients: str) -> None:
+        pass
+
+
+_rate_limiter = None
+
+
+def get_rate_limiter():
+    """
+    Получить общий ограничитель скорости отправки.
+    """
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = TokenBucketLimiter() if RATE_LIMIT_ENABLED else _NoopLimiter()
+    return _rate_limiter
+
+
+class Window(NamedTuple):
+    """Скользящее окно: не больше limit запросов за seconds секунд."""
+    limit: int
+    seconds: float
+
+
+# Окна для действий аутентификации по типу ключа ("ip", "email")
+AUTH_LIMITS: Dict[str, Dict[str, Window]] = {
+    "login": {
+        "ip": Window(LOGIN_IP_LIMIT, LOGIN_IP_WINDOW_SECONDS),
+        "email": Window(LOGIN_EMAIL_LIMIT, LOGIN_EMAIL_WINDOW_SECONDS),
+    },
+    "refresh": {
+        "ip": Window(REFRESH_IP_LIMIT, REFRESH_IP_WINDOW_SECONDS),
+    },
+}
+
+# Атомарно проверяет все окна и засчитывает запрос во все или ни в одно.
+# KEYS — ключи окон (сортированные множества меток времени), ARGV — пары
+# (лимит, окно в мс) для каждого ключа и последним — уникальный идентификатор запроса.
+# Возвращает 0, если запрос разрешён, иначе через сколько миллисекунд освободится место.
+SLIDING_WINDOW_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[i * 2 - 1])
+    local window = tonumber(ARGV[i * 2])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    local count = redis.call('ZCARD', key)
+    if count >= limit then
+        local oldest = redis.call('ZRANGE', key, count - limit, count - limit, 'WITHSCORES')
+        wait = math.max(wait, tonumber(oldest[2]) + window - now, 1)
+    end
+end
+
+if wait == 0 then
+    for i, key in ipairs(KEYS) do
+        redis.call('ZADD', key, now, ARGV[#ARGV])
+        redis.call('PEXPIRE', key, tonumber(ARGV[i * 2]))
+    end
+end
+
+return wait
+"""
+
+
+class InMemorySlidingWindowLimiter:
+    """
+    Ограничитель частоты запросов со скользящими окнами в памяти процесса.
+
+    Используется в тестах и как запасной вариант, когда Redis недоступен:
+    тогда лимиты действуют в пределах одного процесса API.
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, Window]] = AUTH_LIMITS, max_keys: int = 100000):
+        self.limits = limits
+        self.max_keys = max_keys
+        self._max_window = max(window.seconds for windows in limits.values() for window in windows.values())
+        self._hits: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, action: str, **identities: str) -> float:
+        """
+        Засчитать запрос во все окна действия или ни в одно.
+
+        :param action: Действие ("login", "refresh").
+        :param identities: Значения ключей окон, например ip="1.2.3.4", email="user@example.com".
+        :return: 0, если запрос разрешён, иначе через сколько секунд его можно повторить.
+        """
+        now = time.monotonic()
+        windows = _windows(self.limits, action, identities)
+        with self._lock:
+            wait = 0.0
+            for key, window in windows:
+                hits = self._hits.get(key)
+                if hits is None:
+                    continue
+                while hits and hits[0] <= now - window.seconds:
+                    hits.popleft()
+                if len(hits) >= window.limit:
+                    wait = max(wait, hits[len(hits) - window.limit] + window.seconds - now)
+            if wait > 0:
+                return wait
+
+            if len(self._hits) >= self.max_keys:
+                # Удаляем окна, в которых не осталось запросов
+                self._hits = {key: hits for key, hits in self._hits.items()
+                              if hits and hits[-1] > now - self._max_window}
+            for key, _ in windows:
+                self._hits.setdefault(key, deque()).append(now)
+            return 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._hits.clear()
+
+
+class SlidingWindowLimiter:
+    """
+    Распределённый ограничитель частоты запросов со скользящими окнами в Redis.
+
+    Окна общие для всех процессов API. Если Redis недоступен, запросы
+    ограничиваются окнами в памяти процесса, а не пропускаются без ограничений.
+    """
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        limits: Dict[str, Dict[str, Window]] = AUTH_LIMITS,
+        prefix: str = "authlimit",
+    ):
+        self._redis = redis_client
+        self.limits = limits
+        self.prefix = prefix
+        self.fallback = InMemorySlidingWindowLimiter(limits)
+        self._script = None
+
+    def _get_script(self):
+        if self._script is None:
+            self._redis = self._redis or get_redis()
+            self._script = self._redis.register_script(SLIDING_WINDOW_SCRIPT)
+        return self._script
+
+    def hit(self, action: str, **identities: str) -> float:
+        """
+        Засчитать запрос во все окна действия или ни в одно.
+
+        :return: 0, если запрос разрешён, иначе через сколько секунд его можно повторить.
+        """
+        windows = _windows(self.limits, action, identities)
+        keys = [f"{self.prefix}:{key}" for key, _ in windows]
+        args = []
+        for _, window in windows:
+            args.extend([window.limit, int(window.seconds * 1000)])
+        args.append(uuid.uuid4().hex)
+
+        try:
+            return int(self._get_script()(keys=keys, args=args)) / 1000
+        except redis.RedisError as e:
+            logger.warning(f"Redis недоступен, ограничение частоты входа только в памяти процесса: {e}")
+            return self.fallback.hit(action, **identities)
+
+
+def _windows(limits: Dict[str, Dict[str, Window]], action: str, identities: Dict[str, str]):
+    """Ключи и окна действия для переданных значений; пустые значения пропускаются."""
+    return [
+        (f"{action}:{kind}:{value.lower()}", limits[action][kind])
+        for kind, value in identities.items()
+        if value
+    ]
+
+
+class _NoopAuthLimiter:
+    """Ограничитель, который всегда разрешает запрос (AUTH_RATE_LIMIT_ENABLED=false)."""
+
+    def hit(self, action: str, **identities: str) -> float:
+        return 0.0
+
+
+_auth_rate_limiter = None
+
+
+def get_auth_rate_limiter():
+    """
+    Получить общий ограничитель частоты входа и обновления токенов.
+    """
+    global _auth_rate_limiter
+    if _auth_rate_limiter is None:
+        if not AUTH_RATE_LIMIT_ENABLED:
+            _auth_rate_limiter = _NoopAuthLimiter()
+        elif AUTH_RATE_LIMIT_BACKEND == "memory":
+            _auth_rate_limiter = InMemorySlidingWindowLimiter()
+        else:
+            _auth_rate_limiter = SlidingWindowLimiter()
+    return _auth_rate_limiter
@@ -1,40 +1,163 @@
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
 import requests
+from requests.adapters import HTTPAdapter
+
 from app.core.logger import logger
-import os
+from app.utils.rate_limit import get_rate_limiter
 
 SMSRU_API_KEY = os.getenv("SMSRU_API_KEY")  # Токен для доступа к SMS.ru API
-SMSRU_API_URL = "https://sms.ru/sms/send"
+SMSRU_API_URL = os.getenv("SMSRU_API_URL", "https://sms.ru/sms/send")
+SMSRU_POOL_SIZE = int(os.getenv("SMSRU_POOL_SIZE", 10))  # Размер пула keep-alive соединений
+SMSRU_TIMEOUT = float(os.getenv("SMSRU_TIMEOUT", 10))    # Таймаут запроса в секундах
+SMSRU_MAX_RECIPIENTS = 100  # Ограничение SMS.ru на количество получателей в одном запросе
 
 
-def send_sms_notification(phone_number: str, message: str):
-    """
-    Отправляет SMS-уведомление с использованием SMS.ru.
+def _normalize_phone(phone_number: str) -> str:
+    """Привести номер к виду, в котором его возвращает SMS.ru (только цифры)."""
+    return "".join(ch for ch in phone_number if ch.isdigit())
 
-    :param phone_number: Номер получателя (в формате +79123456789).
-    :param message: Текст сообщения.
+
+class SmsRuClient:
     """
-    try:
-        logger.info(f"Отправка SMS на {phone_number} через SMS.ru.")
-
-        # Параметры запроса
-        payload = {
-            "api_id": SMSRU_API_KEY,
-            "to": phone_number,
-            "msg": message,
-            "json": 1,  # Формат ответа - JSON
-        }
+    Клиент SMS.ru с пулом keep-alive соединений и пакетной отправкой.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        api_url: str = SMSRU_API_URL,
+        pool_size: int = SMSRU_POOL_SIZE,
+        timeout: float = SMSRU_TIMEOUT,
+        max_recipients: int = SMSRU_MAX_RECIPIENTS,
+    ):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.timeout = timeout
+        self.max_recipients = max_recipients
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
-        # Отправка запроса
-        response = requests.post(SMSRU_API_URL, data=payload)
-        response_data = response.json()
+    def send(self, phone_number: str, message: str) -> dict:
+        """
+        Отправить одно SMS.
 
-        if response_data.get("status") == "OK":
-            sms_status = response_data.get("sms", {}).get(phone_number, {})
-            if sms_status.get("status") == "OK":
-                logger.info(f"SMS успешно отправлено на {phone_number}. ID сообщения: {sms_status.get('sms_id')}")
+        :return: Статус отправки для номера.
+        """
+        return self.send_bulk([(phone_number, message)])[0]
+
+    def send_bulk(self, messages: List[Tuple[str, str]]) -> List[dict]:
+        """
+        Отправить много SMS с минимальным количеством запросов.
+
+        Сообщения упаковываются в запросы вида ``multi[номер]=текст``
+        (до ``max_recipients`` номеров в запросе, каждый номер не более одного раза).
+
+        :param messages: Пары (номер, текст).
+        :return: Статусы в порядке входных сообщений: словари с ключами
+                 status ("OK" или "ERROR"), sms_id и status_text.
+        """
+        statuses: List[Optional[dict]] = [None] * len(messages)
+        for batch in self._pack(messages):
+            for index, status in self._send_batch([(index, messages[index]) for index in batch]).items():
+                statuses[index] = status
+        return statuses
+
+    def _pack(self, messages: List[Tuple[str, str]]) -> List[List[int]]:
+        """Разбить сообщения на запросы без повторяющихся номеров."""
+        batches: List[Tuple[List[int], set]] = []
+        for index, (phone_number, _) in enumerate(messages):
+            phone = _normalize_phone(phone_number)
+            for batch, phones in batches:
+                if phone not in phones and len(batch) < self.max_recipients:
+                    batch.append(index)
+                    phones.add(phone)
+                    break
             else:
-                logger.error(f"Ошибка отправки SMS на {phone_number}: {sms_status.get('status_text')}")
-        else:
-            logger.error(f"Ошибка отправки SMS через SMS.ru: {response_data.get('status_text')}")
+                batches.append(([index], {phone}))
+        return [batch for batch, _ in batches]
+
+    def _send_batch(self, items: List[Tuple[int, Tuple[str, str]]]) -> Dict[int, dict]:
+        payload = {"api_id": self.api_key, "json": 1}
+        for _, (phone_number, message) in items:
+            payload[f"multi[{_normalize_phone(phone_number)}]"] = message
+
+        try:
+            response = self.session.post(self.api_url, data=payload, timeout=self.timeout)
+            response_data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"Ошибка запроса к SMS.ru: {e}")
+            return {index: {"status": "ERROR", "status_text": str(e)} for index, _ in items}
+
+        if response_data.get("status") != "OK":
+            status_text = response_data.get("status_text")
+            logger.error(f"Ошибка отправки SMS через SMS.ru: {status_text}")
+            return {index: {"status": "ERROR", "status_text": status_text} for index, _ in items}
+
+        sms = response_data.get("sms", {})
+        return {
+            index: sms.get(_normalize_phone(phone_number))
+            or {"status": "ERROR", "status_text": "Нет статуса для номера в ответе SMS.ru"}
+            for index, (phone_number, _) in items
+        }
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_sms_client: Optional[SmsRuClient] = None
+_sms_client_lock = threading.Lock()
+
+
+def get_sms_client() -> SmsRuClient:
+    """
+    Получить клиент SMS.ru текущего процесса, создав его при первом вызове.
+    """
+    global _sms_client
+    with _sms_client_lock:
+        if _sms_client is None:
+            _sms_client = SmsRuClient(SMSRU_API_KEY)
+        return _sms_client
+
+
+def _reset_sms_client_after_fork() -> None:
+    """Не разделять соединения родителя с дочерними процессами (prefork-воркеры Celery)."""
+    global _sms_client, _sms_client_lock
+    _sms_client = None
+    _sms_client_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_sms_client_after_fork)
+
+
+def send_sms_notifications(messages: List[Tuple[str, str]]) -> List[Optional[str]]:
+    """
+    Отправляет пакет SMS-уведомлений через SMS.ru.
+
+    :param messages: Пары (номер, текст).
+    :return: Для каждого SMS None при успехе или текст ошибки.
+    """
+    if not messages:
+        return []
+
+    logger.info(f"Отправка {len(messages)} SMS через SMS.ru.")
+    try:
+        get_rate_limiter().acquire_many("sms", [phone_number for phone_number, _ in messages])
+        statuses = get_sms_client().send_bulk(messages)
     except Exception as e:
-        logger.error(f"Ошибка при отправке SMS на {phone_number}: {e}")
+        logger.error(f"Ошибка при отправке SMS: {e}")
+        return [str(e)] * len(messages)
+
+    errors = []
+    for (phone_number, _), sms_status in zip(messages, statuses):
+        if sms_status.get("status") == "OK":
+            errors.append(None)
+            logger.info(f"SMS успешно отправлено на {phone_number}. ID сообщения: {sms_status.get('sms_id')}")
+        else:
+            errors.append(sms_status.get("status_text") or "Ошибка отправки SMS")
+            logger.error(f"Ошибка отправки SMS на {phone_number}: {sms_status.get('status_text')}")
+    return errors
@@ -1,24 +1,58 @@
+import asyncio
+from collections import defaultdict
+from typing import List, Optional, Tuple
+
 from app.core.logger import logger
-from app.core.config import bot
-from app.models.task import Task
-from app.models.user import User
-from telegram.error import TelegramError
-
-async def send_task_telegram_notification(task: Task):
-    user = task.user
-    if not user or not user.telegram_chat_id:
-        logger.warning(f"Telegram Chat ID отсутствует для задачи ID {task.id}")
-        return
-
-    message = (
-        f"Здравствуйте! Напоминаем вам о задаче:\n\n"
-        f"Название: {task.title}\n"
-        f"Описание: {task.description or 'Без описания'}\n\n"
-        f"Задача ещё не выполнена. Пожалуйста, завершите её!\n"
-    )
-
-    try:
-        logger.info(f"Отправка сообщения в Telegram для задачи ID {task.id}")
-        await bot.send_message(chat_id=user.telegram_chat_id, text=message)
-    except TelegramError as e:
-        logger.error(f"Ошибка отправки сообщения в Telegram для задачи ID {task.id}: {e}")
+from app.core.config import bot, TELEGRAM_CONCURRENCY, TELEGRAM_MAX_RETRIES
+from app.utils.rate_limit import get_rate_limiter
+from telegram.error import RetryAfter, TelegramError
+
+
+async def send_telegram_messages(
+    messages: List[Tuple[str, str]], concurrency: int = TELEGRAM_CONCURRENCY
+) -> List[Optional[str]]:
+    """
+    Отправить пакет сообщений в Telegram в одном цикле событий.
+
+    Сообщения отправляются параллельно, не более ``concurrency`` запросов одновременно
+    и с учётом общих для всех воркеров лимитов (глобального и на чат).
+    Сообщения в один чат идут последовательно, поэтому ответ RetryAfter
+    задерживает только этот чат, не занимая слот у остальных.
+
+    :param messages: Пары (chat_id, текст).
+    :param concurrency: Максимальное количество одновременных запросов.
+    :return: Для каждого сообщения None при успехе или текст ошибки.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    chat_locks = defaultdict(asyncio.Lock)
+
+    async def _send(chat_id: str, message: str) -> Optional[str]:
+        async with chat_locks[chat_id]:
+            for attempt in range(TELEGRAM_MAX_RETRIES + 1):
+                # Ожидание лимита не занимает слот параллельности
+                await get_rate_limiter().acquire_async("telegram", chat_id)
+                async with semaphore:
+                    try:
+                        logger.info(f"Отправка сообщения в Telegram в чат {chat_id}")
+                        await bot.send_message(chat_id=chat_id, text=message)
+                        return None
+                    except RetryAfter as e:
+                        retry_after = e.retry_after
+                    except TelegramError as e:
+                        logger.error(f"Ошибка отправки сообщения в Telegram в чат {chat_id}: {e}")
+                        return str(e)
+
+                if attempt == TELEGRAM_MAX_RETRIES:
+                    break
+                logger.warning(f"Telegram просит подождать {retry_after} с для чата {chat_id}")
+                await asyncio.sleep(retry_after)
+
+        logger.error(f"Не удалось отправить сообщение в Telegram в чат {chat_id}: превышен лимит повторов")
+        return "Превышен лимит повторов после RetryAfter"
+
+    if not messages:
+        return []
+
+    # HTTP-клиент бота привязан к циклу событий, поэтому открываем и закрываем его на каждый пакет
+    async with bot:
+        return list(await asyncio.gather(*(_send(chat_id, message) for chat_id, message in messages)))
@@ -0,0 +1,68 @@
+"""
+Бенчмарк отправки email: новое SMTP-соединение на каждое письмо против пула.
+
+Письма отправляются на локальный SMTP-приёмник aiosmtpd, который их отбрасывает.
+
+Запуск: python -m benchmarks.bench_smtp_pool [количество_писем]
+"""
+import smtplib
+import sys
+import time
+
+from aiosmtpd.controller import Controller
+
+from app.utils.email import SMTPConnectionPool
+
+HOST = "127.0.0.1"
+PORT = 8025
+SENDER = "bench@example.com"
+RECIPIENT = "user@example.com"
+MESSAGE = "Subject: Напоминание\r\n\r\nЗадача ещё не выполнена.".encode("utf-8")
+
+
+class SinkHandler:
+    """Обработчик aiosmtpd, принимающий и отбрасывающий письма."""
+
+    async def handle_DATA(self, server, session, envelope):
+        return "250 OK"
+
+
+def send_without_pool(count: int) -> None:
+    """Каждое письмо отправляется через новое соединение, как раньше в send_email."""
+    for _ in range(count):
+        with smtplib.SMTP(HOST, PORT) as server:
+            server.sendmail(SENDER, RECIPIENT, MESSAGE)
+
+
+def send_with_pool(count: int) -> None:
+    """Письма отправляются через пул соединений."""
+    pool = SMTPConnectionPool(HOST, PORT, use_tls=False, max_size=1, max_messages_per_connection=100)
+    try:
+        for _ in range(count):
+            pool.sendmail(SENDER, RECIPIENT, MESSAGE)
+    finally:
+        pool.close()
+
+
+def measure(name: str, func, count: int) -> float:
+    started = time.perf_counter()
+    func(count)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<24} {count} писем за {elapsed:.3f} с ({count / elapsed:.0f} писем/с)")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    controller = Controller(SinkHandler(), hostname=HOST, port=PORT)
+    controller.start()
+    try:
+        without_pool = measure("Без пула", send_without_pool, count)
+        with_pool = measure("С пулом", send_with_pool, count)
+        print(f"Ускорение: x{without_pool / with_pool:.1f}")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,50 @@
 import os
+import pytest
 from dotenv import load_dotenv
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import Values
 
 # Загрузка переменных из .env
 load_dotenv()
 
+# Redis в памяти процесса; ограничения скорости отправки и входа проверяются отдельными тестами
+os.environ.setdefault("REDIS_URL", "fakeredis://")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("AUTH_RATE_LIMIT_ENABLED", "false")
+
+
+@compiles(Values, "sqlite")
+def _compile_values_sqlite(element, compiler, asfrom=False, from_linter=None, **kw):
+    """
+    Тесты работают на SQLite, которая не поддерживает список колонок у псевдонима
+    ``(VALUES ...) AS v (a, b)`` из массового обновления задач. Именованный VALUES
+    оборачивается в подзапрос с колонками column1, column2, ...; PostgreSQL
+    выполняет запрос как есть.
+    """
+    if not asfrom or element._unnamed:
+        return compiler.visit_values(element, asfrom=asfrom, from_linter=from_linter, **kw)
+    if from_linter:
+        from_linter.froms[element._de_clone()] = element.name
+    rows = compiler._render_values(element, **kw)
+    kw["include_table"] = False
+    columns = ", ".join(
+        f"column{i} AS {column._compiler_dispatch(compiler, **kw)}"
+        for i, column in enumerate(element.columns, start=1)
+    )
+    return f"(SELECT {columns} FROM ({rows})) AS {compiler.preparer.quote(element.name)}"
+
+
 def pytest_configure(config):
     log_level = os.getenv("PYTEST_LOG_LEVEL", "INFO")
     config.option.log_cli = True
     config.option.log_cli_level = log_level
+
+
+@pytest.fixture(autouse=True)
+def clear_principal_cache():
+    """Очищает кэши пользователей и токенов, чтобы тесты не зависели друг от друга."""
+    from app.core.cache import get_principal_cache, get_token_cache
+
+    get_principal_cache().clear()
+    get_token_cache().clear()
+    yield
@@ -0,0 +1,172 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core.db import Base, get_async_db
+from app.models.task import Task
+from app.models.user import User
+from app.routers import auth_async, tasks_async
+from app.schemas.tasks import TaskBulkUpdateItem, TaskUpdate
+from app.services import tasks_async as tasks_service
+from app.services.auth import create_access_token, hash_password
+
+app = FastAPI()
+app.include_router(auth_async.router)
+app.include_router(tasks_async.router)
+
+
+@pytest_asyncio.fixture
+async def db():
+    """Асинхронная сессия SQLite в памяти (aiosqlite) с пользователем и тремя задачами."""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    async with session_factory() as session:
+        session.add(User(id="user-1", email="user@example.com", hashed_password=hash_password("password"),
+                         is_active=True))
+        session.add_all(Task(title=f"Task {i}", user_id="user-1") for i in range(3))
+        await session.commit()
+
+    async def override_get_async_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    async with session_factory() as session:
+        yield session
+    app.dependency_overrides.pop(get_async_db, None)
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def client(db):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def auth_headers():
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'user-1'})}"}
+
+
+@pytest.mark.asyncio
+async def test_async_tasks_page_and_version(db):
+    """Тест асинхронной страницы задач с курсором и версии списка."""
+    tasks, next_cursor = await tasks_service.get_tasks_page(db, "user-1", limit=2)
+    assert [task.title for task in tasks] == ["Task 0", "Task 1"]
+
+    tasks, next_cursor = await tasks_service.get_tasks_page(db, "user-1", limit=2, cursor=next_cursor)
+    assert [task.title for task in tasks] == ["Task 2"]
+    assert next_cursor is None
+    assert await tasks_service.get_tasks_version(db, "user-1") == 0
+
+
+@pytest.mark.asyncio
+async def test_async_task_mutations_bump_version(db):
+    """Тест асинхронных изменений задач: каждое увеличивает версию списка пользователя."""
+    updated = await tasks_service.update_task_by_id(db, 1, TaskUpdate(completed=True), "user-1")
+    assert updated.completed is True
+    assert updated.version == 2
+
+    results = await tasks_service.bulk_update_tasks(
+        db, [TaskBulkUpdateItem(id=2, title="Renamed"), TaskBulkUpdateItem(id=99, title="Missing")], "user-1"
+    )
+    assert results[0].title == "Renamed"
+    assert results[1] is None
+
+    assert await tasks_service.delete_task_by_id(db, 3, "user-1") is True
+    assert await tasks_service.delete_task_by_id(db, 3, "user-1") is False
+    assert await tasks_service.get_tasks_version(db, "user-1") == 3
+
+
+@pytest.mark.asyncio
+async def test_async_task_routes(client, auth_headers):
+    """Тест полного цикла работы с задачами через асинхронные маршруты."""
+    response = await client.post("/tasks", headers=auth_headers, json={"title": "New", "user_id": "user-1"})
+    assert response.status_code == 201
+    task_id = response.json()["id"]
+
+    response = await client.get(f"/tasks/{task_id}", headers=auth_headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    response = await client.get(f"/tasks/{task_id}", headers=dict(auth_headers, **{"If-None-Match": etag}))
+    assert response.status_code == 304
+
+    response = await client.put(f"/tasks/{task_id}", headers=auth_headers, json={"title": "Updated"})
+    assert response.json()["title"] == "Updated"
+
+    response = await client.post("/tasks/bulk", headers=auth_headers, json={"tasks": [{"title": "A"}, {"title": "B"}]})
+    assert [item["task"]["title"] for item in response.json()["results"]] == ["A", "B"]
+
+    response = await client.get("/tasks", headers=auth_headers, params={"limit": 2})
+    assert len(response.json()) == 2
+    assert "X-Next-Cursor" in response.headers
+
+    assert (await client.delete(f"/tasks/{task_id}", headers=auth_headers)).status_code == 204
+    assert (await client.get(f"/tasks/{task_id}", headers=auth_headers)).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_async_concurrent_requests(client, auth_headers):
+    """Тест: параллельные запросы обслуживаются в одном цикле событий."""
+    responses = await asyncio.gather(*(client.get("/tasks", headers=auth_headers) for _ in range(50)))
+
+    assert all(response.status_code == 200 for response in responses)
+    assert all(len(response.json()) == 3 for response in responses)
+
+
+@pytest.mark.asyncio
+async def test_async_auth_routes(client):
+    """Тест регистрации, входа и профиля через асинхронные маршруты."""
+    response = await client.post("/auth/register", json={"email": "new@example.com", "password": "secret"})
+    assert response.status_code == 200
+    assert response.json()["is_active"] is True
+
+    response = await client.post("/auth/register", json={"email": "New@Example.com", "password": "secret"})
+    assert response.status_code == 400
+
+    response = await client.post("/auth/login", json={"email": "new@example.com", "password": "wrong"})
+    assert response.status_code == 401
+
+    response = await client.post("/auth/login", json={"email": "NEW@example.com", "password": "secret"})
+    assert response.status_code == 200
+
+    response = await client.get("/auth/me")
+    assert response.json()["email"] == "new@example.com"
+    assert (await client.post("/auth/refresh")).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_async_routes_call_redis_off_event_loop(client, auth_headers):
+    """Тест: синхронные обращения к Redis из асинхронных маршрутов выполняются вне потока цикла событий."""
+    threads = []
+
+    class Recorder:
+        def __init__(self, result=None):
+            self.result = result
+
+        def __getattr__(self, name):
+            def call(*args, **kwargs):
+                threads.append((name, threading.get_ident()))
+                return self.result
+            return call
+
+    with patch("app.routers.tasks_async.get_task_list_cache", return_value=Recorder((None, "0"))), \
+            patch("app.services.tasks_async.get_task_list_cache", return_value=Recorder()), \
+            patch("app.routers.auth.get_auth_rate_limiter", return_value=Recorder(0)):
+        assert (await client.get("/tasks", headers=auth_headers)).status_code == 200
+        assert (await client.put("/tasks/1", headers=auth_headers, json={"title": "Updated"})).status_code == 200
+        assert (await client.post("/auth/login", json={"email": "user@example.com", "password": "password"})
+                ).status_code == 200
+
+    assert [name for name, _ in threads] == ["get", "set", "invalidate", "hit"]
+    assert threading.get_ident() not in {thread for _, thread in threads}
@@ -0,0 +1,100 @@
+from unittest.mock import patch
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.rate_limit import InMemorySlidingWindowLimiter, SlidingWindowLimiter, Window
+
+LIMITS = {
+    "login": {"ip": Window(limit=3, seconds=60), "email": Window(limit=2, seconds=60)},
+    "refresh": {"ip": Window(limit=1, seconds=60)},
+}
+
+
+@pytest.fixture
+def redis_server():
+    """Общий сервер fakeredis, как один Redis для нескольких процессов API."""
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def limiter(redis_server):
+    return SlidingWindowLimiter(fakeredis.FakeRedis(server=redis_server), limits=LIMITS)
+
+
+def test_email_window_limits_attempts(limiter):
+    """Тест: окно email ограничивает попытки входа в один аккаунт с разных IP."""
+    assert limiter.hit("login", ip="10.0.0.1", email="user@example.com") == 0
+    assert limiter.hit("login", ip="10.0.0.2", email="User@Example.com") == 0
+
+    wait = limiter.hit("login", ip="10.0.0.3", email="user@example.com")
+    assert 59 < wait <= 60
+
+
+def test_ip_window_limits_attempts(limiter):
+    """Тест: окно IP ограничивает перебор разных аккаунтов с одного адреса."""
+    for i in range(3):
+        assert limiter.hit("login", ip="10.0.0.1", email=f"user-{i}@example.com") == 0
+
+    assert limiter.hit("login", ip="10.0.0.1", email="other@example.com") > 0
+    assert limiter.hit("login", ip="10.0.0.2", email="other@example.com") == 0
+
+
+def test_rejected_request_is_not_counted(limiter):
+    """Тест: отклонённый запрос не засчитывается ни в одно окно."""
+    limiter.hit("login", ip="10.0.0.1", email="user@example.com")
+    limiter.hit("login", ip="10.0.0.1", email="user@example.com")
+    for _ in range(5):
+        assert limiter.hit("login", ip="10.0.0.1", email="user@example.com") > 0
+
+    assert limiter.hit("login", ip="10.0.0.1", email="other@example.com") == 0
+
+
+def test_windows_shared_between_processes(redis_server):
+    """Тест: окна общие для всех клиентов одного Redis."""
+    process_1 = SlidingWindowLimiter(fakeredis.FakeRedis(server=redis_server), limits=LIMITS)
+    process_2 = SlidingWindowLimiter(fakeredis.FakeRedis(server=redis_server), limits=LIMITS)
+
+    assert process_1.hit("refresh", ip="10.0.0.1") == 0
+    assert process_2.hit("refresh", ip="10.0.0.1") > 0
+
+
+def test_redis_unavailable_falls_back_to_memory():
+    """Тест: при недоступном Redis лимиты действуют в памяти процесса."""
+    broken = fakeredis.FakeRedis()
+    broken.connected = False
+    limiter = SlidingWindowLimiter(broken, limits=LIMITS)
+
+    assert limiter.hit("refresh", ip="10.0.0.1") == 0
+    assert limiter.hit("refresh", ip="10.0.0.1") > 0
+
+
+def test_in_memory_window_slides():
+    """Тест: в окне памяти процесса старые запросы перестают учитываться."""
+    limiter = InMemorySlidingWindowLimiter(LIMITS)
+    with patch("app.utils.rate_limit.time.monotonic", return_value=1000.0):
+        assert limiter.hit("refresh", ip="10.0.0.1") == 0
+    with patch("app.utils.rate_limit.time.monotonic", return_value=1030.0):
+        assert limiter.hit("refresh", ip="10.0.0.1") == 30
+    with patch("app.utils.rate_limit.time.monotonic", return_value=1060.0):
+        assert limiter.hit("refresh", ip="10.0.0.1") == 0
+
+
+def test_login_over_limit_skips_database_and_bcrypt():
+    """Тест: запрос сверх лимита получает 429 до обращения к базе и проверки пароля."""
+    client = TestClient(app)
+    limiter = InMemorySlidingWindowLimiter(LIMITS)
+    with patch("app.routers.auth.get_auth_rate_limiter", return_value=limiter), \
+            patch("app.routers.auth.get_user_by_email", return_value=None) as get_user_by_email:
+        codes = [client.post("/auth/login", json={"email": "user@example.com", "password": "x"}).status_code
+                 for _ in range(3)]
+        response = client.post("/auth/refresh")
+        second = client.post("/auth/refresh")
+
+    assert codes == [401, 401, 429]
+    assert get_user_by_email.call_count == 2
+    assert response.status_code == 401
+    assert second.status_code == 429
+    assert second.headers["Retry-After"] == "60"
@@ -1,10 +1,29 @@
+import asyncio
+
 import pytest
 from unittest.mock import patch, AsyncMock
+from app.core.redis_client import get_redis
+from app.models.notification import NotificationOutbox
 from app.models.task import Task
 from app.models.user import User
-from app.tasks.notifications import send_task_reminder
-from app.utils.email import send_task_email_notification
-from app.utils.telegram import send_task_telegram_notification
+from app.tasks.notifications import (
+    DELIVERY_LOCK_KEY,
+    send_task_reminder,
+    deliver_outbox_batch,
+    aggregate_reminder_results,
+    purge_notification_outbox,
+)
+from app.utils.telegram import send_telegram_messages
+from app.utils.messages import render_digest_reminder
+from telegram.error import RetryAfter
+
+
+@pytest.fixture(autouse=True)
+def delivery_lock():
+    """Блокировка рассылки не переходит между тестами: chord в них не выполняется."""
+    get_redis().delete(DELIVERY_LOCK_KEY)
+    yield
+    get_redis().delete(DELIVERY_LOCK_KEY)
 
 
 @pytest.fixture
@@ -46,111 +65,314 @@ def mock_task_telegram(mock_user):
 
 
 @patch("app.tasks.notifications.SessionLocal")
-@patch("app.tasks.notifications.send_task_email_notification")
-@patch("app.tasks.notifications.send_task_telegram_notification")
-@patch("app.tasks.notifications.get_tasks_with_sms_notifications")
+@patch("app.tasks.notifications.chord")
+@patch("app.tasks.notifications.get_outbox_depth", return_value=4500)
+@patch("app.tasks.notifications.advance_task_reminders")
+@patch("app.tasks.notifications.enqueue_notifications", side_effect=lambda db, rows: len(rows))
+@patch("app.tasks.notifications.claim_due_tasks")
 def test_send_task_reminder(
-    mock_process_sms,
-    mock_process_telegram,
-    mock_process_email,
-    mock_session,
-    mock_task_email,
-    mock_task_telegram,
+    mock_claim_tasks, mock_enqueue, mock_advance, mock_depth, mock_chord, mock_session,
+    mock_task_email, mock_task_telegram,
 ):
     """
-    Тестирует отправку напоминаний по email и Telegram.
+    Тестирует планирование: уведомления записываются в outbox вместе со сдвигом
+    напоминания, а воркеры доставки запускаются одним chord по глубине очереди.
     """
-    # Настройка mock базы данных
-    mock_session.return_value.query.return_value.filter.return_value.all.side_effect = [
-        [mock_task_email],  # Возвращаем email задачи
-        [mock_task_telegram],  # Возвращаем Telegram задачи
+    mock_claim_tasks.side_effect = [[mock_task_email, mock_task_telegram], []]
+
+    result = send_task_reminder()
+
+    rows = mock_enqueue.call_args.args[1]
+    assert [(row["channel"], row["recipient"], row["task_id"]) for row in rows] == [
+        ("email", "test@example.com", 1),
+        ("telegram", "123456789", 2),
     ]
+    assert rows[0]["subject"] == "Напоминание о задаче: Test Task Email"
+    assert mock_advance.call_args.args[1] == [1, 2]
+    mock_session.return_value.commit.assert_called_once()
+
+    header = mock_chord.call_args.args[0]
+    assert [sig.task for sig in header.tasks] == ["app.tasks.notifications.deliver_outbox_batch"] * 3
+    mock_chord.return_value.assert_called_once()
+    mock_session.return_value.close.assert_called_once()
+
+    assert result == {
+        "status": "success",
+        "due_count": 2,
+        "enqueued_count": 2,
+        "outbox_depth": 4500,
+        "batch_count": 3,
+    }
+
+
+@patch("app.tasks.notifications.REMINDER_MAX_BATCHES", 2)
+@patch("app.tasks.notifications.SessionLocal")
+@patch("app.tasks.notifications.chord")
+@patch("app.tasks.notifications.get_outbox_depth", return_value=4000)
+@patch("app.tasks.notifications.claim_due_tasks", return_value=[])
+def test_send_task_reminder_caps_workers_and_skips_while_running(mock_claim_tasks, mock_depth, mock_chord,
+                                                                 mock_session):
+    """
+    Тестирует, что очередь считается не дальше REMINDER_MAX_BATCHES воркеров, а пока
+    идёт предыдущая рассылка, новые воркеры не запускаются.
+    """
+    result = send_task_reminder()
+
+    mock_depth.assert_called_once_with(mock_session.return_value, 2 * 2000)
+    assert result["batch_count"] == 2
+    callback = mock_chord.return_value.call_args.args[0]
+    lock_token = get_redis().get(DELIVERY_LOCK_KEY).decode()
+    assert callback.args == (lock_token,)
 
-    # Запускаем функцию
     result = send_task_reminder()
+    assert result["message"] == "Delivery already running."
+    assert mock_chord.call_count == 1
+
+    aggregate_reminder_results([], "other-token")
+    assert get_redis().get(DELIVERY_LOCK_KEY) is not None
+    aggregate_reminder_results([], lock_token)
+    assert get_redis().get(DELIVERY_LOCK_KEY) is None
+    assert send_task_reminder()["batch_count"] == 2
 
-    # Проверяем вызовы функций
-    mock_process_email.assert_called_once_with(mock_task_email)
-    mock_process_telegram.assert_called_once_with(mock_task_telegram)
 
-    # Проверяем результат выполнения
+@patch("app.tasks.notifications.SessionLocal")
+@patch("app.tasks.notifications.chord")
+@patch("app.tasks.notifications.get_outbox_depth", return_value=0)
+@patch("app.tasks.notifications.claim_due_tasks", return_value=[])
+def test_send_task_reminder_no_tasks(mock_claim_tasks, mock_depth, mock_chord, mock_session):
+    """
+    Тестирует планирование рассылки, когда напоминать не о чем.
+    """
+    result = send_task_reminder()
+
+    mock_chord.assert_not_called()
     assert result["status"] == "success"
-    assert result["task_count"] == 2
+    assert result["message"] == "No tasks to send reminders for."
+    assert get_redis().get(DELIVERY_LOCK_KEY) is None
 
 
-@patch("app.utils.email.send_email")
-def test_process_email_notification(mock_send_email, mock_task_email):
+@patch("app.tasks.notifications.SessionLocal")
+@patch("app.tasks.notifications.chord")
+@patch("app.tasks.notifications.advance_task_reminders", side_effect=RuntimeError("DB down"))
+@patch("app.tasks.notifications.enqueue_notifications")
+@patch("app.tasks.notifications.claim_due_tasks")
+def test_send_task_reminder_error_keeps_tasks_due(
+    mock_claim_tasks, mock_enqueue, mock_advance, mock_chord, mock_session, mock_task_email
+):
     """
-    Тестирует обработку уведомлений по email.
+    Тестирует, что при ошибке ни уведомления, ни сдвиг напоминания не фиксируются.
     """
-    send_task_email_notification(mock_task_email)
+    mock_claim_tasks.return_value = [mock_task_email]
 
-    # Проверяем вызов функции send_email с правильными аргументами
-    mock_send_email.assert_called_once_with(
-        "test@example.com",
-        "Напоминание о задаче: Test Task Email",
-        "Здравствуйте! Напоминаем вам о задаче:\n\n"
-        "Название: Test Task Email\n"
-        "Описание: Test Description\n\n"
-        "Задача ещё не выполнена. Пожалуйста, завершите её!\n",
-    )
+    result = send_task_reminder()
 
+    mock_session.return_value.commit.assert_not_called()
+    mock_session.return_value.rollback.assert_called_once()
+    mock_chord.assert_not_called()
+    assert result == {"status": "error", "error": "DB down"}
 
-@patch("app.core.config.Bot.send_message", new_callable=AsyncMock)
-@pytest.mark.asyncio
-async def test_process_telegram_notification(mock_send_message):
+
+@patch("app.tasks.notifications.REMINDER_DELIVERY_MODE", "digest")
+@patch("app.tasks.notifications.SessionLocal")
+@patch("app.tasks.notifications.chord")
+@patch("app.tasks.notifications.get_outbox_depth", return_value=4)
+@patch("app.tasks.notifications.advance_task_reminders")
+@patch("app.tasks.notifications.enqueue_notifications", side_effect=lambda db, rows: len(rows))
+@patch("app.tasks.notifications.claim_due_user_tasks")
+def test_send_task_reminder_digest_mode(
+    mock_claim_tasks, mock_enqueue, mock_advance, mock_depth, mock_chord, mock_session
+):
     """
-    Тестирует обработку уведомлений через Telegram.
+    Тестирует подготовку одной сводки на пользователя и канал.
     """
-    user = User(id=1, telegram_chat_id="1234567890")
-    task = Task(
-        id=1,
-        title="Test Task Telegram",
-        description="Test Description",
-        user=user,
-    )
+    alice = User(id="alice", email="alice@example.com", telegram_chat_id="111", phone_number="+79000000001")
+    bob = User(id="bob", email="bob@example.com")
+    alice_tasks = [
+        Task(id=i, title=f"Alice {i}", user_id="alice", user=alice,
+             email_notification=True, telegram_notification=True, sms_notification=(i == 1))
+        for i in range(1, 4)
+    ]
+    bob_task = Task(id=4, title="Bob 4", user_id="bob", user=bob, email_notification=True)
+    mock_claim_tasks.side_effect = [alice_tasks + [bob_task], []]
+
+    result = send_task_reminder()
+
+    rows = mock_enqueue.call_args.args[1]
+    assert [(row["channel"], row["recipient"]) for row in rows] == [
+        ("email", "alice@example.com"),
+        ("telegram", "111"),
+        ("sms", "+79000000001"),
+        ("email", "bob@example.com"),
+    ]
+    assert all(row["task_id"] is None for row in rows)
+    assert "Alice 3" in rows[0]["body"]
+    assert rows[0]["subject"] == "Напоминание о невыполненных задачах: 3"
+    assert rows[2]["body"] == render_digest_reminder(alice_tasks[:1], 335)
+    assert mock_advance.call_args.args[1] == [1, 2, 3, 4]
+    assert result["enqueued_count"] == 4
 
-    await send_task_telegram_notification(task)
-
-    # Проверяем, что Telegram уведомление отправлено
-    mock_send_message.assert_called_once_with(
-        chat_id="1234567890",
-        text=(
-            "Здравствуйте! Напоминаем вам о задаче:\n\n"
-            "Название: Test Task Telegram\n"
-            "Описание: Test Description\n\n"
-            "Задача ещё не выполнена. Пожалуйста, завершите её!\n"
-        ),
+
+def make_outbox(notification_id, channel, recipient, attempts=0):
+    return NotificationOutbox(
+        id=notification_id, channel=channel, recipient=recipient, subject="Тема", body="Текст",
+        user_id="user", attempts=attempts, status="pending",
     )
 
 
-@patch("app.core.config.Bot.send_message", new_callable=AsyncMock)
+@patch("app.tasks.notifications.SessionLocal")
+@patch("app.tasks.notifications.mark_notification_results")
+@patch("app.tasks.notifications.send_sms_notifications", return_value=["Недостаточно средств"])
+@patch("app.tasks.notifications.send_telegram_messages", new_callable=AsyncMock, return_value=[None, None])
+@patch("app.tasks.notifications.deliver_email")
+@patch("app.tasks.notifications.claim_pending_notifications")
+def test_deliver_outbox_batch(
+    mock_claim, mock_deliver_email, mock_send_telegram, mock_send_sms, mock_mark, mock_session
+):
+    """
+    Тестирует доставку порции outbox с группировкой по каналам и отметкой результатов.
+    """
+    email = make_outbox(1, "email", "test@example.com")
+    telegram = [make_outbox(2, "telegram", "111"), make_outbox(3, "telegram", "222")]
+    sms = make_outbox(4, "sms", "+79000000001")
+    mock_claim.side_effect = [[email, *telegram, sms], []]
+
+    result = deliver_outbox_batch()
+
+    mock_deliver_email.assert_called_once_with("test@example.com", "Тема", "Текст")
+    mock_send_telegram.assert_awaited_once_with([("111", "Текст"), ("222", "Текст")])
+    mock_send_sms.assert_called_once_with([("+79000000001", "Текст")])
+    assert mock_mark.call_args.args[1] == [
+        (email, None), (telegram[0], None), (telegram[1], None), (sms, "Недостаточно средств"),
+    ]
+    # Следующая порция захватывается после последнего обработанного уведомления
+    assert mock_claim.call_args_list[1].args[2] == 4
+    mock_session.return_value.commit.assert_called_once()
+    mock_session.return_value.close.assert_called_once()
+
+    assert result == {"status": "success", "failed_count": 1, "email_count": 1, "telegram_count": 2, "sms_count": 0}
+
+
+@patch("app.tasks.notifications.SessionLocal")
+@patch("app.tasks.notifications.mark_notification_results")
+@patch("app.tasks.notifications.deliver_email", side_effect=RuntimeError("SMTP down"))
+@patch("app.tasks.notifications.claim_pending_notifications")
+def test_deliver_outbox_batch_email_error(mock_claim, mock_deliver_email, mock_mark, mock_session):
+    """
+    Тестирует, что ошибка отправки записывается в outbox, а не прерывает порцию.
+    """
+    notifications = [make_outbox(1, "email", "a@example.com"), make_outbox(2, "email", "b@example.com")]
+    mock_claim.side_effect = [notifications, []]
+
+    result = deliver_outbox_batch()
+
+    assert mock_deliver_email.call_count == 2
+    assert mock_mark.call_args.args[1] == [(notifications[0], "SMTP down"), (notifications[1], "SMTP down")]
+    mock_session.return_value.commit.assert_called_once()
+    assert result["failed_count"] == 2
+    assert result["email_count"] == 0
+
+
+def test_render_digest_reminder_truncates():
+    """
+    Тестирует усечение сводки до ограничения длины канала.
+    """
+    tasks = [Task(id=i, title=f"Задача номер {i}") for i in range(1, 101)]
+
+    message = render_digest_reminder(tasks, 300)
+
+    assert len(message) <= 300
+    assert message.startswith("Здравствуйте! Напоминаем вам о невыполненных задачах (100):")
+    assert "1. Задача номер 1\n" in message
+    assert "...и ещё" in message
+    assert message.endswith("Пожалуйста, завершите их!\n")
+
+    short_message = render_digest_reminder(tasks[:2], 300)
+    assert "2. Задача номер 2\n" in short_message
+    assert "...и ещё" not in short_message
+
+
+def test_aggregate_reminder_results():
+    """
+    Тестирует суммирование результатов пакетов в callback chord.
+    """
+    result = aggregate_reminder_results([
+        {"status": "success", "failed_count": 1, "email_count": 2, "telegram_count": 1, "sms_count": 0},
+        {"status": "success", "failed_count": 0, "email_count": 1, "telegram_count": 0, "sms_count": 3},
+        {"status": "error", "error": "boom"},
+    ])
+
+    assert result == {
+        "status": "error",
+        "sent_count": 7,
+        "failed_count": 1,
+        "failed_batches": 1,
+        "email_count": 3,
+        "telegram_count": 1,
+        "sms_count": 3,
+    }
+
+
+@patch("app.tasks.notifications.REMINDER_CHUNK_SIZE", 2)
+@patch("app.tasks.notifications.SessionLocal")
+@patch("app.tasks.notifications.purge_sent_notifications", side_effect=[2, 2, 1])
+def test_purge_notification_outbox(mock_purge, mock_session):
+    """
+    Тестирует удаление отправленных уведомлений порциями до первой неполной порции.
+    """
+    result = purge_notification_outbox()
+
+    assert result == {"status": "success", "deleted_count": 5}
+    assert mock_purge.call_count == 3
+    assert mock_session.return_value.commit.call_count == 3
+    mock_session.return_value.close.assert_called_once()
+
+
+@pytest.fixture
+def mock_bot_lifecycle():
+    """Отключает инициализацию бота (get_me) при пакетной отправке."""
+    with patch("app.core.config.Bot.initialize", new_callable=AsyncMock), \
+            patch("app.core.config.Bot.shutdown", new_callable=AsyncMock):
+        yield
+
+
 @pytest.mark.asyncio
-async def test_process_telegram_notification_missing_chat_id(mock_send_message):
+async def test_send_telegram_notifications_bounded_concurrency(mock_bot_lifecycle):
     """
-    Тестирует обработку Telegram уведомлений без chat_id.
+    Тестирует параллельную отправку пакета с ограничением одновременных запросов.
     """
-    user = User(id=1)  # Пользователь без chat_id
-    task = Task(
-        id=1,
-        title="Test Task Telegram",
-        description="Test Description",
-        user=user,
-    )
+    in_flight = 0
+    max_in_flight = 0
+
+    async def fake_send_message(self, chat_id, text):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
 
-    await send_task_telegram_notification(task)
+    with patch("app.core.config.Bot.send_message", new=fake_send_message):
+        errors = await send_telegram_messages([(chat_id, "Reminder") for chat_id in "12345"], concurrency=2)
 
-    # Проверяем, что Telegram сообщение НЕ отправлено
-    mock_send_message.assert_not_called()
+    assert errors == [None] * 5
+    assert max_in_flight == 2
 
 
-@patch("app.tasks.notifications.send_task_email_notification")
-def test_process_email_notification_missing_email(mock_send_email, mock_task_email):
+@patch("app.utils.telegram.asyncio.sleep", new_callable=AsyncMock)
+@patch("app.core.config.Bot.send_message", new_callable=AsyncMock)
+@pytest.mark.asyncio
+async def test_send_telegram_notifications_retry_after(mock_send_message, mock_sleep, mock_bot_lifecycle):
     """
-    Тестирует обработку email уведомлений без email у пользователя.
+    Тестирует повтор отправки после RetryAfter только для затронутого чата.
     """
-    mock_task_email.user.email = None  # Удаляем email пользователя
-    send_task_email_notification(mock_task_email)
+    async def fake_send_message(chat_id, text):
+        if chat_id == "flooded" and mock_send_message.call_count == 1:
+            raise RetryAfter(3)
+
+    mock_send_message.side_effect = fake_send_message
+    errors = await send_telegram_messages([("flooded", "Reminder"), ("other", "Reminder")])
 
-    # Проверяем, что email уведомление НЕ отправлено
-    mock_send_email.assert_not_called()
+    assert errors == [None, None]
+    mock_sleep.assert_awaited_once_with(3)
+    sent_to = [call.kwargs["chat_id"] for call in mock_send_message.call_args_list]
+    assert sent_to.count("flooded") == 2
+    assert sent_to.count("other") == 1
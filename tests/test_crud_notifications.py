@@ -0,0 +1,143 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.config import OUTBOX_MAX_ATTEMPTS
+from app.core.db import Base
+from app.models.notification import NotificationOutbox
+from app.services.notifications import (
+    enqueue_notifications,
+    claim_pending_notifications,
+    mark_notification_results,
+    get_outbox_depth,
+    purge_sent_notifications,
+)
+
+DATABASE_URL = "sqlite:///:memory:"  # SQLite в памяти
+
+
+@pytest.fixture(scope="module")
+def test_engine():
+    """Создаёт тестовый движок базы данных."""
+    engine = create_engine(DATABASE_URL)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def test_db(test_engine):
+    """Создаёт тестовую сессию базы данных с очищенной очередью."""
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+    db = TestingSessionLocal()
+    db.query(NotificationOutbox).delete()
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.rollback()
+        db.close()
+
+
+def make_rows(count, channel="email"):
+    return [
+        {
+            "channel": channel,
+            "recipient": f"user{i}@example.com",
+            "subject": f"Тема {i}",
+            "body": f"Текст {i}",
+            "user_id": f"user{i}",
+            "task_id": i,
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+# --------------------- Тесты ---------------------
+
+def test_enqueue_notifications(test_db):
+    """Тест добавления уведомлений в outbox одним INSERT."""
+    assert enqueue_notifications(test_db, make_rows(3)) == 3
+    assert enqueue_notifications(test_db, []) == 0
+    test_db.commit()
+
+    notifications = test_db.query(NotificationOutbox).order_by(NotificationOutbox.id).all()
+    assert [n.recipient for n in notifications] == ["user1@example.com", "user2@example.com", "user3@example.com"]
+    assert all(n.status == "pending" and n.attempts == 0 and n.created_at for n in notifications)
+    assert get_outbox_depth(test_db) == 3
+    assert get_outbox_depth(test_db, limit=2) == 2
+
+
+def test_claim_pending_notifications(test_db):
+    """Тест захвата ожидающих уведомлений порциями."""
+    enqueue_notifications(test_db, make_rows(5))
+    test_db.commit()
+
+    first = claim_pending_notifications(test_db, limit=2)
+    assert [n.task_id for n in first] == [1, 2]
+
+    rest = claim_pending_notifications(test_db, limit=10, after_id=first[-1].id)
+    assert [n.task_id for n in rest] == [3, 4, 5]
+
+
+def test_mark_notification_results(test_db):
+    """Тест отметки отправленных и неудачных уведомлений."""
+    enqueue_notifications(test_db, make_rows(2))
+    test_db.commit()
+    sent, failed = claim_pending_notifications(test_db)
+
+    mark_notification_results(test_db, [(sent, None), (failed, "SMTP down")])
+    test_db.commit()
+    test_db.expire_all()
+
+    assert sent.status == "sent"
+    assert sent.sent_at is not None
+    assert failed.status == "pending"
+    assert failed.attempts == 1
+    assert failed.last_error == "SMTP down"
+    assert get_outbox_depth(test_db) == 1
+
+
+def test_mark_notification_results_exhausts_attempts(test_db):
+    """Тест перевода уведомления в failed после исчерпания попыток."""
+    enqueue_notifications(test_db, make_rows(1))
+    test_db.commit()
+
+    for _ in range(OUTBOX_MAX_ATTEMPTS):
+        notifications = claim_pending_notifications(test_db)
+        assert len(notifications) == 1
+        mark_notification_results(test_db, [(notifications[0], "timeout")])
+        test_db.commit()
+        test_db.expire_all()
+
+    notification = test_db.query(NotificationOutbox).one()
+    assert notification.status == "failed"
+    assert notification.attempts == OUTBOX_MAX_ATTEMPTS
+    assert claim_pending_notifications(test_db) == []
+    assert get_outbox_depth(test_db) == 0
+
+
+def test_purge_sent_notifications(test_db):
+    """Тест: удаляются только отправленные уведомления старше указанного времени, порциями."""
+    now = datetime.utcnow()
+    enqueue_notifications(test_db, make_rows(5))
+    test_db.commit()
+    old_sent, old_sent_2, recent_sent, pending, failed = test_db.query(NotificationOutbox).order_by(
+        NotificationOutbox.id).all()
+    for notification, status, sent_at in [
+        (old_sent, "sent", now - timedelta(days=10)),
+        (old_sent_2, "sent", now - timedelta(days=9)),
+        (recent_sent, "sent", now - timedelta(hours=1)),
+        (failed, "failed", None),
+    ]:
+        notification.status = status
+        notification.sent_at = sent_at
+    test_db.commit()
+
+    assert purge_sent_notifications(test_db, now - timedelta(days=7), limit=1) == 1
+    assert purge_sent_notifications(test_db, now - timedelta(days=7)) == 1
+    assert purge_sent_notifications(test_db, now - timedelta(days=7)) == 0
+    test_db.commit()
+
+    remaining = [n.id for n in test_db.query(NotificationOutbox).order_by(NotificationOutbox.id)]
+    assert remaining == [recent_sent.id, pending.id, failed.id]
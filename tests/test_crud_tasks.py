@@ -1,18 +1,27 @@
 import pytest
+from datetime import datetime, timedelta
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from unittest.mock import MagicMock, patch
+from sqlalchemy.dialects import postgresql
+from app.core.config import REMINDER_INTERVAL_MINUTES, TASKS_BULK_MAX_ITEMS
 from app.core.db import Base
 from app.core.logger import logger
 from app.models.task import Task
-from app.schemas.tasks import TaskCreate, TaskUpdate
+from app.models.user import User
+from app.schemas.tasks import TaskBulkUpdateItem, TaskCreate, TaskUpdate
 from app.services.tasks import (
     get_tasks_by_user_id,
     create_task_for_user,
     get_task_by_id_and_user,
     update_task_by_id,
-    delete_task_by_id, get_tasks_with_email_notifications, get_tasks_with_telegram_notifications,
-    get_tasks_with_sms_notifications,
+    delete_task_by_id,
+    claim_due_tasks,
+    claim_due_user_tasks,
+    advance_task_reminders,
+    bulk_update_tasks,
 )
+from app.services.task_queries import MAX_QUERY_PARAMS, bulk_update_stmts
 
 DATABASE_URL = "sqlite:///:memory:"  # SQLite в памяти
 
@@ -182,57 +191,6 @@ def test_delete_task_not_found(test_db, test_user):
     assert success is False
 
 
-def test_get_tasks_with_email_notifications(test_db, test_user):
-    """Тест: получение задач с email-уведомлениями."""
-    task_with_email = Task(
-        title="Email Task", user_id=test_user["id"], email_notification=True, completed=False
-    )
-    task_completed = Task(
-        title="Completed Task", user_id=test_user["id"], email_notification=True, completed=True
-    )
-    test_db.add(task_with_email)
-    test_db.add(task_completed)
-    test_db.commit()
-
-    tasks = get_tasks_with_email_notifications(test_db)
-    assert len(tasks) == 1
-    assert tasks[0].title == "Email Task"
-
-
-def test_get_tasks_with_telegram_notifications(test_db, test_user):
-    """Тест: получение задач с Telegram-уведомлениями."""
-    task_with_telegram = Task(
-        title="Telegram Task", user_id=test_user["id"], telegram_notification=True, completed=False
-    )
-    task_without_telegram = Task(
-        title="No Telegram Task", user_id=test_user["id"], telegram_notification=False, completed=False
-    )
-    test_db.add(task_with_telegram)
-    test_db.add(task_without_telegram)
-    test_db.commit()
-
-    tasks = get_tasks_with_telegram_notifications(test_db)
-    assert len(tasks) == 1
-    assert tasks[0].title == "Telegram Task"
-
-
-def test_get_tasks_with_sms_notifications(test_db, test_user):
-    """Тест: получение задач с SMS-уведомлениями."""
-    task_with_sms = Task(
-        title="SMS Task", user_id=test_user["id"], sms_notification=True, completed=False
-    )
-    task_completed = Task(
-        title="Completed SMS Task", user_id=test_user["id"], sms_notification=True, completed=True
-    )
-    test_db.add(task_with_sms)
-    test_db.add(task_completed)
-    test_db.commit()
-
-    tasks = get_tasks_with_sms_notifications(test_db)
-    assert len(tasks) == 1
-    assert tasks[0].title == "SMS Task"
-
-
 def test_create_task_for_user_with_long_title(test_db, test_user):
     """Тест: создание задачи с очень длинным названием."""
     long_title = "A" * 256  # Заголовок длиной 256 символов
@@ -254,3 +212,168 @@ def test_delete_task_by_another_user(test_db, test_user):
 
     db_task = test_db.query(Task).filter(Task.id == task.id).first()
     assert db_task is not None
+
+
+
+def test_create_task_schedules_reminder(test_db, test_user):
+    """Тест: задаче с уведомлениями назначается следующее напоминание."""
+    before = datetime.utcnow()
+    task = create_task_for_user(test_db, TaskCreate(title="Reminder", email_notification=True), test_user["id"])
+    silent_task = create_task_for_user(test_db, TaskCreate(title="Silent"), test_user["id"])
+
+    assert task.next_reminder_at >= before + timedelta(minutes=REMINDER_INTERVAL_MINUTES)
+    assert silent_task.next_reminder_at is None
+
+
+def test_update_task_reschedules_reminder(test_db, test_user):
+    """Тест: выполненная задача или задача без уведомлений не напоминается."""
+    task = create_task_for_user(test_db, TaskCreate(title="Reminder", sms_notification=True), test_user["id"])
+    scheduled_at = task.next_reminder_at
+
+    update_task_by_id(test_db, task.id, TaskUpdate(title="Renamed"), test_user["id"])
+    assert task.next_reminder_at == scheduled_at
+
+    update_task_by_id(test_db, task.id, TaskUpdate(completed=True), test_user["id"])
+    assert task.next_reminder_at is None
+
+    update_task_by_id(test_db, task.id, TaskUpdate(completed=False), test_user["id"])
+    assert task.next_reminder_at is not None
+
+
+def test_claim_and_advance_due_tasks(test_db, test_user):
+    """Тест: захватываются только наступившие напоминания, после сдвига задача больше не наступившая."""
+    now = datetime.utcnow()
+    due = [
+        Task(title=f"Due {i}", user_id=test_user["id"], email_notification=True,
+             next_reminder_at=now - timedelta(minutes=i))
+        for i in range(3)
+    ]
+    later = Task(title="Later", user_id=test_user["id"], email_notification=True,
+                 next_reminder_at=now + timedelta(minutes=5))
+    completed = Task(title="Completed", user_id=test_user["id"], email_notification=True, completed=True,
+                     next_reminder_at=now - timedelta(minutes=5))
+    test_db.add_all([*due, later, completed])
+    test_db.commit()
+
+    claimed = claim_due_tasks(test_db, now, limit=2)
+    assert [task.id for task in claimed] == [due[0].id, due[1].id]
+
+    advance_task_reminders(test_db, [task.id for task in claimed], now)
+    test_db.commit()
+
+    assert [task.id for task in claim_due_tasks(test_db, now)] == [due[2].id]
+
+
+def test_claim_due_user_tasks(test_db):
+    """Тест: в режиме сводок захватываются все наступившие задачи группы пользователей."""
+    now = datetime.utcnow()
+    test_db.add_all(User(id=user_id, email=f"{user_id}@example.com", hashed_password="x")
+                    for user_id in ["user-a", "user-b", "user-c"])
+    for user_id in ["user-b", "user-a", "user-c", "user-a", "user-b"]:
+        test_db.add(Task(title=f"Task {user_id}", user_id=user_id, telegram_notification=True,
+                         next_reminder_at=now - timedelta(minutes=1)))
+    test_db.commit()
+
+    tasks = claim_due_user_tasks(test_db, now, user_limit=2)
+
+    keys = [(task.user_id, task.id) for task in tasks]
+    assert keys == sorted(keys)
+    assert [user_id for user_id, _ in keys] == ["user-a", "user-a", "user-b", "user-b"]
+
+
+def test_digest_claims_all_user_reminders_and_aligns_them(test_db):
+    """Тест: в режиме сводок захватываются все задачи пользователя с напоминаниями и получают общее время."""
+    now = datetime.utcnow()
+    test_db.add_all(User(id=user_id, email=f"{user_id}@example.com", hashed_password="x")
+                    for user_id in ["user-a", "user-b"])
+    due = Task(title="Due", user_id="user-a", email_notification=True, next_reminder_at=now - timedelta(minutes=1))
+    later = Task(title="Later", user_id="user-a", email_notification=True,
+                 next_reminder_at=now + timedelta(minutes=17))
+    silent = Task(title="Silent", user_id="user-a")
+    other = Task(title="Other", user_id="user-b", email_notification=True,
+                 next_reminder_at=now + timedelta(minutes=5))
+    test_db.add_all([due, later, silent, other])
+    test_db.commit()
+
+    tasks = claim_due_user_tasks(test_db, now)
+    assert [task.id for task in tasks] == [due.id, later.id]
+
+    advance_task_reminders(test_db, [task.id for task in tasks], now)
+    test_db.commit()
+    test_db.expire_all()
+    assert due.next_reminder_at == later.next_reminder_at == now + timedelta(minutes=REMINDER_INTERVAL_MINUTES)
+    assert [task.id for task in claim_due_user_tasks(test_db, now + timedelta(minutes=30))] == [other.id]
+
+
+def test_digest_claim_locks_user_rows():
+    """Тест: пользователи захватываются с SKIP LOCKED, а их задачи блокируются без пропусков."""
+    db = MagicMock()
+    user_query = db.query.return_value.filter.return_value.order_by.return_value.limit.return_value
+    user_query.with_for_update.return_value.all.return_value = [MagicMock(id="user-a")]
+
+    claim_due_user_tasks(db, datetime.utcnow())
+
+    user_query.with_for_update.assert_called_once_with(skip_locked=True)
+    task_query = db.query.return_value.options.return_value.filter.return_value.order_by.return_value
+    task_query.with_for_update.assert_called_once_with(of=Task)
+
+
+def test_update_task_by_id_commits(test_db, test_user):
+    """Тест: обновление фиксируется, не дожидаясь закрытия сессии."""
+    task = Task(title="Old Task", user_id=test_user["id"])
+    test_db.add(task)
+    test_db.commit()
+
+    update_task_by_id(test_db, task.id, TaskUpdate(title="Committed"), test_user["id"])
+
+    assert not test_db.in_transaction()
+    test_db.rollback()
+    assert task.title == "Committed"
+
+
+def test_update_task_by_another_user(test_db, test_user):
+    """Тест: чужую задачу нельзя обновить."""
+    task = Task(title="Task", user_id=test_user["id"])
+    test_db.add(task)
+    test_db.commit()
+
+    assert update_task_by_id(test_db, task.id, TaskUpdate(title="Hijacked"), "another_user_id") is None
+    test_db.expire_all()
+    assert task.title == "Task"
+
+
+def test_bulk_update_stays_within_parameter_limit():
+    """Тест: массовое обновление максимального размера не превышает лимит параметров PostgreSQL."""
+    items = [
+        TaskBulkUpdateItem(id=i, title=f"Task {i}", description="text", completed=True, email_notification=True,
+                           telegram_notification=False, sms_notification=True)
+        for i in range(1, TASKS_BULK_MAX_ITEMS + 1)
+    ]
+    stmts = bulk_update_stmts(items, "test_user_id")
+
+    assert len(stmts) > 1
+    for stmt in stmts:
+        assert len(stmt.compile(dialect=postgresql.dialect()).params) <= MAX_QUERY_PARAMS
+
+
+def test_bulk_update_casts_values_for_postgresql():
+    """Тест: колонки VALUES приводятся к типам полей, иначе незаданные поля PostgreSQL считает text."""
+    stmt = bulk_update_stmts([TaskBulkUpdateItem(id=1, title="Renamed")], "test_user_id")[0]
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    for field in ("completed", "email_notification", "telegram_notification", "sms_notification"):
+        assert f"CAST(changes.{field} AS BOOLEAN)" in sql
+    assert "CAST(changes.title AS VARCHAR)" in sql
+
+
+def test_bulk_update_in_chunks(test_db, test_user):
+    """Тест: массовое обновление частями обновляет все задачи и возвращает их в порядке запроса."""
+    tasks = [Task(title=f"Task {i}", user_id=test_user["id"]) for i in range(5)]
+    test_db.add_all(tasks)
+    test_db.commit()
+
+    items = [TaskBulkUpdateItem(id=task.id, title=f"Renamed {task.id}") for task in reversed(tasks)]
+    with patch("app.services.task_queries.BULK_UPDATE_CHUNK_SIZE", 2):
+        updated = bulk_update_tasks(test_db, items, test_user["id"])
+
+    assert [row.title for row in updated] == [f"Renamed {task.id}" for task in reversed(tasks)]
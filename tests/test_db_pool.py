@@ -0,0 +1,83 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc, text
+from unittest.mock import patch
+
+from app.core.db_pool import InstrumentedQueuePool, PoolMetrics, pool_stats
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Движок SQLite с маленьким инструментированным пулом."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.05,
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_pool_metrics_histogram_is_cumulative():
+    """Тест накопительных корзин гистограммы и суммарного ожидания."""
+    metrics = PoolMetrics(buckets_ms=(1, 10))
+    metrics.record(0.0005)
+    metrics.record(0.005)
+    metrics.record(0.5)
+    metrics.record(0.05, timed_out=True)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["checkout_latency_ms"] == {"1": 1, "10": 2, "+Inf": 4}
+    assert snapshot["checkouts"] == 3
+    assert snapshot["timeouts"] == 1
+    assert snapshot["wait_seconds_max"] == 0.5
+
+
+def test_pool_stats_tracks_checkouts_overflow_and_timeouts(engine):
+    """Тест статистики пула: выданные соединения, overflow и таймаут ожидания."""
+    first = engine.connect()
+    second = engine.connect()
+    first.execute(text("SELECT 1"))
+
+    stats = pool_stats(engine.pool)
+    assert stats["size"] == 1
+    assert stats["checked_out"] == 2
+    assert stats["overflow"] == 1
+    assert stats["checkouts"] == 2
+
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    assert pool_stats(engine.pool)["timeouts"] == 1
+    assert pool_stats(engine.pool)["wait_seconds_total"] >= 0.05
+
+    first.close()
+    second.close()
+    assert pool_stats(engine.pool)["checked_out"] == 0
+
+
+def test_pool_metrics_survive_dispose(engine):
+    """Тест: пересоздание пула при dispose сохраняет счётчики процесса."""
+    engine.connect().close()
+    engine.dispose()
+
+    assert pool_stats(engine.pool)["checkouts"] == 1
+
+
+def test_internal_pool_endpoint_requires_token():
+    """Тест доступа к статистике пула: отключён без токена, 403 с неверным токеном."""
+    assert client.get("/internal/db/pool").status_code == 404
+
+    with patch("app.routers.internal.INTERNAL_API_TOKEN", "secret"):
+        assert client.get("/internal/db/pool", headers={"X-Internal-Token": "wrong"}).status_code == 403
+        response = client.get("/internal/db/pool", headers={"X-Internal-Token": "secret"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["role"] == "api"
+    assert body["sync"]["size"] == 10
+    assert "checkout_latency_ms" in body["async"]
@@ -0,0 +1,146 @@
+import threading
+
+import fakeredis
+import pytest
+from sqlalchemy import create_engine, exc, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from unittest.mock import patch
+
+from app.core.db import Base
+from app.core.db_routing import PrimaryPins, ReplicaSet, RoutingSession, replica_reads
+from app.models.task import Task
+from app.models.user import User
+from app.schemas.tasks import TaskUpdate
+from app.services import tasks_async
+from app.services.auth import get_user_principal
+from app.services.tasks import get_task_by_id_and_user, get_tasks_by_user_id, update_task_by_id
+
+
+def make_database(path, title):
+    """База SQLite с пользователем и задачей; название задачи показывает, откуда прочитаны данные."""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(id="user-1", email="user@example.com", hashed_password="x", is_active=True))
+    session.add(Task(id=1, title=title, user_id="user-1", email_notification=True))
+    session.commit()
+    session.close()
+    return engine
+
+
+@pytest.fixture
+def pins():
+    pins = PrimaryPins(fakeredis.FakeRedis(), ttl=5)
+    with patch("app.core.db_routing._primary_pins", pins):
+        yield pins
+
+
+@pytest.fixture
+def engines(tmp_path):
+    engines = {name: make_database(tmp_path / f"{name}.db", name) for name in ("primary", "replica-1", "replica-2")}
+    yield engines
+    for engine in engines.values():
+        engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engines, pins):
+    replicas = ReplicaSet([engines["replica-1"], engines["replica-2"]], eject_seconds=30)
+    return sessionmaker(class_=RoutingSession, replicas=replicas, bind=engines["primary"])
+
+
+def test_reads_go_to_replicas_round_robin(session_factory):
+    """Тест: чтения сервисов идут на реплики по кругу, сессия держится одной реплики."""
+    first, second = session_factory(), session_factory()
+
+    assert get_task_by_id_and_user(first, 1, "user-1").title == "replica-1"
+    assert get_tasks_by_user_id(first, "user-1")[0].title == "replica-1"
+    assert get_task_by_id_and_user(second, 1, "user-1").title == "replica-2"
+
+
+def test_reads_outside_replica_block_use_primary(session_factory):
+    """Тест: запросы вне replica_reads и SELECT ... FOR UPDATE идут на primary."""
+    session = session_factory()
+    assert session.scalars(select(Task)).first().title == "primary"
+
+    with replica_reads(session):
+        assert session.get_bind(clause=select(Task).with_for_update()) is session.get_bind()
+
+
+def test_session_reads_own_writes_from_primary(session_factory, pins):
+    """Тест: после записи чтения сессии и пользователя идут на primary."""
+    session = session_factory()
+    update_task_by_id(session, 1, TaskUpdate(title="updated"), "user-1")
+
+    assert get_task_by_id_and_user(session, 1, "user-1").title == "updated"
+    assert pins.is_pinned("user-1")
+    assert get_task_by_id_and_user(session_factory(), 1, "user-1").title == "updated"
+    assert get_user_principal(session_factory(), "user-1") is not None
+
+
+def test_pinned_user_reads_from_primary(session_factory, pins):
+    """Тест: в окне read-your-writes чтения пользователя не идут на реплику."""
+    pins.pin("user-1")
+
+    assert get_task_by_id_and_user(session_factory(), 1, "user-1").title == "primary"
+    session = session_factory()
+    with replica_reads(session):
+        assert session.scalars(select(Task)).first().title.startswith("replica")
+
+
+def test_rollback_does_not_pin_user(session_factory, pins):
+    """Тест: откат транзакции не закрепляет пользователя за primary."""
+    session = session_factory()
+    with patch.object(session, "commit", side_effect=session.rollback):
+        update_task_by_id(session, 1, TaskUpdate(title="updated"), "user-1")
+
+    assert not pins.is_pinned("user-1")
+
+
+def test_failed_replica_is_ejected(engines, pins, tmp_path):
+    """Тест: недоступная реплика исключается, а без доступных реплик чтения идут на primary."""
+    broken = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    replicas = ReplicaSet([broken, engines["replica-1"]], eject_seconds=30)
+    factory = sessionmaker(class_=RoutingSession, replicas=replicas, bind=engines["primary"])
+
+    with pytest.raises(exc.OperationalError):
+        get_task_by_id_and_user(factory(), 1, "user-1")
+    assert not replicas.is_available(broken)
+    assert get_task_by_id_and_user(factory(), 1, "user-1").title == "replica-1"
+
+    replicas.eject(engines["replica-1"])
+    assert replicas.choose() is None
+    assert get_task_by_id_and_user(factory(), 1, "user-1").title == "primary"
+
+
+@pytest.mark.asyncio
+async def test_async_pin_checks_run_off_event_loop(tmp_path, pins):
+    """Тест: в AsyncSession окно read-your-writes проверяется и выставляется вне потока цикла событий."""
+    for name in ("primary", "replica"):
+        make_database(tmp_path / f"{name}.db", name).dispose()
+    primary = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+    replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    session_factory = async_sessionmaker(bind=primary, sync_session_class=RoutingSession, expire_on_commit=False,
+                                         replicas=ReplicaSet([replica.sync_engine], eject_seconds=30))
+    threads = []
+
+    def record(method):
+        def call(*args):
+            threads.append(threading.get_ident())
+            return method(*args)
+        return call
+
+    try:
+        with patch.object(pins, "is_pinned", record(pins.is_pinned)), patch.object(pins, "pin", record(pins.pin)):
+            async with session_factory() as session:
+                assert (await tasks_async.get_task_by_id_and_user(session, 1, "user-1")).title == "replica"
+                await tasks_async.update_task_by_id(session, 1, TaskUpdate(title="updated"), "user-1")
+            async with session_factory() as session:
+                assert (await tasks_async.get_task_by_id_and_user(session, 1, "user-1")).title == "updated"
+    finally:
+        await primary.dispose()
+        await replica.dispose()
+
+    assert len(threads) == 3
+    assert threading.get_ident() not in threads
@@ -0,0 +1,108 @@
+import smtplib
+from unittest.mock import patch
+
+import pytest
+
+from app.utils.email import SMTPConnectionPool
+
+
+class FakeSMTP:
+    """Фиктивный SMTP-сервер, запоминающий соединения и отправленные письма."""
+
+    instances = []
+
+    def __init__(self, host, port, timeout=None):
+        self.host = host
+        self.port = port
+        self.sent = []
+        self.logged_in = False
+        self.closed = False
+        self.disconnect_next = False
+        FakeSMTP.instances.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        self.logged_in = True
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        if self.disconnect_next:
+            self.disconnect_next = False
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        self.sent.append((from_addr, to_addrs, msg))
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_smtp():
+    """Подменяет smtplib.SMTP фиктивным сервером."""
+    FakeSMTP.instances = []
+    with patch("app.utils.email.smtplib.SMTP", FakeSMTP):
+        yield
+
+
+def make_pool(**kwargs):
+    return SMTPConnectionPool("smtp.test", 587, username="user", password="secret", **kwargs)
+
+
+def test_pool_reuses_connection():
+    """Тест: несколько писем отправляются через одно авторизованное соединение."""
+    pool = make_pool()
+    for i in range(3):
+        pool.sendmail("from@example.com", f"to{i}@example.com", "body")
+
+    assert len(FakeSMTP.instances) == 1
+    assert FakeSMTP.instances[0].logged_in is True
+    assert len(FakeSMTP.instances[0].sent) == 3
+
+
+def test_pool_caps_messages_per_connection():
+    """Тест: соединение закрывается после лимита писем."""
+    pool = make_pool(max_messages_per_connection=2)
+    for i in range(3):
+        pool.sendmail("from@example.com", f"to{i}@example.com", "body")
+
+    assert len(FakeSMTP.instances) == 2
+    assert FakeSMTP.instances[0].closed is True
+    assert [len(server.sent) for server in FakeSMTP.instances] == [2, 1]
+
+
+def test_pool_reconnects_after_disconnect():
+    """Тест: разорванное сервером соединение прозрачно пересоздаётся."""
+    pool = make_pool()
+    pool.sendmail("from@example.com", "to@example.com", "first")
+    FakeSMTP.instances[0].disconnect_next = True
+
+    pool.sendmail("from@example.com", "to@example.com", "second")
+
+    assert len(FakeSMTP.instances) == 2
+    assert FakeSMTP.instances[0].closed is True
+    assert FakeSMTP.instances[1].sent == [("from@example.com", "to@example.com", "second")]
+
+
+def test_pool_retries_on_fresh_connection():
+    """Тест: повтор после разрыва идёт через новое соединение, а не через другое простаивающее."""
+    pool = make_pool()
+    with pool.connection() as first, pool.connection() as second:
+        pass
+    first.disconnect_next = second.disconnect_next = True
+
+    pool.sendmail("from@example.com", "to@example.com", "body")
+
+    assert len(FakeSMTP.instances) == 3
+    assert FakeSMTP.instances[2].sent == [("from@example.com", "to@example.com", "body")]
+
+
+def test_pool_close():
+    """Тест: закрытие пула закрывает простаивающие соединения."""
+    pool = make_pool()
+    pool.sendmail("from@example.com", "to@example.com", "body")
+    pool.close()
+
+    assert FakeSMTP.instances[0].closed is True
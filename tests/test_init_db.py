@@ -0,0 +1,55 @@
+from sqlalchemy import create_engine, inspect, text
+
+from app.core.init_db import init_db
+
+# Схема до появления версий, напоминаний по next_reminder_at, outbox и индексов списка задач
+OLD_SCHEMA = [
+    """CREATE TABLE users (id VARCHAR PRIMARY KEY, email VARCHAR NOT NULL UNIQUE, hashed_password VARCHAR NOT NULL,
+       is_active BOOLEAN, telegram_chat_id VARCHAR, phone_number VARCHAR)""",
+    """CREATE TABLE tasks (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, description VARCHAR, completed BOOLEAN,
+       email_notification BOOLEAN, telegram_notification BOOLEAN, sms_notification BOOLEAN,
+       user_id VARCHAR NOT NULL REFERENCES users(id))""",
+    "INSERT INTO users (id, email, hashed_password) VALUES ('user-1', 'user@example.com', 'hash')",
+    """INSERT INTO tasks (id, title, completed, email_notification, telegram_notification, sms_notification, user_id)
+       VALUES (1, 'Reminder', 0, 1, 0, 0, 'user-1'), (2, 'Done', 1, 1, 0, 0, 'user-1'),
+              (3, 'Silent', 0, 0, 0, 0, 'user-1')""",
+]
+
+
+def test_init_db_upgrades_existing_schema(tmp_path):
+    """Тест: init_db добавляет новые колонки, индексы и таблицы в существующую базу."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.execute(text(statement))
+
+    init_db(engine)
+    init_db(engine)  # повторный запуск ничего не меняет
+
+    inspector = inspect(engine)
+    assert {"version", "next_reminder_at"} <= {column["name"] for column in inspector.get_columns("tasks")}
+    assert "tasks_version" in {column["name"] for column in inspector.get_columns("users")}
+    assert inspector.has_table("notification_outbox")
+    assert {"ix_tasks_due_reminders", "ix_tasks_user_id_title_id"} <= {
+        index["name"] for index in inspector.get_indexes("tasks")}
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT name FROM sqlite_master WHERE name = 'ux_users_email_lower'")).scalar()
+        assert conn.execute(text("SELECT version FROM tasks")).scalars().all() == [1, 1, 1]
+        assert conn.execute(text("SELECT tasks_version FROM users")).scalar() == 0
+    engine.dispose()
+
+
+def test_init_db_backfills_reminders(tmp_path):
+    """Тест: при добавлении next_reminder_at напоминание получают только невыполненные задачи с уведомлениями."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.execute(text(statement))
+
+    init_db(engine)
+
+    with engine.connect() as conn:
+        tasks = conn.execute(text("SELECT id, next_reminder_at FROM tasks ORDER BY id")).all()
+    assert [task.next_reminder_at is not None for task in tasks] == [True, False, False]
+    engine.dispose()
@@ -0,0 +1,91 @@
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from unittest.mock import patch
+
+from app.core.db import Base, get_db
+from app.core.passwords import PasswordHasher, PasswordHasherBusyError
+from app.main import app
+from app.models.user import User
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def hasher():
+    """Пул из одного потока, принимающий не больше одного вызова."""
+    executor = ThreadPoolExecutor(max_workers=1)
+    yield PasswordHasher(executor, max_pending=1)
+    executor.shutdown(wait=True)
+
+
+def test_hash_and_verify_in_process_pool():
+    """Тест хэширования и проверки пароля в дочернем процессе."""
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        hasher = PasswordHasher(executor, max_pending=2)
+        hashed = hasher.hash("secret")
+
+        assert hasher.verify("secret", hashed) is True
+        assert hasher.verify("wrong", hashed) is False
+
+    stats = hasher.stats()
+    assert stats["hash"]["count"] == 1
+    assert stats["verify"]["count"] == 2
+    assert stats["pending"] == 0
+
+
+def test_full_queue_rejects_immediately(hasher):
+    """Тест: при заполненной очереди вызов сразу отклоняется, а не ждёт."""
+    release = threading.Event()
+    with patch("app.core.passwords._hash", side_effect=lambda password: release.wait(5) and "hashed"):
+        worker = threading.Thread(target=hasher.hash, args=("secret",))
+        worker.start()
+        while hasher.pending == 0:
+            time.sleep(0.001)
+
+        started = time.perf_counter()
+        with pytest.raises(PasswordHasherBusyError):
+            hasher.hash("other")
+        assert time.perf_counter() - started < 0.1
+
+        release.set()
+        worker.join()
+
+    assert hasher.stats()["rejected"] == 1
+    assert hasher.stats()["pending"] == 0
+    assert hasher.stats()["hash"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_verify(hasher):
+    """Тест асинхронной проверки пароля без занятия пула потоков AnyIO."""
+    hashed = await hasher.hash_async("secret")
+
+    assert await hasher.verify_async("secret", hashed) is True
+
+
+def test_login_returns_503_when_hasher_is_busy():
+    """Тест: вход при перегруженном пуле хэширования получает 503 с Retry-After."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(id="user-1", email="user@example.com", hashed_password="x", is_active=True))
+    session.commit()
+    app.dependency_overrides[get_db] = lambda: session
+
+    busy = PasswordHasher(ThreadPoolExecutor(max_workers=1), max_pending=0)
+    try:
+        with patch("app.services.auth.get_password_hasher", return_value=busy):
+            response = client.post("/auth/login", json={"email": "user@example.com", "password": "password"})
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        session.close()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
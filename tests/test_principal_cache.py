@@ -0,0 +1,118 @@
+import time
+
+import fakeredis
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from unittest.mock import patch
+
+from app.core.cache import LRUCache, PrincipalCache
+from app.core.db import Base
+from app.models.user import User
+from app.services.auth import get_user_principal, save_telegram_chat_id
+
+PRINCIPAL = {
+    "id": "user-1",
+    "email": "user@example.com",
+    "is_active": True,
+    "telegram_chat_id": None,
+    "phone_number": None,
+}
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def cache(redis_client):
+    """Кэш пользователей с уровнем Redis."""
+    return PrincipalCache(LRUCache(100), ttl=30, redis_client=redis_client, redis_ttl=300)
+
+
+@pytest.fixture
+def db():
+    """Сессия SQLite в памяти с одним пользователем; обращения к базе отслеживаются."""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(id="user-1", email="user@example.com", hashed_password="x", is_active=True))
+    session.commit()
+    with patch.object(session, "query", wraps=session.query):
+        yield session
+    session.close()
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Тест вытеснения самой давно использованной записи."""
+    lru = LRUCache(2)
+    lru.set("a", 1, 60)
+    lru.set("b", 2, 60)
+    assert lru.get("a") == 1
+    lru.set("c", 3, 60)
+
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+
+
+def test_lru_cache_expires_entries():
+    """Тест истечения записи по TTL."""
+    lru = LRUCache(10)
+    with patch("app.core.cache.time.monotonic", return_value=100.0):
+        lru.set("a", 1, 5)
+    with patch("app.core.cache.time.monotonic", return_value=104.0):
+        assert lru.get("a") == 1
+    with patch("app.core.cache.time.monotonic", return_value=105.0):
+        assert lru.get("a") is None
+    assert len(lru) == 0
+
+
+def test_principal_cache_redis_tier(cache, redis_client):
+    """Тест чтения из Redis после промаха в памяти процесса (например, в другом процессе)."""
+    cache.set("user-1", PRINCIPAL)
+    cache.clear()
+
+    assert cache.get("user-1") == PRINCIPAL
+    assert len(cache.local) == 1
+    assert 0 < redis_client.pttl("principal:user-1") <= 300_000
+
+
+def test_principal_cache_ttl_bounded_by_token_expiry(cache, redis_client):
+    """Тест ограничения срока жизни записи временем истечения токена."""
+    cache.set("user-1", PRINCIPAL, expires_at=time.time() + 10)
+    assert redis_client.pttl("principal:user-1") <= 10_000
+
+    cache.set("user-2", PRINCIPAL, expires_at=time.time() - 1)
+    assert cache.get("user-2") is None
+    assert not redis_client.exists("principal:user-2")
+
+
+def test_principal_cache_invalidate(cache, redis_client):
+    """Тест удаления записи из обоих уровней."""
+    cache.set("user-1", PRINCIPAL)
+    cache.invalidate("user-1")
+
+    assert cache.get("user-1") is None
+    assert not redis_client.exists("principal:user-1")
+
+
+def test_get_user_principal_hits_db_once(db):
+    """Тест: повторный запрос пользователя не обращается к базе."""
+    first = get_user_principal(db, "user-1")
+    second = get_user_principal(db, "user-1")
+
+    assert first == second
+    assert second.email == "user@example.com"
+    db.query.assert_called_once()
+
+
+def test_save_telegram_chat_id_invalidates_principal(db):
+    """Тест инвалидации кэша при сохранении Telegram Chat ID."""
+    assert get_user_principal(db, "user-1").telegram_chat_id is None
+
+    save_telegram_chat_id(db, "user-1", "42")
+
+    assert get_user_principal(db, "user-1").telegram_chat_id == "42"
+    assert db.query.call_count == 3
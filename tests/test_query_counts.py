@@ -0,0 +1,190 @@
+from contextlib import contextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.cache import get_principal_cache
+from app.core.db import Base, get_db
+from app.main import app
+from app.models.task import Task
+from app.models.user import User
+from app.services.auth import create_access_token, hash_password
+
+# Количество задач у тестового пользователя: число запросов не должно от него зависеть
+TASKS_PER_USER = 50
+
+engine = create_engine(
+    "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+client = TestClient(app)
+
+
+class QueryCounter:
+    """Список SQL-запросов, выполненных внутри count_queries."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __len__(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(bind=engine):
+    """
+    Подсчитать SQL-запросы, отправленные в базу внутри блока.
+    """
+    counter = QueryCounter()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    event.listen(bind, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(bind, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture
+def db():
+    """База с пользователем, у которого много задач."""
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    session.add(User(
+        id="user-1", email="user@example.com", hashed_password=hash_password("password"), is_active=True,
+    ))
+    session.add_all(
+        Task(title=f"Task {i}", user_id="user-1", email_notification=True) for i in range(TASKS_PER_USER)
+    )
+    session.commit()
+
+    app.dependency_overrides[get_db] = lambda: session
+    try:
+        yield session
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def auth_headers(db):
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'user-1'})}"}
+
+
+def request(method, url, expected_status, **kwargs):
+    # Сессия общая для запросов, поэтому сбрасываем её кэш и кэш пользователей
+    app.dependency_overrides[get_db]().expire_all()
+    get_principal_cache().clear()
+    with count_queries() as queries:
+        response = client.request(method, url, **kwargs)
+    assert response.status_code == expected_status, response.text
+    return queries
+
+
+def test_login_query_count(db):
+    """Вход: один SELECT пользователя без JOIN задач."""
+    queries = request("POST", "/auth/login", 200, json={"email": "user@example.com", "password": "password"})
+
+    assert len(queries) == 1
+    assert "JOIN" not in queries.statements[0]
+
+
+def test_get_me_query_count(db, auth_headers):
+    """Профиль: один SELECT при холодном кэше и ни одного при тёплом."""
+    token = auth_headers["Authorization"].split(" ", 1)[1]
+    queries = request("GET", "/auth/me", 200, cookies={"access_token": token})
+    assert len(queries) == 1
+    assert "JOIN" not in queries.statements[0]
+
+    with count_queries() as queries:
+        assert client.get("/auth/me", cookies={"access_token": token}).status_code == 200
+    assert len(queries) == 0
+    client.cookies.clear()
+
+
+def test_list_tasks_query_count(db, auth_headers):
+    """Список задач: пользователь, версия задач и задачи, без повторного JOIN пользователей."""
+    queries = request("GET", "/tasks", 200, headers=auth_headers)
+
+    assert len(queries) == 3
+    assert "JOIN" not in queries.statements[2]
+
+
+def test_list_tasks_not_modified_query_count(db, auth_headers):
+    """Повторный запрос списка с If-None-Match: только пользователь и версия, таблица задач не читается."""
+    etag = client.get("/tasks", headers=auth_headers).headers["ETag"]
+    queries = request("GET", "/tasks", 304, headers=dict(auth_headers, **{"If-None-Match": etag}))
+
+    assert len(queries) == 2
+    assert "FROM tasks" not in " ".join(queries.statements)
+
+
+def test_read_task_query_count(db, auth_headers):
+    """Чтение одной задачи: пользователь, версия задач и задача."""
+    assert len(request("GET", "/tasks/1", 200, headers=auth_headers)) == 3
+
+    etag = client.get("/tasks/1", headers=auth_headers).headers["ETag"]
+    queries = request("GET", "/tasks/1", 304, headers=dict(auth_headers, **{"If-None-Match": etag}))
+    assert len(queries) == 2
+    assert "FROM tasks" not in " ".join(queries.statements)
+
+
+def test_create_task_query_count(db, auth_headers):
+    """Создание задачи: пользователь, INSERT, версия задач и перечитывание строки после commit."""
+    queries = request("POST", "/tasks", 201, headers=auth_headers, json={"title": "New", "user_id": "user-1"})
+
+    assert len(queries) == 4
+
+
+def test_update_task_query_count(db, auth_headers):
+    """Обновление задачи: пользователь, один UPDATE ... RETURNING и версия задач."""
+    queries = request("PUT", "/tasks/1", 200, headers=auth_headers, json={"title": "Updated"})
+
+    assert len(queries) == 3
+    assert queries.statements[1].startswith("UPDATE tasks")
+
+
+def test_delete_task_query_count(db, auth_headers):
+    """Удаление задачи: пользователь, один DELETE ... RETURNING и версия задач."""
+    queries = request("DELETE", "/tasks/1", 204, headers=auth_headers)
+
+    assert len(queries) == 3
+    assert queries.statements[1].startswith("DELETE FROM tasks")
+
+
+def test_bulk_create_query_count(db, auth_headers):
+    """
+    Массовое создание: пользователь, INSERT ... RETURNING и версия задач.
+
+    PostgreSQL вставляет строки многострочными INSERT с сохранением порядка параметров;
+    SQLite не гарантирует порядок RETURNING, поэтому SQLAlchemy вставляет по строке.
+    """
+    payload = {"tasks": [{"title": f"Bulk {i}"} for i in range(100)]}
+    queries = request("POST", "/tasks/bulk", 201, headers=auth_headers, json=payload)
+
+    assert len(queries) == 2 + 100
+    assert all(statement.startswith("INSERT INTO tasks") for statement in queries.statements[1:-1])
+
+
+def test_bulk_update_query_count(db, auth_headers):
+    """Массовое обновление: пользователь, один UPDATE ... FROM (VALUES ...) и версия задач."""
+    payload = {"tasks": [{"id": i, "completed": True} for i in range(1, TASKS_PER_USER + 1)]}
+    queries = request("PUT", "/tasks/bulk", 200, headers=auth_headers, json=payload)
+
+    assert len(queries) == 3
+    assert queries.statements[1].startswith("UPDATE tasks")
+
+
+def test_bulk_delete_query_count(db, auth_headers):
+    """Массовое удаление: пользователь, один DELETE ... RETURNING и версия задач."""
+    payload = {"ids": list(range(1, TASKS_PER_USER + 1))}
+    queries = request("DELETE", "/tasks/bulk", 200, headers=auth_headers, json=payload)
+
+    assert len(queries) == 3
+    assert queries.statements[1].startswith("DELETE FROM tasks")
@@ -0,0 +1,101 @@
+import asyncio
+from unittest.mock import patch
+
+import fakeredis
+import pytest
+
+from app.utils.rate_limit import Bucket, ChannelLimits, TokenBucketLimiter
+
+LIMITS = {
+    "telegram": ChannelLimits(Bucket(rate=10, capacity=3), Bucket(rate=1, capacity=1)),
+}
+
+
+@pytest.fixture
+def redis_server():
+    """Общий сервер fakeredis, как один Redis для нескольких воркеров."""
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def limiter(redis_server):
+    return TokenBucketLimiter(fakeredis.FakeRedis(server=redis_server), limits=LIMITS)
+
+
+def test_global_bucket_limits_burst(limiter):
+    """Тест: глобальный бакет пропускает не больше своей ёмкости подряд."""
+    waits = [limiter.try_acquire("telegram", f"chat-{i}") for i in range(4)]
+
+    assert waits[:3] == [0, 0, 0]
+    assert 0 < waits[3] <= 0.1
+
+
+def test_recipient_bucket_limits_single_chat(limiter):
+    """Тест: бакет получателя ограничивает отправку в один чат."""
+    assert limiter.try_acquire("telegram", "chat-1") == 0
+    wait = limiter.try_acquire("telegram", "chat-1")
+
+    assert 0.8 < wait <= 1
+    assert limiter.try_acquire("telegram", "chat-2") == 0
+
+
+def test_denied_request_does_not_consume_global_tokens(limiter):
+    """Тест: отказ по бакету получателя не списывает глобальные токены."""
+    limiter.try_acquire("telegram", "chat-1")
+    for _ in range(5):
+        assert limiter.try_acquire("telegram", "chat-1") > 0
+
+    assert limiter.try_acquire("telegram", "chat-2") == 0
+    assert limiter.try_acquire("telegram", "chat-3") == 0
+
+
+def test_buckets_shared_between_workers(redis_server):
+    """Тест: бакеты общие для всех клиентов одного Redis."""
+    worker_1 = TokenBucketLimiter(fakeredis.FakeRedis(server=redis_server), limits=LIMITS)
+    worker_2 = TokenBucketLimiter(fakeredis.FakeRedis(server=redis_server), limits=LIMITS)
+
+    assert worker_1.try_acquire("telegram", "chat-1") == 0
+    assert worker_2.try_acquire("telegram", "chat-1") > 0
+
+
+def test_acquire_waits_for_tokens(limiter):
+    """Тест: блокирующее получение ждёт пополнения бакета."""
+    limiter.acquire("telegram", "chat-1")
+    with patch("app.utils.rate_limit.time.sleep") as mock_sleep:
+        mock_sleep.side_effect = lambda seconds: limiter._redis.delete("ratelimit:telegram:recipient:chat-1")
+        limiter.acquire("telegram", "chat-1")
+
+    mock_sleep.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_acquire_async(limiter):
+    """Тест: асинхронное получение токена обращается к Redis вне цикла событий."""
+    with patch("app.utils.rate_limit.asyncio.to_thread", wraps=asyncio.to_thread) as to_thread:
+        await limiter.acquire_async("telegram", "chat-1")
+
+    to_thread.assert_called_once()
+    assert limiter.try_acquire("telegram", "chat-1") > 0
+
+
+def test_acquire_many_takes_tokens_per_part(limiter):
+    """Тест: пакет получает токены одним вызовом скрипта на часть, помещающуюся в бакеты."""
+    with patch.object(limiter, "try_acquire", return_value=0) as try_acquire:
+        limiter.acquire_many("telegram", ["a", "b", "c", "d", "e", "e"])
+
+    assert [call.args[1:] for call in try_acquire.call_args_list] == [("a", "b", "c"), ("d", "e"), ("e",)]
+
+
+def test_redis_unavailable_fails_open():
+    """Тест: при недоступном Redis отправка не блокируется."""
+    broken = fakeredis.FakeRedis()
+    broken.connected = False
+    limiter = TokenBucketLimiter(broken, limits=LIMITS)
+
+    assert limiter.try_acquire("telegram", "chat-1") == 0
+
+
+def test_request_over_capacity_rejected(limiter):
+    """Тест: нельзя запросить больше токенов, чем ёмкость глобального бакета."""
+    with pytest.raises(ValueError):
+        limiter.try_acquire("telegram", "a", "b", "c", "d")
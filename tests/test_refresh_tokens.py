@@ -0,0 +1,141 @@
+import time
+from unittest.mock import patch
+
+import fakeredis
+import jwt
+import pytest
+import redis
+from fastapi.testclient import TestClient
+
+from app.core.config import ALGORITHM, SECRET_KEY
+from app.core.refresh_tokens import TOKEN_OK, TOKEN_REUSED, TOKEN_REVOKED, RefreshTokenStore
+from app.main import app
+from app.schemas.auth import UserResponse
+from app.services.auth import create_access_token, create_refresh_token
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def store(redis_client):
+    """Хранилище отзыва на отдельном fakeredis, подменяющее хранилище процесса."""
+    store = RefreshTokenStore(redis_client, family_ttl=3600)
+    with patch("app.routers.auth.get_refresh_token_store", return_value=store):
+        yield store
+
+
+def payload(token):
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
+def refresh(token):
+    client.cookies.clear()
+    return client.post("/auth/refresh", cookies={"refresh_token": token})
+
+
+def test_reuse_revokes_family(store):
+    """Тест: повторное использование токена отзывает всё семейство."""
+    first = payload(create_refresh_token({"sub": "user-1"}))
+    second = payload(create_refresh_token({"sub": "user-1"}, family=first["fam"]))
+
+    assert store.rotate(first) == TOKEN_OK
+    assert store.rotate(first) == TOKEN_REUSED
+    assert store.rotate(second) == TOKEN_REVOKED
+    assert store.rotate(payload(create_refresh_token({"sub": "user-1"}))) == TOKEN_OK
+
+
+def test_revoke_user(store):
+    """Тест: отзыв пользователя отклоняет выданные ранее токены, но не выданные позже."""
+    issued = payload(create_refresh_token({"sub": "user-1"}))
+    store.revoke_user("user-1")
+
+    assert store.rotate(issued) == TOKEN_REVOKED
+    with patch("app.core.refresh_tokens.time.time", return_value=time.time() - 10):
+        store.revoke_user("user-1")
+    assert store.rotate(payload(create_refresh_token({"sub": "user-1"}))) == TOKEN_OK
+
+
+def test_keys_expire_with_tokens(store, redis_client):
+    """Тест: отметка об использовании живёт не дольше токена."""
+    token = payload(create_refresh_token({"sub": "user-1"}))
+    store.rotate(token)
+
+    ttl = redis_client.pttl(f"refresh:used:{token['jti']}") / 1000
+    assert abs(token["exp"] - time.time() - ttl) < 5
+
+
+def test_refresh_rotates_token_without_database(store):
+    """Тест: обновление выдаёт новую пару токенов того же семейства, не обращаясь к базе."""
+    token = create_refresh_token({"sub": "user-1"})
+
+    with patch("app.core.db.SessionLocal", side_effect=AssertionError("database used")):
+        response = refresh(token)
+
+    assert response.status_code == 200
+    rotated = payload(response.cookies["refresh_token"])
+    assert rotated["fam"] == payload(token)["fam"]
+    assert rotated["jti"] != payload(token)["jti"]
+    assert "access_token" in response.cookies
+
+    assert refresh(token).status_code == 401
+    assert refresh(response.cookies["refresh_token"]).status_code == 401
+
+
+def test_logout_revokes_session(store):
+    """Тест: после выхода refresh-токен сессии больше не действует."""
+    token = create_refresh_token({"sub": "user-1"})
+    client.cookies.clear()
+    response = client.post("/auth/logout", cookies={"refresh_token": token})
+
+    assert response.status_code == 200
+    assert 'refresh_token=""' in response.headers["set-cookie"]
+    assert refresh(token).status_code == 401
+
+
+def test_token_without_jti_rejected(store):
+    """Тест: refresh-токены, выданные до ротации, не принимаются."""
+    legacy = jwt.encode({"sub": "user-1", "exp": int(time.time()) + 60}, SECRET_KEY, algorithm=ALGORITHM)
+
+    assert refresh(legacy).status_code == 401
+
+
+def test_store_unavailable_returns_503(store):
+    """Тест: при недоступном Redis обновление не выполняется и токен не отклоняется навсегда."""
+    token = create_refresh_token({"sub": "user-1"})
+    with patch.object(store, "_script", side_effect=redis.ConnectionError("Redis down")):
+        response = refresh(token)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert refresh(token).status_code == 200
+
+
+def test_refresh_token_is_not_an_access_token(store):
+    """Тест: refresh-токен (в том числе отозванный) не даёт доступа к защищённым маршрутам."""
+    token = create_refresh_token({"sub": "user-1"})
+    client.cookies.clear()
+    client.post("/auth/logout", cookies={"refresh_token": token})
+
+    client.cookies.clear()
+    user = UserResponse(id="user-1", email="user@example.com", is_active=True, telegram_chat_id=None,
+                        phone_number=None)
+    with patch("app.services.auth.get_user_principal", return_value=user), \
+            patch("app.routers.auth.get_user_principal", return_value=user):
+        assert client.get("/tasks", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+        assert client.post("/tasks", headers={"Authorization": f"Bearer {token}"},
+                           json={"title": "Task"}).status_code == 401
+        assert client.get("/auth/me", cookies={"access_token": token}).status_code == 401
+        assert client.get("/auth/me", cookies={"access_token": create_access_token({"sub": "user-1"})}
+                          ).status_code == 200
+
+
+def test_access_token_does_not_refresh(store):
+    """Тест: access-токен нельзя использовать вместо refresh-токена."""
+    token = create_access_token({"sub": "user-1"})
+
+    assert refresh(token).status_code == 401
@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import Base, get_db
+from app.main import app
+from app.services.auth import create_user_stmt
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def statements(tmp_path):
+    """База SQLite в файле для маршрутов аутентификации; возвращает список выполненных запросов."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'users.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield statements
+    app.dependency_overrides.pop(get_db, None)
+    engine.dispose()
+
+
+def test_register_is_a_single_statement(statements):
+    """Тест: регистрация выполняется одним INSERT ... ON CONFLICT DO NOTHING RETURNING."""
+    response = client.post("/auth/register", json={"email": "new@example.com", "password": "secret"})
+
+    assert response.status_code == 200
+    assert response.json()["email"] == "new@example.com"
+    assert response.json()["is_active"] is True
+    assert len(statements) == 1
+    assert "ON CONFLICT DO NOTHING RETURNING" in statements[0]
+
+
+def test_email_is_case_insensitive(statements):
+    """Тест: email с другим регистром считается занятым, а вход по нему работает."""
+    client.post("/auth/register", json={"email": "new@example.com", "password": "secret"})
+
+    response = client.post("/auth/register", json={"email": "New@Example.com", "password": "secret"})
+    assert response.status_code == 400
+
+    response = client.post("/auth/login", json={"email": "NEW@example.com", "password": "secret"})
+    assert response.status_code == 200
+
+
+def test_concurrent_registration_creates_one_user(statements):
+    """Тест: из одновременных регистраций с одним email успешна ровно одна."""
+    def register(email):
+        return client.post("/auth/register", json={"email": email, "password": "secret"}).status_code
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        codes = list(executor.map(register, ["race@example.com", "Race@example.com", "RACE@example.com",
+                                             "race@Example.com"]))
+
+    assert sorted(codes) == [200, 400, 400, 400]
+
+
+def test_postgresql_statement():
+    """Тест: для PostgreSQL строится тот же INSERT ... ON CONFLICT DO NOTHING RETURNING."""
+    sql = str(create_user_stmt("postgresql", "new@example.com", "hashed", None).compile(
+        dialect=postgresql.dialect()))
+
+    assert "ON CONFLICT DO NOTHING RETURNING users.id" in sql
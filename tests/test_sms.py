@@ -0,0 +1,118 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from app.utils.sms import SmsRuClient
+
+
+class FakeSmsRuHandler(BaseHTTPRequestHandler):
+    """Локальная замена SMS.ru: отвечает в формате JSON API /sms/send."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, как у настоящего API
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        self.server.requests.append(form)
+        self.server.client_ports.add(self.client_address[1])
+
+        if form.get("api_id") != ["test-key"]:
+            body = {"status": "ERROR", "status_code": 200, "status_text": "Неправильный api_id"}
+        else:
+            sms = {}
+            for key, (message,) in form.items():
+                if not key.startswith("multi["):
+                    continue
+                phone = key[len("multi["):-1]
+                if phone.startswith("7000"):
+                    sms[phone] = {"status": "ERROR", "status_code": 207, "status_text": "Нельзя отправлять на этот номер"}
+                else:
+                    sms[phone] = {"status": "OK", "status_code": 100, "sms_id": f"id-{phone}-{len(self.server.requests)}"}
+            body = {"status": "OK", "status_code": 100, "sms": sms, "balance": 100.0}
+
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def smsru_server():
+    """Запускает локальный HTTP-сервер, имитирующий SMS.ru."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeSmsRuHandler)
+    server.requests = []
+    server.client_ports = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sms_client(smsru_server):
+    client = SmsRuClient("test-key", api_url=f"http://127.0.0.1:{smsru_server.server_port}/sms/send", max_recipients=2)
+    yield client
+    client.close()
+
+
+def test_send_single_sms(sms_client, smsru_server):
+    """Тест: отправка одного SMS и разбор статуса номера."""
+    status = sms_client.send("+79123456789", "Привет")
+
+    assert status["status"] == "OK"
+    assert status["sms_id"] == "id-79123456789-1"
+    assert smsru_server.requests[0]["multi[79123456789]"] == ["Привет"]
+
+
+def test_send_bulk_packs_recipients(sms_client, smsru_server):
+    """Тест: несколько получателей в одном запросе, без повторов номера в запросе."""
+    messages = [
+        ("+79000000001", "Задача 1"),
+        ("+79000000002", "Задача 2"),
+        ("+79000000001", "Задача 3"),
+    ]
+
+    statuses = sms_client.send_bulk(messages)
+
+    assert [status["status"] for status in statuses] == ["OK", "OK", "OK"]
+    assert len(smsru_server.requests) == 2
+    assert smsru_server.requests[0]["multi[79000000001]"] == ["Задача 1"]
+    assert smsru_server.requests[0]["multi[79000000002]"] == ["Задача 2"]
+    assert smsru_server.requests[1]["multi[79000000001]"] == ["Задача 3"]
+
+
+def test_send_bulk_reuses_connection(sms_client, smsru_server):
+    """Тест: последовательные запросы идут через одно keep-alive соединение."""
+    sms_client.send_bulk([(f"+7912000000{i}", "Текст") for i in range(6)])
+
+    assert len(smsru_server.requests) == 3
+    assert len(smsru_server.client_ports) == 1
+
+
+def test_send_bulk_per_number_errors(sms_client):
+    """Тест: статусы отдельных номеров разбираются из ответа."""
+    statuses = sms_client.send_bulk([("+70001112233", "Текст"), ("+79123456789", "Текст")])
+
+    assert statuses[0]["status"] == "ERROR"
+    assert statuses[0]["status_text"] == "Нельзя отправлять на этот номер"
+    assert statuses[1]["status"] == "OK"
+
+
+def test_send_bulk_request_error(smsru_server):
+    """Тест: ошибка всего запроса помечает все номера запроса."""
+    client = SmsRuClient("wrong-key", api_url=f"http://127.0.0.1:{smsru_server.server_port}/sms/send")
+
+    statuses = client.send_bulk([("+79123456789", "Текст"), ("+79123456780", "Текст")])
+
+    assert [status["status"] for status in statuses] == ["ERROR", "ERROR"]
+    assert statuses[0]["status_text"] == "Неправильный api_id"
+    client.close()
@@ -0,0 +1,178 @@
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from unittest.mock import patch
+
+from app.core.cache import TaskListCache
+from app.core.db import Base, get_db
+from app.main import app
+from app.models.task import Task
+from app.models.user import User
+from app.services.auth import create_access_token
+from app.services.tasks import bump_tasks_version
+
+engine = create_engine(
+    "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+client = TestClient(app)
+
+
+@pytest.fixture
+def cache():
+    """Включённый кэш списков задач поверх fakeredis."""
+    cache = TaskListCache(fakeredis.FakeRedis(), ttl=60)
+    with patch("app.routers.tasks.get_task_list_cache", return_value=cache), \
+            patch("app.services.tasks.get_task_list_cache", return_value=cache):
+        yield cache
+
+
+@pytest.fixture
+def db():
+    """База с пользователем и тремя задачами."""
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    session.add(User(id="user-1", email="user@example.com", hashed_password="x", is_active=True))
+    session.add_all(Task(title=f"Task {i}", user_id="user-1") for i in range(3))
+    session.commit()
+
+    app.dependency_overrides[get_db] = lambda: session
+    try:
+        yield session
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def auth_headers(db):
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'user-1'})}"}
+
+
+def get_tasks(params=None, **kwargs):
+    """Запросить список задач и вернуть ответ вместе с выполненными SQL-запросами."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get("/tasks", params=params, **kwargs)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return response, statements
+
+
+def test_cache_get_set_and_invalidate(cache):
+    """Тест сохранения записи под поколением и её инвалидации."""
+    listing, generation = cache.get("user-1", "key")
+    assert listing is None
+    assert generation
+
+    cache.set("user-1", "key", {"version": 1, "tasks": [], "next_cursor": None}, generation)
+    assert cache.get("user-1", "key")[0] == {"version": 1, "tasks": [], "next_cursor": None}
+
+    cache.invalidate("user-1")
+    listing, new_generation = cache.get("user-1", "key")
+    assert listing is None
+    assert new_generation != generation
+    assert cache.stats() == {"hits": 1, "misses": 2}
+
+
+def test_cache_ignores_stale_set(cache):
+    """Тест: список, прочитанный из базы до инвалидации, не попадает в кэш."""
+    _, generation = cache.get("user-1", "key")
+    cache.invalidate("user-1")
+    cache.set("user-1", "key", {"version": 1, "tasks": [], "next_cursor": None}, generation)
+
+    assert cache.get("user-1", "key")[0] is None
+
+
+def test_lost_generation_key_does_not_revive_entries(cache):
+    """Тест: после потери ключа поколения старые записи не читаются."""
+    _, first = cache.get("user-1", "key")
+    cache.set("user-1", "key", {"version": 1, "tasks": [], "next_cursor": None}, first)
+    cache.invalidate("user-1")
+    _, second = cache.get("user-1", "key")
+    cache.set("user-1", "key", {"version": 2, "tasks": [], "next_cursor": None}, second)
+
+    cache.redis.delete(cache._generation_key("user-1"))
+    listing, generation = cache.get("user-1", "key")
+    assert listing is None
+    assert generation not in (first, second)
+
+    cache.invalidate("user-1")
+    assert cache.get("user-1", "key")[0] is None
+    assert cache.redis.pttl(cache._generation_key("user-1")) == -1
+
+
+def test_internal_task_cache_endpoint(cache):
+    """Тест: счётчики кэша списков задач доступны на служебном эндпоинте."""
+    cache.get("user-1", "key")
+    with patch("app.routers.internal.get_task_list_cache", return_value=cache):
+        assert client.get("/internal/task-cache").status_code == 404
+        with patch("app.routers.internal.INTERNAL_API_TOKEN", "secret"):
+            response = client.get("/internal/task-cache", headers={"X-Internal-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json() == {"hits": 0, "misses": 1}
+
+
+def test_list_tasks_served_from_cache(cache, db, auth_headers):
+    """Тест: повторный запрос страницы обслуживается из кэша без обращения к таблицам."""
+    first, _ = get_tasks({"limit": 2}, headers=auth_headers)
+    second, statements = get_tasks({"limit": 2}, headers=auth_headers)
+
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert second.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+    # Пользователь берётся из кэша пользователей, версия и задачи — из кэша списков
+    assert statements == []
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+    not_modified, _ = get_tasks({"limit": 2}, headers=dict(auth_headers, **{"If-None-Match": first.headers["ETag"]}))
+    assert not_modified.status_code == 304
+
+
+def test_list_cache_keyed_by_query(cache, db, auth_headers):
+    """Тест: разные страницы и фильтры кэшируются отдельно."""
+    page, _ = get_tasks({"limit": 2}, headers=auth_headers)
+    everything, _ = get_tasks(headers=auth_headers)
+
+    assert len(page.json()) == 2
+    assert len(everything.json()) == 3
+    assert cache.stats()["misses"] == 2
+
+
+def test_task_changes_invalidate_list_cache(cache, db, auth_headers):
+    """Тест: создание, изменение и удаление задачи сбрасывают закэшированный список."""
+    get_tasks(headers=auth_headers)
+
+    created = client.post("/tasks", headers=auth_headers, json={"title": "New", "user_id": "user-1"}).json()
+    assert len(get_tasks(headers=auth_headers)[0].json()) == 4
+
+    client.put(f"/tasks/{created['id']}", headers=auth_headers, json={"title": "Renamed"})
+    assert get_tasks(headers=auth_headers)[0].json()[-1]["title"] == "Renamed"
+
+    client.delete(f"/tasks/{created['id']}", headers=auth_headers)
+    assert len(get_tasks(headers=auth_headers)[0].json()) == 3
+    assert cache.stats()["hits"] == 0
+
+
+def test_rollback_does_not_invalidate_list_cache(cache, db):
+    """Тест: инвалидация выполняется только после commit."""
+    _, generation = cache.get("user-1", "key")
+    cache.set("user-1", "key", {"version": 0, "tasks": [], "next_cursor": None}, generation)
+
+    bump_tasks_version(db, "user-1")
+    db.rollback()
+    assert cache.get("user-1", "key")[0] is not None
+
+    bump_tasks_version(db, "user-1")
+    db.commit()
+    assert cache.get("user-1", "key")[0] is None
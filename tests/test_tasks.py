@@ -7,7 +7,9 @@ from app.core.logger import logger
 from app.main import app
 from app.core.db import Base, get_db
 from app.models.user import User
+from app.models.task import Task
 from app.services.auth import hash_password, create_access_token
+from app.utils.pagination import encode_cursor
 
 # Тестовая база данных SQLite (in-memory)
 TEST_DATABASE_URL = "sqlite:///./test.db"
@@ -176,3 +178,238 @@ def test_delete_task(db, task_data, auth_headers):
     response = client.get(f"/tasks/{task_id}", headers=auth_headers)
     logger.debug(f"Ответ сервера при повторном запросе удаленной задачи: {response.status_code}")
     assert response.status_code == 404
+
+
+@pytest.fixture
+def many_tasks(db, test_user):
+    """Создание набора задач для проверки пагинации."""
+    titles = ["b", "a", "c", "a", "d", "b", "e"]
+    for i, title in enumerate(titles):
+        db.add(Task(title=title, user_id=test_user.id, completed=(i % 2 == 0), email_notification=(i < 3)))
+    db.commit()
+    return titles
+
+
+def fetch_all_pages(auth_headers, **params):
+    """Пройти все страницы списка задач по курсорам."""
+    pages = []
+    cursor = None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        response = client.get("/tasks", params=query, headers=auth_headers)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+@pytest.mark.usefixtures("override_get_db")
+def test_list_tasks_keyset_pagination(db, many_tasks, auth_headers):
+    """Тест: постраничное получение задач по курсору в порядке ID."""
+    pages = fetch_all_pages(auth_headers, limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    ids = [task["id"] for page in pages for task in page]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(many_tasks)
+
+
+@pytest.mark.usefixtures("override_get_db")
+def test_list_tasks_sort_by_title(db, many_tasks, auth_headers):
+    """Тест: сортировка по названию с повторяющимися значениями."""
+    pages = fetch_all_pages(auth_headers, limit=2, sort="-title")
+
+    titles = [task["title"] for page in pages for task in page]
+    assert titles == sorted(many_tasks, reverse=True)
+    assert len({task["id"] for page in pages for task in page}) == len(many_tasks)
+
+
+@pytest.mark.usefixtures("override_get_db")
+def test_list_tasks_filters(db, many_tasks, auth_headers):
+    """Тест: фильтрация по статусу и флагу уведомлений."""
+    response = client.get(
+        "/tasks", params={"completed": "true", "email_notification": "true"}, headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    assert [task["title"] for task in response.json()] == ["b", "c"]
+    assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.usefixtures("override_get_db")
+def test_list_tasks_invalid_cursor(db, many_tasks, auth_headers):
+    """Тест: некорректный курсор и курсор от другой сортировки."""
+    response = client.get("/tasks", params={"cursor": "not-a-cursor"}, headers=auth_headers)
+    assert response.status_code == 400
+
+    cursor = client.get("/tasks", params={"limit": 1}, headers=auth_headers).headers["X-Next-Cursor"]
+    response = client.get("/tasks", params={"cursor": cursor, "sort": "title"}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+@pytest.mark.usefixtures("override_get_db")
+def test_list_tasks_cursor_with_wrong_key_type(db, many_tasks, auth_headers):
+    """Тест: курсор с типом значения, не подходящим к полю сортировки, отклоняется до запроса к базе."""
+    for sort, sort_key, last_id in [("id", "1", 1), ("-id", [1], 1), ("title", 1, 1), ("-title", None, 1),
+                                    ("id", 1, True), ("title", "Task", "1")]:
+        cursor = encode_cursor(sort, sort_key, last_id)
+        response = client.get("/tasks", params={"cursor": cursor, "sort": sort}, headers=auth_headers)
+        assert response.status_code == 400
+
+
+@pytest.mark.usefixtures("override_get_db")
+def test_list_tasks_page_size_capped(db, auth_headers):
+    """Тест: размер страницы ограничен сверху."""
+    response = client.get("/tasks", params={"limit": 10_000}, headers=auth_headers)
+    assert response.status_code == 422
+
+
+@pytest.mark.usefixtures("override_get_db")
+def test_bulk_create_tasks(db, auth_headers):
+    """Тест: массовое создание задач с результатами в порядке запроса."""
+    payload = {"tasks": [
+        {"title": "First", "email_notification": True},
+        {"title": "Second"},
+        {"title": "Third", "sms_notification": True, "completed": True},
+    ]}
+    response = client.post("/tasks/bulk", json=payload, headers=auth_headers)
+
+    assert response.status_code == 201
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == ["created"] * 3
+    assert [result["task"]["title"] for result in results] == ["First", "Second", "Third"]
+
+    created = {task.title: task for task in db.query(Task).all()}
+    assert created["First"].next_reminder_at is not None
+    assert created["Second"].next_reminder_at is None
+    assert created["Third"].next_reminder_at is None
+
+
+@pytest.mark.usefixtures("override_get_db")
+def test_bulk_update_tasks(db, test_user, auth_headers):
+    """Тест: массовое частичное обновление, чужие и несуществующие задачи не меняются."""
+    own = [Task(title=f"Own {i}", description="keep", user_id=test_user.id) for i in range(2)]
+    other_user = User(id="other-user-id", email="other@example.com", hashed_password="x")
+    foreign = Task(title="Foreign", user_id=other_user.id)
+    db.add_all([other_user, foreign, *own])
+    db.commit()
+
+    payload = {"tasks": [
+        {"id": own[0].id, "title": "Renamed"},
+        {"id": foreign.id, "title": "Hijacked"},
+        {"id": own[1].id, "completed": True, "telegram_notification": True},
+        {"id": 999999, "title": "Missing"},
+    ]}
+    response = client.put("/tasks/bulk", json=payload, headers=auth_headers)
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == ["updated", "not_found", "updated", "not_found"]
+    assert results[0]["task"]["title"] == "Renamed"
+    assert results[0]["task"]["description"] == "keep"
+    assert results[2]["task"]["completed"] is True
+    assert results[2]["task"]["title"] == "Own 1"
+
+    db.expire_all()
+    assert foreign.title == "Foreign"
+    assert own[1].next_reminder_at is None
+
+
+@pytest.mark.usefixtures("override_get_db")
+def test_bulk_update_schedules_reminder(db, test_user, auth_headers):
+    """Тест: включение уведомлений массовым обновлением назначает напоминание."""
+    task = Task(title="Silent", user_id=test_user.id)
+    db.add(task)
+    db.commit()
+
+    response = client.put(
+        "/tasks/bulk", json={"tasks": [{"id": task.id, "email_notification": True}]}, headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    db.expire_all()
+    assert task.next_reminder_at is not None
+
+
+@pytest.mark.usefixtures("override_get_db")
+def test_bulk_update_duplicate_ids(db, auth_headers):
+    """Тест: повторяющиеся ID в массовом обновлении отклоняются."""
+    payload = {"tasks": [{"id": 1, "title": "A"}, {"id": 1, "title": "B"}]}
+    response = client.put("/tasks/bulk", json=payload, headers=auth_headers)
+    assert response.status_code == 422
+
+
+@pytest.mark.usefixtures("override_get_db")
+def test_bulk_delete_tasks(db, test_user, auth_headers):
+    """Тест: массовое удаление только своих задач."""
+    own = Task(title="Own", user_id=test_user.id)
+    other_user = User(id="other-user-id", email="other@example.com", hashed_password="x")
+    foreign = Task(title="Foreign", user_id=other_user.id)
+    db.add_all([own, other_user, foreign])
+    db.commit()
+
+    response = client.request(
+        "DELETE", "/tasks/bulk", json={"ids": [own.id, foreign.id, 999999]}, headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == ["deleted", "not_found", "not_found"]
+    assert [task.title for task in db.query(Task).all()] == ["Foreign"]
+
+
+@pytest.mark.usefixtures("override_get_db")
+def test_list_tasks_etag(db, task_data, auth_headers):
+    """Тест: 304 для неизменного списка и новый ETag после изменения задач."""
+    client.post("/tasks", json=task_data, headers=auth_headers)
+    response = client.get("/tasks", headers=auth_headers)
+    etag = response.headers["ETag"]
+
+    response = client.get("/tasks", headers=dict(auth_headers, **{"If-None-Match": etag}))
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    # Другие параметры запроса — другое представление
+    response = client.get("/tasks", params={"limit": 1}, headers=dict(auth_headers, **{"If-None-Match": etag}))
+    assert response.status_code == 200
+
+    client.post("/tasks", json=task_data, headers=auth_headers)
+    response = client.get("/tasks", headers=dict(auth_headers, **{"If-None-Match": etag}))
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert len(response.json()) == 2
+
+
+@pytest.mark.usefixtures("override_get_db")
+def test_read_task_etag(db, task_data, auth_headers):
+    """Тест: ETag задачи переживает изменения других задач и меняется при изменении самой задачи."""
+    task_id = client.post("/tasks", json=task_data, headers=auth_headers).json()["id"]
+    other_id = client.post("/tasks", json=task_data, headers=auth_headers).json()["id"]
+    etag = client.get(f"/tasks/{task_id}", headers=auth_headers).headers["ETag"]
+
+    assert client.get(
+        f"/tasks/{task_id}", headers=dict(auth_headers, **{"If-None-Match": etag})
+    ).status_code == 304
+
+    # Изменение другой задачи меняет версию пользователя, но не версию задачи
+    client.put(f"/tasks/{other_id}", json={"title": "Other"}, headers=auth_headers)
+    response = client.get(f"/tasks/{task_id}", headers=dict(auth_headers, **{"If-None-Match": f"W/{etag}"}))
+    assert response.status_code == 304
+    new_etag = response.headers["ETag"]
+    assert new_etag != etag
+
+    client.put(f"/tasks/{task_id}", json={"title": "Changed"}, headers=auth_headers)
+    response = client.get(f"/tasks/{task_id}", headers=dict(auth_headers, **{"If-None-Match": new_etag}))
+    assert response.status_code == 200
+    assert response.json()["title"] == "Changed"
+
+
+@pytest.mark.usefixtures("override_get_db")
+def test_read_deleted_task_etag(db, task_data, auth_headers):
+    """Тест: после удаления задачи старый ETag не даёт 304."""
+    task_id = client.post("/tasks", json=task_data, headers=auth_headers).json()["id"]
+    etag = client.get(f"/tasks/{task_id}", headers=auth_headers).headers["ETag"]
+
+    client.delete(f"/tasks/{task_id}", headers=auth_headers)
+    response = client.get(f"/tasks/{task_id}", headers=dict(auth_headers, **{"If-None-Match": etag}))
+    assert response.status_code == 404
@@ -0,0 +1,63 @@
+import time
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from unittest.mock import patch
+
+from app.core.cache import LRUCache, TokenCache
+from app.core.config import ALGORITHM, SECRET_KEY
+from app.services.auth import create_access_token, decode_token
+
+
+@pytest.fixture
+def cache():
+    """Отдельный кэш токенов, подменяющий кэш процесса."""
+    cache = TokenCache(LRUCache(2))
+    with patch("app.services.auth.get_token_cache", return_value=cache):
+        yield cache
+
+
+def test_repeated_decode_skips_signature_check(cache):
+    """Тест: повторное декодирование того же токена не проверяет подпись."""
+    token = create_access_token({"sub": "user-1"})
+
+    with patch("app.services.auth.jwt.decode", wraps=jwt.decode) as decode:
+        first = decode_token(token)
+        second = decode_token(token)
+
+    assert decode.call_count == 1
+    assert first == second
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_cached_payload_is_a_copy(cache):
+    """Тест: изменение возвращённого payload не портит запись кэша."""
+    token = create_access_token({"sub": "user-1"})
+    decode_token(token)["sub"] = "user-2"
+
+    assert decode_token(token)["sub"] == "user-1"
+
+
+def test_entry_expires_with_token(cache):
+    """Тест: запись не переживает exp токена."""
+    token = jwt.encode({"sub": "user-1", "exp": datetime.utcnow() + timedelta(seconds=1)},
+                       SECRET_KEY, algorithm=ALGORITHM)
+    decode_token(token)
+    time.sleep(1.1)
+
+    with pytest.raises(HTTPException) as exc_info:
+        decode_token(token)
+    assert exc_info.value.detail == "Token has expired"
+
+
+def test_invalid_tokens_are_not_cached(cache):
+    """Тест: недействительные токены и токены без exp не попадают в кэш."""
+    with pytest.raises(HTTPException):
+        decode_token("invalid.token")
+    decode_token(jwt.encode({"sub": "user-1"}, SECRET_KEY, algorithm=ALGORITHM))
+
+    assert cache.stats()["size"] == 0